@@ -0,0 +1,56 @@
+"""counterparty transfer prefix
+
+Revision ID: 2e9c4a71d5b0
+Revises: f5b8d2c7e614
+Create Date: 2026-10-18 23:30:52.740193
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e9c4a71d5b0'
+down_revision: Union[str, Sequence[str], None] = 'f5b8d2c7e614'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# bank transfer prefixes as they read once normalized, see
+# app.db.repository.normalize_counterparty
+TRANSFER_PREFIXES = ('TRANSFER FR A C ', 'TRANSFER TO A C ')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for prefix in TRANSFER_PREFIXES:
+        op.execute(
+            sa.text(
+                "UPDATE transactions SET counterparty = substr(counterparty, :start) "
+                "WHERE counterparty LIKE :pattern AND length(counterparty) > :length"
+            ).bindparams(start=len(prefix) + 1, pattern=f'{prefix}%', length=len(prefix))
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # recompute the prefixed counterparties from the transaction names
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE transactions SET counterparty = "
+            "left(trim(regexp_replace(upper(\"transaction\"), '[^0-9A-Z]+', ' ', 'g')), 255) "
+            "WHERE upper(\"transaction\") LIKE 'TRANSFER%'"
+        )
+    else:
+        rows = bind.execute(
+            sa.text('SELECT id, "transaction" FROM transactions WHERE upper("transaction") LIKE \'TRANSFER%\'')
+        ).all()
+        for row_id, name in rows:
+            counterparty = " ".join(re.sub(r"[^0-9A-Z]+", " ", name.upper()).split())[:255]
+            bind.execute(
+                sa.text("UPDATE transactions SET counterparty = :counterparty WHERE id = :id"),
+                {"counterparty": counterparty, "id": row_id},
+            )
@@ -0,0 +1,90 @@
+"""transaction search
+
+Revision ID: 5d2f8e0a7c31
+Revises: e4a7c19b3f58
+Create Date: 2026-10-18 19:58:44.207315
+
+"""
+import re
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2f8e0a7c31'
+down_revision: Union[str, Sequence[str], None] = 'e4a7c19b3f58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# must match app.db.models.SEARCH_VECTOR_SQL for queries to use the index
+SEARCH_VECTOR_SQL = "to_tsvector('simple', \"transaction\" || ' ' || coalesce(description, ''))"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    op.add_column('transactions', sa.Column('counterparty', sa.String(length=255), nullable=True))
+
+    # same normalization as app.db.repository.normalize_counterparty
+    if bind.dialect.name == 'postgresql':
+        op.execute(
+            "UPDATE transactions SET counterparty = "
+            "left(trim(regexp_replace(upper(\"transaction\"), '[^0-9A-Z]+', ' ', 'g')), 255)"
+        )
+    else:
+        rows = bind.execute(sa.text('SELECT id, "transaction" FROM transactions')).all()
+        for row_id, name in rows:
+            counterparty = " ".join(re.sub(r"[^0-9A-Z]+", " ", name.upper()).split())[:255]
+            bind.execute(
+                sa.text("UPDATE transactions SET counterparty = :counterparty WHERE id = :id"),
+                {"counterparty": counterparty, "id": row_id},
+            )
+
+    op.create_index('ix_transactions_user_id_counterparty', 'transactions', ['user_id', 'counterparty', 'date'], unique=False)
+    op.create_index('ix_transactions_user_id_date_id', 'transactions', ['user_id', 'date', 'id'], unique=False)
+
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(f"CREATE INDEX ix_transactions_search ON transactions USING gin ({SEARCH_VECTOR_SQL})")
+        op.execute("CREATE INDEX ix_transactions_counterparty_trgm ON transactions USING gin (counterparty gin_trgm_ops)")
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE transactions_fts USING fts5("
+            "\"transaction\", description, content='transactions', content_rowid='id')"
+        )
+        op.execute(
+            "CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions BEGIN "
+            "INSERT INTO transactions_fts(rowid, \"transaction\", description) "
+            "VALUES (new.id, new.\"transaction\", new.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions BEGIN "
+            "INSERT INTO transactions_fts(transactions_fts, rowid, \"transaction\", description) "
+            "VALUES ('delete', old.id, old.\"transaction\", old.description); END"
+        )
+        op.execute(
+            "CREATE TRIGGER transactions_fts_update AFTER UPDATE ON transactions BEGIN "
+            "INSERT INTO transactions_fts(transactions_fts, rowid, \"transaction\", description) "
+            "VALUES ('delete', old.id, old.\"transaction\", old.description); "
+            "INSERT INTO transactions_fts(rowid, \"transaction\", description) "
+            "VALUES (new.id, new.\"transaction\", new.description); END"
+        )
+        op.execute("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.drop_index('ix_transactions_counterparty_trgm', table_name='transactions')
+        op.drop_index('ix_transactions_search', table_name='transactions')
+    elif bind.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER transactions_fts_update")
+        op.execute("DROP TRIGGER transactions_fts_delete")
+        op.execute("DROP TRIGGER transactions_fts_insert")
+        op.execute("DROP TABLE transactions_fts")
+    op.drop_index('ix_transactions_user_id_date_id', table_name='transactions')
+    op.drop_index('ix_transactions_user_id_counterparty', table_name='transactions')
+    op.drop_column('transactions', 'counterparty')
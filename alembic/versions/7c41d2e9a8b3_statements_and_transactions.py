@@ -0,0 +1,68 @@
+"""statements and transactions
+
+Revision ID: 7c41d2e9a8b3
+Revises: 0de2b16a53ab
+Create Date: 2026-10-18 19:12:04.118532
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c41d2e9a8b3'
+down_revision: Union[str, Sequence[str], None] = '0de2b16a53ab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('statements',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('file_sha256', sa.String(length=64), nullable=False),
+    sa.Column('filename', sa.String(length=255), nullable=True),
+    sa.Column('page_count', sa.Integer(), nullable=False),
+    sa.Column('parser', sa.String(length=16), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_statements_id'), 'statements', ['id'], unique=False)
+    op.create_index(op.f('ix_statements_user_id'), 'statements', ['user_id'], unique=False)
+    op.create_index(op.f('ix_statements_file_sha256'), 'statements', ['file_sha256'], unique=False)
+    op.create_table('transactions',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('statement_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('date', sa.Date(), nullable=False),
+    sa.Column('transaction', sa.String(length=255), nullable=False),
+    sa.Column('amount', sa.Numeric(precision=14, scale=2), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('category', sa.String(length=64), nullable=True),
+    sa.Column('is_direct', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['statement_id'], ['statements.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transactions_statement_id'), 'transactions', ['statement_id'], unique=False)
+    op.create_index('ix_transactions_user_id_date', 'transactions', ['user_id', 'date'], unique=False)
+    op.create_index('ix_transactions_amount', 'transactions', ['amount'], unique=False)
+    op.create_index('ix_transactions_category', 'transactions', ['category'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_category', table_name='transactions')
+    op.drop_index('ix_transactions_amount', table_name='transactions')
+    op.drop_index('ix_transactions_user_id_date', table_name='transactions')
+    op.drop_index(op.f('ix_transactions_statement_id'), table_name='transactions')
+    op.drop_table('transactions')
+    op.drop_index(op.f('ix_statements_file_sha256'), table_name='statements')
+    op.drop_index(op.f('ix_statements_user_id'), table_name='statements')
+    op.drop_index(op.f('ix_statements_id'), table_name='statements')
+    op.drop_table('statements')
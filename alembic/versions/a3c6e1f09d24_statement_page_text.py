@@ -0,0 +1,29 @@
+"""statement page text
+
+Revision ID: a3c6e1f09d24
+Revises: 5d2f8e0a7c31
+Create Date: 2026-10-18 20:02:47.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3c6e1f09d24'
+down_revision: Union[str, Sequence[str], None] = '5d2f8e0a7c31'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pages ingested before this keep a null text and are OCRed once more
+    op.add_column('statement_pages', sa.Column('text', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('statement_pages', 'text')
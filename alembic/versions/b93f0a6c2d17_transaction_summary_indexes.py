@@ -0,0 +1,36 @@
+"""transaction summary indexes
+
+Revision ID: b93f0a6c2d17
+Revises: 7c41d2e9a8b3
+Create Date: 2026-10-18 19:24:37.602114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b93f0a6c2d17'
+down_revision: Union[str, Sequence[str], None] = '7c41d2e9a8b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_transactions_user_id_date', table_name='transactions')
+    op.create_index('ix_transactions_user_id_date_amount', 'transactions', ['user_id', 'date', 'amount'], unique=False)
+    op.create_index('ix_transactions_user_id_category', 'transactions', ['user_id', 'category', 'date', 'amount'], unique=False)
+    op.create_index('ix_transactions_user_id_is_direct', 'transactions', ['user_id', 'is_direct', 'date', 'amount'], unique=False)
+    op.create_index('ix_transactions_user_id_transaction', 'transactions', ['user_id', 'transaction', 'date', 'amount'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_user_id_transaction', table_name='transactions')
+    op.drop_index('ix_transactions_user_id_is_direct', table_name='transactions')
+    op.drop_index('ix_transactions_user_id_category', table_name='transactions')
+    op.drop_index('ix_transactions_user_id_date_amount', table_name='transactions')
+    op.create_index('ix_transactions_user_id_date', 'transactions', ['user_id', 'date'], unique=False)
@@ -0,0 +1,29 @@
+"""statement page rows
+
+Revision ID: c81d4b7e25a0
+Revises: a3c6e1f09d24
+Create Date: 2026-10-18 22:41:09.532817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c81d4b7e25a0'
+down_revision: Union[str, Sequence[str], None] = 'a3c6e1f09d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # pages ingested before this keep null rows and are structured once more
+    op.add_column('statement_pages', sa.Column('rows', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('statement_pages', 'rows')
@@ -0,0 +1,48 @@
+"""statement deduplication
+
+Revision ID: e4a7c19b3f58
+Revises: b93f0a6c2d17
+Create Date: 2026-10-18 19:41:12.530871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c19b3f58'
+down_revision: Union[str, Sequence[str], None] = 'b93f0a6c2d17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('statements', sa.Column('duplicate_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('statement_pages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('statement_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('page_number', sa.Integer(), nullable=False),
+    sa.Column('fingerprint', sa.String(length=64), nullable=False),
+    sa.ForeignKeyConstraint(['statement_id'], ['statements.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_statement_pages_statement_id'), 'statement_pages', ['statement_id'], unique=False)
+    op.create_index('ix_statement_pages_user_id_fingerprint', 'statement_pages', ['user_id', 'fingerprint'], unique=False)
+    # existing rows keep a null fingerprint and take no part in deduplication
+    op.add_column('transactions', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.create_index('ix_transactions_fingerprint', 'transactions', ['fingerprint'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_fingerprint', table_name='transactions')
+    op.drop_column('transactions', 'fingerprint')
+    op.drop_index('ix_statement_pages_user_id_fingerprint', table_name='statement_pages')
+    op.drop_index(op.f('ix_statement_pages_statement_id'), table_name='statement_pages')
+    op.drop_table('statement_pages')
+    op.drop_column('statements', 'duplicate_count')
@@ -0,0 +1,34 @@
+"""counterparty summary index
+
+Revision ID: f5b8d2c7e614
+Revises: c81d4b7e25a0
+Create Date: 2026-10-18 23:12:40.318276
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5b8d2c7e614'
+down_revision: Union[str, Sequence[str], None] = 'c81d4b7e25a0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # the counterparty summary groups by the normalized name, so its
+    # covering index moves from the raw transaction column to counterparty
+    op.drop_index('ix_transactions_user_id_transaction', table_name='transactions')
+    op.drop_index('ix_transactions_user_id_counterparty', table_name='transactions')
+    op.create_index('ix_transactions_user_id_counterparty', 'transactions', ['user_id', 'counterparty', 'date', 'amount'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_user_id_counterparty', table_name='transactions')
+    op.create_index('ix_transactions_user_id_counterparty', 'transactions', ['user_id', 'counterparty', 'date'], unique=False)
+    op.create_index('ix_transactions_user_id_transaction', 'transactions', ['user_id', 'transaction', 'date', 'amount'], unique=False)
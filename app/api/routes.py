@@ -1,34 +1,69 @@
 # from app.utils import Logger
+import json
+import asyncio
 import logging
-from fastapi import APIRouter, File, UploadFile, HTTPException
-from app.models.schemas import BankStatementResponse
-from app.services.pdf_parser import extract_text_from_pdf, PDFParserError
-from app.services.ai import (
-    generate_formatted_data,
-    validate_json_with_schema,
-    AIExtractionError,
+from datetime import date
+from typing import TYPE_CHECKING, AsyncIterator, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, File, Query, UploadFile, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from app.auth.auth import get_current_user_id, require_user_id
+from app.config import BATCH_MAX_CONCURRENT_FILES, MAX_BATCH_FILES, UPLOAD_MAX_BYTES
+from app.db.database import database, get_db
+from app.models.schemas import (
+    BatchFileResult,
+    BatchUploadResponse,
+    CashflowBucket,
+    CashflowSummaryResponse,
+    JobStatusResponse,
+    JobSubmitResponse,
+    StatementUploadResponse,
+    StoredTransaction,
+    TransactionSearchResponse,
 )
+from app.services.pdf_parser import PDFParserError
+from app.services.ai import AIExtractionError
+from app.services.export import (
+    MEDIA_TYPES,
+    STATEMENT_COLUMNS,
+    STORED_COLUMNS,
+    ExportFormatUnavailable,
+    check_export_format,
+    export_stream,
+    statement_transaction_batches,
+    stored_transaction_batches,
+)
+from app.services.jobs import JobQueueFull, job_queue
+from app.services.pipeline import process_statement, stream_statement
+from app.services.rate_limit import llm_scheduler
+from app.services.uploads import SpooledUpload, UploadTooLarge, spool_upload
+
+# the ORM and the repository are imported by the endpoints that query them
+if TYPE_CHECKING:
+    from sqlalchemy.orm import Session
 
 router = APIRouter()
 
-MAX_SIZE = 16 * 1024 * 1024
+MAX_SIZE = UPLOAD_MAX_BYTES
 
 logger = logging.getLogger(__name__)
 
 
-@router.get("/")
-def read_root():
+def model_response(model: BaseModel) -> Response:
     """
-    Base endpoint
+    Serialize a model that is already valid straight to JSON. Returning a
+    Response skips FastAPI's response_model pass, which would dump the model
+    to dicts and validate it again; response_model still documents the
+    schema.
     """
-    logger.info("Health check requested")
-    return {"message": "all good!", "status": "200"}
+    return Response(content=model.model_dump_json(), media_type="application/json")
 
 
-@router.post("/files/upload", response_model=BankStatementResponse)
-async def create_upload_file(file: UploadFile = File(...)):
+async def read_pdf_upload(file: UploadFile) -> SpooledUpload:
     """
-    Upload PDF file of bank statement, extract data, returns structured data.
+    Check the upload is a PDF and read it in chunks, stopping as soon as it
+    exceeds the size limit. Large files are spooled to disk; the caller
+    discards the returned upload when done with it.
     """
     if file.content_type != "application/pdf":
         raise HTTPException(
@@ -36,22 +71,55 @@ async def create_upload_file(file: UploadFile = File(...)):
         )
 
     logger.info(f"Reading file: {file.filename}")
-    contents = await file.read()
-
-    if len(contents) > MAX_SIZE:
+    try:
+        return await spool_upload(file, MAX_SIZE)
+    except UploadTooLarge:
         raise HTTPException(status_code=400, detail="file size exceeds limit")
 
+
+@router.get("/")
+def read_root():
+    """
+    Base endpoint
+    """
+    logger.info("Health check requested")
+    return {"message": "all good!", "status": "200"}
+
+
+@router.get("/db/pool")
+def read_db_pool():
+    """
+    Connection pool occupancy and wait/overflow counters
+    """
+    return database.pool_status()
+
+
+@router.get("/llm/scheduler")
+def read_llm_scheduler():
+    """
+    LLM rate-limit scheduler: calls in flight and waiting, remaining
+    per-minute budgets and the current backoff
+    """
+    return llm_scheduler.status()
+
+
+@router.post("/files/upload", response_model=StatementUploadResponse)
+async def create_upload_file(
+    file: UploadFile = File(...),
+    user_id: Optional[int] = Depends(get_current_user_id),
+):
+    """
+    Upload PDF file of bank statement, extract data, returns structured data.
+    """
+    upload = None
     try:
-        extracted_text = extract_text_from_pdf(contents)
-        logger.warning(f"Text length: {len(extracted_text)}")
-        formatted_data = generate_formatted_data(extracted_text)
-        bank_statement_data = validate_json_with_schema(
-            formatted_data, BankStatementResponse
+        upload = await read_pdf_upload(file)
+        result = await process_statement(
+            upload.source, filename=file.filename, user_id=user_id, digest=upload.digest
         )
-
-        list_of_transactions = list(bank_statement_data)
-        logger.warning("no. of transactions: %d", len(list_of_transactions))
-        return bank_statement_data
+        return model_response(result)
+    except HTTPException:
+        raise
     except PDFParserError as e:
         raise HTTPException(status_code=400, detail=f"error parsing file: {str(e)}")
     except AIExtractionError as e:
@@ -59,4 +127,310 @@ async def create_upload_file(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"internal server error: {str(e)}")
     finally:
+        if upload is not None:
+            upload.discard()
         await file.close()
+
+
+def export_response(export_format: str, columns, batches, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        export_stream(export_format, columns, batches),
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'},
+    )
+
+
+def describe_pipeline_error(e: Exception) -> Tuple[int, str]:
+    """
+    HTTP status and detail for an error raised while processing a statement.
+    """
+    if isinstance(e, HTTPException):
+        return e.status_code, e.detail
+    if isinstance(e, PDFParserError):
+        return 400, f"error parsing file: {str(e)}"
+    if isinstance(e, AIExtractionError):
+        return 422, f"error extracting data: {str(e)}"
+    return 500, f"internal server error: {str(e)}"
+
+
+@router.post("/files/batch", response_model=BatchUploadResponse)
+async def create_batch_upload(
+    files: List[UploadFile] = File(...),
+    user_id: Optional[int] = Depends(get_current_user_id),
+):
+    """
+    Upload several bank statement PDFs and process them concurrently. Their
+    pages share the OCR worker pool and their chunks share the LLM
+    concurrency limit. Returns a result or an error for each file, in upload
+    order; one bad file does not fail the batch.
+    """
+    if len(files) > MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400, detail=f"too many files, at most {MAX_BATCH_FILES} per batch"
+        )
+
+    slots = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENT_FILES))
+
+    async def process_file(file: UploadFile) -> BatchFileResult:
+        upload = None
+        try:
+            async with slots:
+                upload = await read_pdf_upload(file)
+                result = await process_statement(
+                    upload.source,
+                    filename=file.filename,
+                    user_id=user_id,
+                    digest=upload.digest,
+                )
+            return BatchFileResult.model_construct(
+                filename=file.filename, status="succeeded", result=result
+            )
+        except Exception as e:
+            status, detail = describe_pipeline_error(e)
+            if status == 500:
+                logger.exception("Batch file %s failed", file.filename)
+            return BatchFileResult(
+                filename=file.filename, status="failed", error=detail, error_status=status
+            )
+        finally:
+            if upload is not None:
+                upload.discard()
+            await file.close()
+
+    results = await asyncio.gather(*(process_file(file) for file in files))
+    succeeded = sum(1 for result in results if result.status == "succeeded")
+    logger.info("Batch of %d files: %d succeeded", len(results), succeeded)
+    return model_response(
+        BatchUploadResponse.model_construct(
+            files=results, succeeded=succeeded, failed=len(results) - succeeded
+        )
+    )
+
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def statement_event_stream(
+    upload: SpooledUpload, filename: Optional[str], user_id: Optional[int]
+) -> AsyncIterator[str]:
+    """
+    Translate pipeline events into SSE messages: "page" per extracted page,
+    "chunk" per extracted chunk, then "summary", or "error" on failure.
+    The upload is discarded once the stream ends.
+    """
+    event_names = {"extract": "page", "structure": "chunk", "summary": "summary"}
+    try:
+        async for event in stream_statement(upload.source, filename, user_id, upload.digest):
+            if event.stage not in event_names:
+                continue
+            yield format_sse(
+                event_names[event.stage],
+                {"completed": event.completed, "total": event.total, **event.data},
+            )
+    except Exception as e:
+        status, detail = describe_pipeline_error(e)
+        if status == 500:
+            logger.exception("Streaming upload failed")
+        yield format_sse("error", {"status": status, "detail": detail})
+    finally:
+        upload.discard()
+
+
+@router.post("/files/upload/stream")
+async def create_upload_file_stream(
+    file: UploadFile = File(...),
+    user_id: Optional[int] = Depends(get_current_user_id),
+):
+    """
+    Upload PDF file of bank statement and stream progress and transactions
+    as Server-Sent Events while it is processed.
+    """
+    try:
+        upload = await read_pdf_upload(file)
+    finally:
+        await file.close()
+
+    return StreamingResponse(
+        statement_event_stream(upload, file.filename, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/jobs", response_model=JobSubmitResponse, status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    user_id: Optional[int] = Depends(get_current_user_id),
+):
+    """
+    Queue a bank statement PDF for background processing and return its job ID.
+    """
+    upload = None
+    try:
+        upload = await read_pdf_upload(file)
+        job = job_queue.submit(upload, file.filename, user_id)
+    except JobQueueFull as e:
+        upload.discard()
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    finally:
+        await file.close()
+
+    logger.info("Queued job %s (queue depth %d)", job.id, job_queue.depth)
+    return JobSubmitResponse(job_id=job.id, status=job.status)
+
+
+@router.get("/jobs/{job_id}", response_model=JobStatusResponse)
+def get_job(job_id: str, user_id: Optional[int] = Depends(get_current_user_id)):
+    """
+    Return status, per-stage progress and, once finished, the result of a job.
+    A job submitted by a signed-in user is only returned to that user.
+    """
+    job = job_queue.get(job_id, user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+
+    # the finished result is reused as-is rather than validated on every poll
+    return model_response(
+        JobStatusResponse(
+            job_id=job.id,
+            status=job.status,
+            filename=job.filename,
+            stages=job.stages,
+            result=job.result,
+            error=job.error,
+        )
+    )
+
+
+@router.get("/transactions/summary", response_model=CashflowSummaryResponse)
+def get_transaction_summary(
+    group_by: Literal["all", "month", "category", "channel", "counterparty"] = "all",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    user_id: int = Depends(require_user_id),
+    db: "Session" = Depends(get_db),
+):
+    """
+    Transaction count, credits, debits and net of the user's stored
+    transactions, overall or grouped by month, category, channel (direct or
+    payment gateway) or counterparty. Aggregated in SQL so only the buckets
+    are returned. Counterparties are ordered by total volume, use limit for
+    the top N. Requires a bearer token.
+    """
+    from app.db.repository import summarize_transactions
+
+    buckets = summarize_transactions(db, group_by, user_id, start, end, limit)
+    return CashflowSummaryResponse(
+        group_by=group_by,
+        buckets=[CashflowBucket(**bucket) for bucket in buckets],
+    )
+
+
+@router.get("/transactions/search", response_model=TransactionSearchResponse)
+def search_stored_transactions(
+    q: Optional[str] = Query(None, max_length=200),
+    counterparty: Optional[str] = Query(None, max_length=255),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+    user_id: int = Depends(require_user_id),
+    db: "Session" = Depends(get_db),
+):
+    """
+    Search the user's stored transactions, newest first. q matches words
+    in the transaction name and description by prefix ("jersey pay"),
+    counterparty matches part of the normalized counterparty name
+    ("toyyibpay"). Follow next_cursor for further pages. Requires a bearer
+    token.
+    """
+    from app.db.repository import search_transactions
+
+    try:
+        rows, next_cursor = search_transactions(
+            db, user_id, q, counterparty, start, end, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return model_response(
+        TransactionSearchResponse.model_construct(
+            results=[StoredTransaction.model_construct(**row) for row in rows],
+            next_cursor=next_cursor,
+        )
+    )
+
+
+@router.get("/transactions/export")
+def export_stored_transactions(
+    export_format: Literal["csv", "parquet", "arrow"] = Query("csv", alias="format"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: List[str] = Query([]),
+    user_id: int = Depends(require_user_id),
+):
+    """
+    Download the user's stored transactions, oldest first, as CSV, Parquet
+    or an Arrow IPC stream. Rows are streamed from a database cursor batch
+    by batch, so any size of export runs in constant memory. Filter by date
+    range and by one or more categories (repeat category). Requires a bearer
+    token.
+    """
+    try:
+        check_export_format(export_format)
+    except ExportFormatUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    return export_response(
+        export_format,
+        STORED_COLUMNS,
+        stored_transaction_batches(user_id, start, end, category),
+        "transactions",
+    )
+
+
+@router.post("/files/export")
+async def export_upload_file(
+    file: UploadFile = File(...),
+    export_format: Literal["csv", "parquet", "arrow"] = Query("csv", alias="format"),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    category: List[str] = Query([]),
+    user_id: Optional[int] = Depends(get_current_user_id),
+):
+    """
+    Upload PDF file of bank statement, extract data and download its
+    transactions as CSV, Parquet or an Arrow IPC stream, with the same
+    filters as the stored transactions export. As with upload, transactions
+    an earlier statement already stored are kept and marked in the
+    duplicate column.
+    """
+    try:
+        check_export_format(export_format)
+    except ExportFormatUnavailable as e:
+        await file.close()
+        raise HTTPException(status_code=501, detail=str(e))
+
+    upload = None
+    try:
+        upload = await read_pdf_upload(file)
+        result = await process_statement(
+            upload.source, filename=file.filename, user_id=user_id, digest=upload.digest
+        )
+    except Exception as e:
+        status, detail = describe_pipeline_error(e)
+        raise HTTPException(status_code=status, detail=detail)
+    finally:
+        if upload is not None:
+            upload.discard()
+        await file.close()
+
+    return export_response(
+        export_format,
+        STATEMENT_COLUMNS,
+        statement_transaction_batches(
+            result.transactions, result.duplicates, start, end, category
+        ),
+        "statement",
+    )
@@ -1,7 +1,38 @@
+from typing import Optional
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from jose import JWTError
 from app.db import get_db
-from sqlalchemy.orm import session
+from app.auth.jwt_handler import decode_token
+
+bearer_scheme = HTTPBearer(auto_error=False)
 
 async def authenticate_user(db, email: str, password: str):
     """
     Authenticate by checking email and password
     """
+
+def get_current_user_id(
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+) -> Optional[int]:
+    """
+    Return the user ID from the bearer token, or None for anonymous requests
+    """
+    if credentials is None:
+        return None
+
+    try:
+        payload = decode_token(credentials.credentials)
+        return int(payload["sub"])
+    except (JWTError, KeyError, ValueError):
+        raise HTTPException(status_code=401, detail="invalid access token")
+
+def require_user_id(user_id: Optional[int] = Depends(get_current_user_id)) -> int:
+    """
+    Return the user ID from the bearer token, rejecting anonymous requests
+    """
+    if user_id is None:
+        raise HTTPException(
+            status_code=401, detail="not authenticated", headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user_id
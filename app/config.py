@@ -1,9 +1,174 @@
-MAX_CHARS_PER_CHUNK = 122000
+import os
+from typing import Optional
+from dotenv import load_dotenv
+from pydantic import model_validator
+from pydantic_settings import BaseSettings
+
+load_dotenv()
+
+# "text" for human-readable logs, "json" for one JSON object per line
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+# OCR engine: worker processes and the cap on rendered pages held in memory
+# across all uploads being extracted at once
+OCR_MAX_WORKERS = int(os.getenv("OCR_MAX_WORKERS", os.cpu_count() or 1))
+OCR_MAX_PAGES_IN_FLIGHT = int(
+    os.getenv("OCR_MAX_PAGES_IN_FLIGHT", OCR_MAX_WORKERS * 2)
+)
+
+# page preprocessing before tesseract: render DPI, thresholding ("global",
+# "otsu", "adaptive" or "none"), optional deskew and crop to the ruled
+# transaction table (pages after the first only, so the statement header
+# with its date is kept), and tesseract options (page segmentation mode,
+# character whitelist, tessdata directory e.g. a tessdata_fast checkout)
+OCR_DPI = int(os.getenv("OCR_DPI", 200))
+OCR_THRESHOLD = os.getenv("OCR_THRESHOLD", "global")
+OCR_GLOBAL_THRESHOLD = int(os.getenv("OCR_GLOBAL_THRESHOLD", 150))
+OCR_DESKEW = os.getenv("OCR_DESKEW", "false").lower() == "true"
+OCR_CROP_TABLE = os.getenv("OCR_CROP_TABLE", "false").lower() == "true"
+OCR_TESSERACT_LANG = os.getenv("OCR_TESSERACT_LANG", "eng")
+OCR_TESSERACT_PSM = int(os.getenv("OCR_TESSERACT_PSM", 3))
+OCR_TESSERACT_WHITELIST = os.getenv("OCR_TESSERACT_WHITELIST", "")
+OCR_TESSDATA_DIR = os.getenv("OCR_TESSDATA_DIR", "")
+
+# pages whose embedded text layer has fewer alphanumeric characters than this
+# are treated as scanned and sent to OCR
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", 32))
+
+# text cleanup between extraction and chunking; drop a rule name from the
+# list to keep that kind of line
+TEXT_CLEANUP_RULES = tuple(
+    rule.strip()
+    for rule in os.getenv(
+        "TEXT_CLEANUP_RULES",
+        "page_numbers,repeated_lines,column_headers,summary_lines,garbage_lines",
+    ).split(",")
+    if rule.strip()
+)
+# lines with a lower share of letters/digits are treated as OCR garbage
+CLEANUP_MIN_ALNUM_RATIO = float(os.getenv("CLEANUP_MIN_ALNUM_RATIO", 0.4))
+
+# counterparties that mark a transaction as going through a payment gateway
+PAYMENT_GATEWAYS = ("TOYYIBPAY", "SHOPEE", "GRAB", "FPX", "BILLPLZ")
+
+# rule-based parses below this share of recognised rows fall back to the LLM
+RULE_PARSER_MIN_CONFIDENCE = float(os.getenv("RULE_PARSER_MIN_CONFIDENCE", 0.95))
+
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+# max chunk extraction calls in flight, shared by every statement being
+# processed so batches and concurrent uploads stay within the API quota
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", 131072))
+LLM_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", 32768))
+# the worked example costs a few hundred prompt tokens on every call
+LLM_PROMPT_INCLUDE_EXAMPLE = os.getenv("LLM_PROMPT_INCLUDE_EXAMPLE", "false").lower() == "true"
+
+# chunking: per-chunk input token target, the characters-per-token estimate
+# and how many output tokens to expect per input token (a statement row
+# becomes a JSON object roughly twice its size). Chunks are made smaller
+# when LLM_MAX_CONCURRENCY full chunks would not fit in LLM_TPM_LIMIT
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", 4000))
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", 3.5))
+OUTPUT_TOKENS_PER_INPUT_TOKEN = float(os.getenv("OUTPUT_TOKENS_PER_INPUT_TOKEN", 2.5))
+# size of the shared HTTP connection pool to the LLM provider
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 20))
+# account quota the LLM scheduler paces calls to, and how failed calls are
+# retried (429s, timeouts and 5xx) with exponential backoff
+LLM_RPM_LIMIT = int(os.getenv("LLM_RPM_LIMIT", 30))
+LLM_TPM_LIMIT = int(os.getenv("LLM_TPM_LIMIT", 12000))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", 5))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1.0))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 60.0))
+
+# extraction cache: in-memory LRU budget and optional SQLite file that
+# survives restarts (disabled when unset)
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 64 * 1024 * 1024))
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH")
+
+# background jobs: worker count, max queued jobs before submissions get a
+# 429, and how long finished jobs stay pollable
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_MAX_DEPTH = int(os.getenv("JOB_QUEUE_MAX_DEPTH", 20))
+JOB_RESULT_TTL_SECONDS = int(os.getenv("JOB_RESULT_TTL_SECONDS", 3600))
+
+# largest PDF accepted, per file. Requests with a body over that plus
+# UPLOAD_FORM_OVERHEAD_BYTES of multipart framing per file are turned away
+# with a 413 before the body is received
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", 16 * 1024 * 1024))
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# uploads are read in UPLOAD_CHUNK_BYTES pieces and kept in memory up to
+# UPLOAD_SPOOL_THRESHOLD_BYTES; larger files are spooled to a temp file
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", 256 * 1024))
+UPLOAD_SPOOL_THRESHOLD_BYTES = int(os.getenv("UPLOAD_SPOOL_THRESHOLD_BYTES", 1024 * 1024))
+
+# batch uploads: max files per request and how many of them are processed
+# at once (their pages and chunks share the OCR and LLM pools)
+MAX_BATCH_FILES = int(os.getenv("MAX_BATCH_FILES", 24))
+BATCH_MAX_CONCURRENT_FILES = int(os.getenv("BATCH_MAX_CONCURRENT_FILES", 4))
+
+# exports: rows fetched per database round trip, and per CSV chunk, Parquet
+# row group or Arrow record batch written to the response
+EXPORT_BATCH_ROWS = int(os.getenv("EXPORT_BATCH_ROWS", 5000))
+
+# after startup, load the OCR libraries into the OCR workers, run tesseract
+# once and open LLM and database connections in the background
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
+
+
+class Settings(BaseSettings):
+    """
+    Database and auth settings, read from the environment or .env.
+    """
+
+    DATABASE_URL: Optional[str] = None
+    POSTGRES_HOST: Optional[str] = None
+    POSTGRES_DB: Optional[str] = None
+    POSTGRES_USER: Optional[str] = None
+    POSTGRES_PASSWORD: Optional[str] = None
+    POSTGRES_PORT: int = 5432
+    # optional async driver URL, e.g. postgresql+asyncpg://...
+    ASYNC_DATABASE_URL: Optional[str] = None
+
+    # connection pool, applied to both engines; size it so that
+    # (pool size + overflow) x uvicorn workers stays under Postgres max_connections
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # save extracted statements and their transactions; only uploads from
+    # signed-in users are saved, anonymous ones are returned and discarded
+    PERSIST_STATEMENTS: bool = True
+
+    SECRET_KEY: Optional[str] = None
+    ALGORITHM: str = "HS256"
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+
+    model_config = {"env_file": ".env", "extra": "ignore"}
+
+    @model_validator(mode="after")
+    def default_database_url(self) -> "Settings":
+        # same POSTGRES_* variables as alembic/env.py, falling back to a
+        # local SQLite file
+        if self.DATABASE_URL is None:
+            if self.POSTGRES_HOST:
+                self.DATABASE_URL = (
+                    f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
+                    f"@{self.POSTGRES_HOST}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
+                )
+            else:
+                self.DATABASE_URL = "sqlite:///./flowcessor.db"
+        return self
+
+
+settings = Settings()
 
 SYSTEM_PROMPT = """
     You are parsing a Malaysian bank statement data extraction expert. The extracted text might be out of order and unstructred.
     Extract all transactions from the statement text and return ONLY valid JSON matching the schema.
-    Schema to follow: {json.dumps(response_schema, indent=2)}
 
     IMPORTANT
     - Amounts use Malaysian format: 2,200.00 means RM2200 (not RM2.20)
@@ -50,7 +215,7 @@ EXAMPLE = """
                 "transaction": "TRANSFER TO A/C TOYYIBPAY SDN. BHD.",
                 "amount": 380.00,
                 "description": "NPR4TADN040302414 MBB CT",
-                "category": "payment",
+                "category": "transfer_in",
                 "is_direct": false
             },
             {
@@ -1,30 +1,229 @@
+import time
+import logging
+import threading
+from typing import TYPE_CHECKING, Optional
 from app.config import settings
-from sqlalchemy import create_engine, Engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+
+if TYPE_CHECKING:
+    from sqlalchemy import Engine
+    from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
+    from sqlalchemy.orm import sessionmaker
+
+logger = logging.getLogger(__name__)
+
+class PoolMetrics:
+    """
+    Counters for one connection pool: how often callers waited for a
+    connection, for how long, and how often the pool had to overflow
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record_checkout(self, wait_seconds: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds_total += wait_seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+            if overflowed:
+                self.overflow_events += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+            }
+
+def instrumented_pool_class(base: type, metrics: PoolMetrics) -> type:
+    """
+    Subclass a queue pool so every checkout is timed. The metrics object is a
+    class attribute so it survives pool.recreate() on engine dispose.
+    """
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    def _do_get(self):
+        overflow_before = self.overflow()
+        started = time.perf_counter()
+        try:
+            connection = base._do_get(self)
+        except PoolTimeoutError:
+            metrics.record_timeout()
+            raise
+        # overflow() counts up from -pool_size; only positive growth means a
+        # connection was opened beyond the pool size
+        metrics.record_checkout(time.perf_counter() - started, self.overflow() > max(overflow_before, 0))
+        return connection
+
+    return type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get, "metrics": metrics})
 
 class Database:
+    """
+    Engines and session factories are created on first use rather than at
+    import, so importing the app (and every forked worker) loads neither
+    SQLAlchemy nor the database driver; the lifespan hook touches them
+    through init_db().
+    """
+
     def __init__(self):
-        self.engine = self.create_engine()
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
-    
-    def create_engine(self) -> Engine:
-        print("Creating DB connection...")
+        self.pool_metrics = PoolMetrics()
+        self.async_pool_metrics = PoolMetrics()
+        self._lock = threading.Lock()
+        self._engine: Optional["Engine"] = None
+        self._session_local: Optional["sessionmaker"] = None
+        self._async_engine: Optional["AsyncEngine"] = None
+        self._async_session_local: Optional["async_sessionmaker"] = None
+
+    def _connect(self) -> None:
+        from sqlalchemy.orm import sessionmaker
+
+        with self._lock:
+            if self._engine is not None:
+                return
+            engine = self.create_engine()
+            async_engine = self.create_async_engine()
+            self._session_local = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            if async_engine is not None:
+                from sqlalchemy.ext.asyncio import async_sessionmaker
+
+                self._async_session_local = async_sessionmaker(
+                    async_engine, autoflush=False, expire_on_commit=False
+                )
+            self._async_engine = async_engine
+            # set last: other threads skip the lock once the engine exists
+            self._engine = engine
+
+    @property
+    def engine(self) -> "Engine":
+        if self._engine is None:
+            self._connect()
+        return self._engine
+
+    @property
+    def SessionLocal(self) -> "sessionmaker":
+        if self._engine is None:
+            self._connect()
+        return self._session_local
+
+    @property
+    def async_engine(self) -> Optional["AsyncEngine"]:
+        if self._engine is None:
+            self._connect()
+        return self._async_engine
+
+    @property
+    def AsyncSessionLocal(self) -> Optional["async_sessionmaker"]:
+        if self._engine is None:
+            self._connect()
+        return self._async_session_local
+
+    def _pool_options(self) -> dict:
+        return {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+
+    def create_engine(self) -> "Engine":
+        from sqlalchemy import create_engine
+        from sqlalchemy.pool import QueuePool
+
+        logger.info("Creating DB engine (pool size %d, max overflow %d)", settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
         try:
             engine = create_engine(
-                url=settings.DATABASE_URL
+                url=settings.DATABASE_URL,
+                poolclass=instrumented_pool_class(QueuePool, self.pool_metrics),
+                **self._pool_options(),
             )
             return engine
         except Exception as e:
-            print(f"Failed to create DB engine: {e}")
+            logger.error(f"Failed to create DB engine: {e}")
+            raise
+
+    def create_async_engine(self) -> Optional["AsyncEngine"]:
+        if not settings.ASYNC_DATABASE_URL:
+            return None
+
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+        logger.info("Creating async DB engine")
+        try:
+            return create_async_engine(
+                settings.ASYNC_DATABASE_URL,
+                poolclass=instrumented_pool_class(AsyncAdaptedQueuePool, self.async_pool_metrics),
+                **self._pool_options(),
+            )
+        except Exception as e:
+            logger.error(f"Failed to create async DB engine: {e}")
             raise
 
+    def pool_status(self) -> dict:
+        """
+        Current occupancy and lifetime counters for each engine's pool
+        """
+        status = {"sync": self._describe_pool(self.engine.pool, self.pool_metrics)}
+        if self.async_engine is not None:
+            status["async"] = self._describe_pool(self.async_engine.pool, self.async_pool_metrics)
+        return status
+
+    @staticmethod
+    def _describe_pool(pool, metrics: PoolMetrics) -> dict:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            **metrics.snapshot(),
+        }
+
 database = Database()
-Base = declarative_base()
+
+def __getattr__(name: str):
+    # Base is declared with the models, so the ORM loads with them
+    if name == "Base":
+        from app.db.models import Base
+        return Base
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def get_db():
     db = database.SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    if database.AsyncSessionLocal is None:
+        raise RuntimeError("ASYNC_DATABASE_URL is not configured")
+
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+def init_db():
+    """
+    Create tables directly for local SQLite databases; Postgres schemas are
+    managed by Alembic migrations, so on Postgres this returns without
+    creating the engine or loading SQLAlchemy.
+    """
+    if not settings.DATABASE_URL.startswith("sqlite"):
+        return
+
+    # registers the models on Base.metadata
+    from app.db.models import Base
+
+    Base.metadata.create_all(bind=database.engine)
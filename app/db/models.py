@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Numeric, Date, DateTime, Boolean, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, DDL, Integer, String, Numeric, Date, DateTime, Boolean, ForeignKey, Index, Text, event
+from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy.sql import func
-from app.db.database import Base
+
+Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
@@ -13,6 +14,7 @@ class User(Base):
     created_at = Column(DateTime, server_default=func.now())
     
     receipts = relationship("Receipt", back_populates="user", cascade="all, delete-orphan")
+    statements = relationship("Statement", back_populates="user")
 
 class Receipt(Base):
     __tablename__ = "receipts"
@@ -37,4 +39,122 @@ class Item(Base):
     unit_price = Column(Numeric(10, 2))
     total_price = Column(Numeric(10, 2))
     
-    receipt = relationship("Receipt", back_populates="items")
\ No newline at end of file
+    receipt = relationship("Receipt", back_populates="items")
+
+class Statement(Base):
+    __tablename__ = "statements"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    file_sha256 = Column(String(64), nullable=False, index=True)
+    filename = Column(String(255))
+    page_count = Column(Integer, nullable=False)
+    parser = Column(String(16), nullable=False)
+    # rows stored with this statement, and rows skipped because an earlier
+    # statement already stored them
+    transaction_count = Column(Integer, nullable=False)
+    duplicate_count = Column(Integer, nullable=False, server_default="0")
+    created_at = Column(DateTime, server_default=func.now())
+
+    user = relationship("User", back_populates="statements")
+    transactions = relationship("TransactionRecord", back_populates="statement", cascade="all, delete-orphan")
+    pages = relationship("StatementPage", back_populates="statement", cascade="all, delete-orphan")
+
+class StatementPage(Base):
+    __tablename__ = "statement_pages"
+    # looked up by (user_id, fingerprint) to skip pages already ingested
+    __table_args__ = (
+        Index("ix_statement_pages_user_id_fingerprint", "user_id", "fingerprint"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    statement_id = Column(Integer, ForeignKey("statements.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    page_number = Column(Integer, nullable=False)
+    fingerprint = Column(String(64), nullable=False)
+    # OCR text of scanned pages, reused instead of OCRing the page again
+    text = Column(Text, nullable=True)
+    # the page's transactions as BankStatementResponse JSON, reused instead
+    # of sending the page to the LLM again; null when the statement's rows
+    # couldn't be attributed to pages
+    rows = Column(Text, nullable=True)
+
+    statement = relationship("Statement", back_populates="pages")
+
+class TransactionRecord(Base):
+    __tablename__ = "transactions"
+    # the (user_id, <group>, date, amount) indexes cover the cashflow
+    # summary queries in app.db.repository
+    __table_args__ = (
+        Index("ix_transactions_user_id_date_amount", "user_id", "date", "amount"),
+        Index("ix_transactions_user_id_category", "user_id", "category", "date", "amount"),
+        Index("ix_transactions_user_id_is_direct", "user_id", "is_direct", "date", "amount"),
+        Index("ix_transactions_amount", "amount"),
+        Index("ix_transactions_category", "category"),
+        # makes ingest idempotent: a row already stored from an overlapping
+        # statement is skipped on insert
+        Index("ix_transactions_fingerprint", "fingerprint", unique=True),
+        # covers the counterparty summary too, as well as exact and prefix
+        # counterparty lookups; substring search uses the trigram index
+        # below on Postgres
+        Index("ix_transactions_user_id_counterparty", "user_id", "counterparty", "date", "amount"),
+        # keyset pagination of search results on (date, id)
+        Index("ix_transactions_user_id_date_id", "user_id", "date", "id"),
+    )
+
+    # SQLite only autoincrements INTEGER primary keys
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    statement_id = Column(Integer, ForeignKey("statements.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    date = Column(Date, nullable=False)
+    transaction = Column(String(255), nullable=False)
+    # the transaction name normalized at ingest, see
+    # app.db.repository.normalize_counterparty
+    counterparty = Column(String(255))
+    amount = Column(Numeric(14, 2), nullable=False)
+    description = Column(Text)
+    category = Column(String(64))
+    is_direct = Column(Boolean, nullable=False)
+    # see app.db.repository.transaction_fingerprints; null for rows stored
+    # before fingerprinting
+    fingerprint = Column(String(64), nullable=True)
+
+    statement = relationship("Statement", back_populates="transactions")
+
+# full-text search over transaction and description. Postgres gets a GIN
+# index on this expression (queries must repeat it verbatim to use the
+# index) and a trigram index for counterparty substrings; SQLite gets an
+# FTS5 table kept in sync by triggers. Created along with the table by
+# create_all; existing databases get them from the migration.
+SEARCH_VECTOR_SQL = "to_tsvector('simple', \"transaction\" || ' ' || coalesce(description, ''))"
+SEARCH_FTS_TABLE = "transactions_fts"
+
+POSTGRES_SEARCH_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"CREATE INDEX ix_transactions_search ON transactions USING gin ({SEARCH_VECTOR_SQL})",
+    "CREATE INDEX ix_transactions_counterparty_trgm ON transactions USING gin (counterparty gin_trgm_ops)",
+)
+SQLITE_SEARCH_DDL = (
+    f"CREATE VIRTUAL TABLE {SEARCH_FTS_TABLE} USING fts5("
+    "\"transaction\", description, content='transactions', content_rowid='id')",
+    f"CREATE TRIGGER {SEARCH_FTS_TABLE}_insert AFTER INSERT ON transactions BEGIN "
+    f"INSERT INTO {SEARCH_FTS_TABLE}(rowid, \"transaction\", description) "
+    "VALUES (new.id, new.\"transaction\", new.description); END",
+    f"CREATE TRIGGER {SEARCH_FTS_TABLE}_delete AFTER DELETE ON transactions BEGIN "
+    f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, \"transaction\", description) "
+    "VALUES ('delete', old.id, old.\"transaction\", old.description); END",
+    f"CREATE TRIGGER {SEARCH_FTS_TABLE}_update AFTER UPDATE ON transactions BEGIN "
+    f"INSERT INTO {SEARCH_FTS_TABLE}({SEARCH_FTS_TABLE}, rowid, \"transaction\", description) "
+    "VALUES ('delete', old.id, old.\"transaction\", old.description); "
+    f"INSERT INTO {SEARCH_FTS_TABLE}(rowid, \"transaction\", description) "
+    "VALUES (new.id, new.\"transaction\", new.description); END",
+)
+
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(
+        TransactionRecord.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql")
+    )
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(
+        TransactionRecord.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+    )
@@ -0,0 +1,515 @@
+import io
+import re
+import csv
+import base64
+import hashlib
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import Integer, case, func, insert, literal, literal_column, select, text, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.db.models import (
+    SEARCH_FTS_TABLE,
+    SEARCH_VECTOR_SQL,
+    Statement,
+    StatementPage,
+    TransactionRecord,
+)
+from app.models.schemas import Transaction
+
+logger = logging.getLogger(__name__)
+
+# fingerprint IN (...) lookups are split to stay under bound parameter limits
+FINGERPRINT_LOOKUP_BATCH = 500
+
+NON_ALPHANUMERIC = re.compile(r"[^0-9A-Z]+")
+# bank transfer prefixes, as they read once normalized ("TRANSFER FR A/C")
+TRANSFER_PREFIX = re.compile(r"^TRANSFER (?:FR|TO) A C (?=\S)")
+SEARCH_TERM = re.compile(r"\w+")
+
+TRANSACTION_COLUMNS = (
+    "statement_id",
+    "user_id",
+    "date",
+    "transaction",
+    "counterparty",
+    "amount",
+    "description",
+    "category",
+    "is_direct",
+    "fingerprint",
+)
+
+# what search and export return for each stored transaction
+STORED_TRANSACTION_COLUMNS = (
+    TransactionRecord.id,
+    TransactionRecord.statement_id,
+    TransactionRecord.date,
+    TransactionRecord.transaction,
+    TransactionRecord.counterparty,
+    TransactionRecord.amount,
+    TransactionRecord.description,
+    TransactionRecord.category,
+    TransactionRecord.is_direct,
+)
+
+
+@dataclass
+class SavedStatement:
+    statement_id: int
+    # indexes of the transactions an earlier statement had already stored
+    duplicates: Set[int]
+
+
+def normalize_name(name: str) -> str:
+    """
+    Upper-case words only, so punctuation and spacing differences between
+    statements don't matter: "Toyyibpay Sdn. Bhd.*" -> "TOYYIBPAY SDN BHD".
+    """
+    return " ".join(NON_ALPHANUMERIC.sub(" ", name.upper()).split())
+
+
+def normalize_counterparty(name: str) -> str:
+    """
+    The normalized name without a bank transfer prefix, so transfers group
+    and search by who they were with: "TRANSFER FR A/C JOHN DOE*" ->
+    "JOHN DOE".
+    """
+    return TRANSFER_PREFIX.sub("", normalize_name(name))
+
+
+def transaction_fingerprints(transactions: Sequence[Transaction], user_id: int) -> List[str]:
+    """
+    One fingerprint per transaction from the user, date, amount and
+    normalized name; the full name rather than the counterparty, so stored
+    fingerprints don't move when counterparty rules change. Identical rows
+    within a statement, e.g. two equal payments on the same day, are told
+    apart by their occurrence ordinal, so both are stored and both match
+    their copies in an overlapping statement.
+    """
+    occurrences = Counter()
+    fingerprints = []
+    for t in transactions:
+        key = "|".join(
+            (
+                str(user_id),
+                t.date.isoformat(),
+                f"{t.amount:.2f}",
+                normalize_name(t.transaction),
+            )
+        )
+        fingerprints.append(hashlib.sha256(f"{key}|{occurrences[key]}".encode()).hexdigest())
+        occurrences[key] += 1
+    return fingerprints
+
+
+def _stored_fingerprints(session: Session, fingerprints: List[str]) -> Set[str]:
+    stored = set()
+    for start in range(0, len(fingerprints), FINGERPRINT_LOOKUP_BATCH):
+        batch = fingerprints[start : start + FINGERPRINT_LOOKUP_BATCH]
+        stored.update(
+            session.scalars(
+                select(TransactionRecord.fingerprint).where(TransactionRecord.fingerprint.in_(batch))
+            )
+        )
+    return stored
+
+
+def ingested_page_fingerprints(
+    session: Session, user_id: Optional[int], fingerprints: List[str]
+) -> Set[str]:
+    """
+    The given page fingerprints that were already saved with one of the
+    user's statements. Anonymous statements are never matched.
+    """
+    ingested = set()
+    if user_id is None:
+        return ingested
+    for start in range(0, len(fingerprints), FINGERPRINT_LOOKUP_BATCH):
+        batch = fingerprints[start : start + FINGERPRINT_LOOKUP_BATCH]
+        ingested.update(
+            session.scalars(
+                select(StatementPage.fingerprint)
+                .where(StatementPage.user_id == user_id)
+                .where(StatementPage.fingerprint.in_(batch))
+                .distinct()
+            )
+        )
+    return ingested
+
+
+def ingested_page_text(session: Session, user_id: int, fingerprint: str) -> Optional[str]:
+    """
+    OCR text of a scanned page saved with one of the user's statements.
+    """
+    return session.scalar(
+        select(StatementPage.text)
+        .where(StatementPage.user_id == user_id)
+        .where(StatementPage.fingerprint == fingerprint)
+        .where(StatementPage.text.is_not(None))
+        .limit(1)
+    )
+
+
+def ingested_page_rows(
+    session: Session, user_id: Optional[int], fingerprints: List[str]
+) -> Dict[str, str]:
+    """
+    Structured rows, as BankStatementResponse JSON, of the given pages saved
+    with one of the user's statements, by page fingerprint.
+    """
+    rows = {}
+    if user_id is None:
+        return rows
+    for start in range(0, len(fingerprints), FINGERPRINT_LOOKUP_BATCH):
+        batch = fingerprints[start : start + FINGERPRINT_LOOKUP_BATCH]
+        for fingerprint, value in session.execute(
+            select(StatementPage.fingerprint, StatementPage.rows)
+            .where(StatementPage.user_id == user_id)
+            .where(StatementPage.fingerprint.in_(batch))
+            .where(StatementPage.rows.is_not(None))
+        ):
+            rows[fingerprint] = value
+    return rows
+
+
+def _transaction_rows(
+    transactions: List[Transaction],
+    fingerprints: List[Optional[str]],
+    statement_id: int,
+    user_id: Optional[int],
+) -> List[dict]:
+    return [
+        {
+            "statement_id": statement_id,
+            "user_id": user_id,
+            "date": t.date,
+            "transaction": t.transaction[:255],
+            "counterparty": normalize_counterparty(t.transaction)[:255],
+            "amount": round(t.amount, 2),
+            "description": t.description,
+            "category": t.category,
+            "is_direct": t.is_direct,
+            "fingerprint": fingerprint,
+        }
+        for t, fingerprint in zip(transactions, fingerprints)
+    ]
+
+
+def _copy_transactions(session: Session, rows: List[dict]) -> None:
+    """
+    Stream rows into a staging table with COPY over the session's psycopg2
+    connection, then move them into transactions, skipping fingerprints
+    another upload stored in the meantime. All inside the session's
+    transaction.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(row[column] for column in TRANSACTION_COLUMNS)
+    buffer.seek(0)
+
+    table = TransactionRecord.__tablename__
+    columns = ", ".join(f'"{column}"' for column in TRANSACTION_COLUMNS)
+    session.execute(
+        text(
+            f"CREATE TEMP TABLE {table}_staging ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table} WITH NO DATA"
+        )
+    )
+    dbapi_connection = session.connection().connection.dbapi_connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(
+            f"COPY {table}_staging ({columns}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    session.execute(
+        text(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_staging "
+            "ON CONFLICT (fingerprint) DO NOTHING"
+        )
+    )
+
+
+def save_statement(
+    session: Session,
+    transactions: List[Transaction],
+    *,
+    file_sha256: str,
+    filename: Optional[str],
+    page_count: int,
+    parser: str,
+    user_id: Optional[int] = None,
+    page_fingerprints: Optional[Dict[int, str]] = None,
+    page_texts: Optional[Dict[int, str]] = None,
+    page_rows: Optional[Dict[int, str]] = None,
+) -> SavedStatement:
+    """
+    Save a statement, its page fingerprints and its new transactions in one
+    DB transaction. Transactions whose fingerprint is already stored, from
+    an overlapping or re-issued statement, are skipped, so ingest is
+    idempotent. Deduplication is per user; anonymous statements are saved
+    without fingerprints. page_texts holds the OCR text to keep for scanned
+    pages, page_rows the structured rows of pages they could be attributed
+    to. Rows are bulk inserted: COPY on Postgres, a single executemany
+    elsewhere.
+    """
+    if user_id is None:
+        fingerprints = [None] * len(transactions)
+    else:
+        fingerprints = transaction_fingerprints(transactions, user_id)
+    page_texts = page_texts or {}
+    page_rows = page_rows or {}
+    try:
+        stored = _stored_fingerprints(session, [f for f in fingerprints if f is not None])
+        duplicates = {i for i, fingerprint in enumerate(fingerprints) if fingerprint in stored}
+        new = [i for i in range(len(transactions)) if i not in duplicates]
+
+        statement_id = session.execute(
+            insert(Statement)
+            .values(
+                user_id=user_id,
+                file_sha256=file_sha256,
+                filename=filename,
+                page_count=page_count,
+                parser=parser,
+                transaction_count=len(new),
+                duplicate_count=len(duplicates),
+            )
+            .returning(Statement.id)
+        ).scalar_one()
+
+        if page_fingerprints:
+            session.execute(
+                insert(StatementPage),
+                [
+                    {
+                        "statement_id": statement_id,
+                        "user_id": user_id,
+                        "page_number": number,
+                        "fingerprint": fingerprint,
+                        "text": page_texts.get(number),
+                        "rows": page_rows.get(number),
+                    }
+                    for number, fingerprint in page_fingerprints.items()
+                ],
+            )
+
+        rows = _transaction_rows(
+            [transactions[i] for i in new], [fingerprints[i] for i in new], statement_id, user_id
+        )
+        if rows:
+            dialect = session.get_bind().dialect.name
+            if dialect == "postgresql":
+                _copy_transactions(session, rows)
+            elif dialect == "sqlite":
+                session.execute(
+                    sqlite_insert(TransactionRecord).on_conflict_do_nothing(
+                        index_elements=["fingerprint"]
+                    ),
+                    rows,
+                )
+            else:
+                session.execute(insert(TransactionRecord), rows)
+
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+
+    logger.info(
+        "Saved statement %d with %d transactions (%d already stored)",
+        statement_id,
+        len(rows),
+        len(duplicates),
+    )
+    return SavedStatement(statement_id=statement_id, duplicates=duplicates)
+
+
+def _user_filter(user_id: Optional[int], column=TransactionRecord.user_id):
+    if user_id is None:
+        return column.is_(None)
+    return column == user_id
+
+
+def _month_expression(session: Session):
+    if session.get_bind().dialect.name == "postgresql":
+        return func.to_char(TransactionRecord.date, "YYYY-MM")
+    return func.strftime("%Y-%m", TransactionRecord.date)
+
+
+def summarize_transactions(
+    session: Session,
+    group_by: str,
+    user_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: Optional[int] = None,
+) -> List[dict]:
+    """
+    Count and total a user's transactions overall ("all") or grouped by
+    month, category, channel (is_direct) or normalized counterparty, so
+    "Toyyibpay Sdn. Bhd.*" and "TOYYIBPAY SDN BHD" share a bucket. Each
+    grouping is served by an index on (user_id, group column, date, amount),
+    so the query is answered from the index without reading table rows.
+    """
+    group_columns = {
+        "month": _month_expression(session),
+        "category": TransactionRecord.category,
+        "channel": TransactionRecord.is_direct,
+        "counterparty": TransactionRecord.counterparty,
+    }
+    if group_by != "all" and group_by not in group_columns:
+        raise ValueError(f"unknown summary grouping: {group_by}")
+
+    amount = TransactionRecord.amount
+    key = group_columns[group_by] if group_by in group_columns else literal(group_by)
+    key = key.label("key")
+
+    query = (
+        select(
+            key,
+            func.count().label("transactions"),
+            func.coalesce(func.sum(case((amount > 0, amount), else_=0)), 0).label("credits"),
+            func.coalesce(func.sum(case((amount < 0, amount), else_=0)), 0).label("debits"),
+        )
+        .where(_user_filter(user_id))
+    )
+    if group_by in group_columns:
+        query = query.group_by(key)
+    if start is not None:
+        query = query.where(TransactionRecord.date >= start)
+    if end is not None:
+        query = query.where(TransactionRecord.date <= end)
+
+    if group_by == "month":
+        query = query.order_by(key)
+    else:
+        query = query.order_by(func.sum(func.abs(amount)).desc())
+    if limit is not None:
+        query = query.limit(limit)
+
+    rows = []
+    for row in session.execute(query):
+        if group_by == "channel":
+            row_key = "direct" if row.key else "payment_gateway"
+        else:
+            row_key = str(row.key)
+        rows.append(
+            {
+                "key": row_key,
+                "transactions": row.transactions,
+                "credits": float(row.credits),
+                "debits": float(row.debits),
+                "net": float(row.credits + row.debits),
+            }
+        )
+    return rows
+
+
+def encode_cursor(row_date: date, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{row_date.isoformat()}:{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[date, int]:
+    try:
+        row_date, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return date.fromisoformat(row_date), int(row_id)
+    except ValueError:
+        raise ValueError("invalid cursor")
+
+
+def _text_match(session: Session, terms: List[str]):
+    """
+    Condition matching transactions whose name or description contains a
+    word starting with each term, served by the dialect's full-text index.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        return literal_column(SEARCH_VECTOR_SQL).op("@@")(func.to_tsquery("simple", tsquery))
+    if dialect == "sqlite":
+        matches = text(
+            f"SELECT rowid FROM {SEARCH_FTS_TABLE} WHERE {SEARCH_FTS_TABLE} MATCH :match"
+        ).bindparams(match=" ".join(f'"{term}"*' for term in terms))
+        return TransactionRecord.id.in_(matches.columns(rowid=Integer))
+    # no full-text index: substring match on each term
+    searched = TransactionRecord.transaction + " " + func.coalesce(TransactionRecord.description, "")
+    return func.lower(searched).contains(" ".join(terms))
+
+
+def search_transactions(
+    session: Session,
+    user_id: Optional[int] = None,
+    query: Optional[str] = None,
+    counterparty: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    A page of the user's transactions, newest first, matching a full-text
+    query over the transaction name and description and/or a counterparty
+    substring. Pages are keyset paginated on (date, id): the cursor returned
+    with a page resumes right after its last row, so deep pages cost the
+    same as the first. Returns the rows and the next cursor, or None on the
+    last page.
+    """
+    statement = select(*STORED_TRANSACTION_COLUMNS).where(_user_filter(user_id))
+
+    terms = SEARCH_TERM.findall((query or "").lower())
+    if terms:
+        statement = statement.where(_text_match(session, terms))
+    if counterparty and (normalized := normalize_counterparty(counterparty)):
+        # only letters, digits and spaces remain, so no LIKE wildcards
+        statement = statement.where(TransactionRecord.counterparty.like(f"%{normalized}%"))
+    if start is not None:
+        statement = statement.where(TransactionRecord.date >= start)
+    if end is not None:
+        statement = statement.where(TransactionRecord.date <= end)
+    if cursor is not None:
+        statement = statement.where(
+            tuple_(TransactionRecord.date, TransactionRecord.id) < decode_cursor(cursor)
+        )
+
+    statement = statement.order_by(TransactionRecord.date.desc(), TransactionRecord.id.desc())
+    # one extra row tells whether there is a next page
+    rows = session.execute(statement.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].date, rows[-1].id)
+    return [{**row._asdict(), "amount": float(row.amount)} for row in rows], next_cursor
+
+
+def iter_transactions(
+    session: Session,
+    user_id: Optional[int] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    categories: Sequence[str] = (),
+    batch_size: int = 1000,
+) -> Iterator[List[tuple]]:
+    """
+    Stream the user's transactions, oldest first, as lists of up to
+    batch_size row tuples in STORED_TRANSACTION_COLUMNS order. yield_per
+    reads through a server-side cursor on Postgres, so only one batch is
+    held in memory however many rows match.
+    """
+    statement = select(*STORED_TRANSACTION_COLUMNS).where(_user_filter(user_id))
+    if start is not None:
+        statement = statement.where(TransactionRecord.date >= start)
+    if end is not None:
+        statement = statement.where(TransactionRecord.date <= end)
+    if categories:
+        statement = statement.where(TransactionRecord.category.in_(categories))
+
+    statement = statement.order_by(TransactionRecord.date, TransactionRecord.id)
+    result = session.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
@@ -1,21 +1,38 @@
 import sys
+import asyncio
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import logging
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from app.api.routes import router
+from app.config import LOG_FORMAT, MAX_BATCH_FILES, STARTUP_WARMUP
+from app.db.database import database, init_db
+from app.request_context import JsonFormatter, RequestIdFilter, RequestIdMiddleware
+from app.services.ai import close_client
+from app.services.jobs import job_queue
+from app.services.metrics import bind_gauges
+from app.services.pdf_parser import ocr_engine
+from app.services.rate_limit import llm_scheduler
+from app.services.uploads import UploadSizeLimitMiddleware, upload_request_limit
+from app.services.warmup import warm_up
 
 load_dotenv()
 
 # setup logger
 logger = logging.getLogger(__name__)
-formatter = logging.Formatter(
-    "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S",
-)
+if LOG_FORMAT == "json":
+    formatter = JsonFormatter(datefmt="%Y-%m-%dT%H:%M:%S")
+else:
+    formatter = logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 handler = logging.StreamHandler(sys.stdout)
 handler.setFormatter(formatter)
+handler.addFilter(RequestIdFilter())
 
 root_logger = logging.getLogger()
 root_logger.setLevel(logging.INFO)
@@ -28,10 +45,32 @@ for name in logging.root.manager.loggerDict:
         uvicorn_logger.addHandler(handler)
         uvicorn_logger.propagate = False
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    bind_gauges(job_queue, llm_scheduler, database)
+    await job_queue.start()
+    warm_up_task = asyncio.create_task(warm_up()) if STARTUP_WARMUP else None
+    yield
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    await job_queue.stop()
+    ocr_engine.shutdown()
+    await close_client()
+
+
 app = FastAPI(
     title="Bank Statement Processing API",
     description="API for scanning and processing bank statement",
     version="1.0.0",
+    lifespan=lifespan,
+)
+
+# innermost, so a 413 still gets the CORS and request ID headers
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_bytes=upload_request_limit(),
+    path_limits={"/api/v1/files/batch": upload_request_limit(MAX_BATCH_FILES)},
 )
 
 app.add_middleware(
@@ -41,7 +80,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(RequestIdMiddleware)
+
 app.include_router(router, prefix="/api/v1")
 
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
@@ -1,6 +1,6 @@
 from datetime import date
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Literal, Optional
 
 class Transaction(BaseModel):
     date: date
@@ -11,4 +11,77 @@ class Transaction(BaseModel):
     is_direct: bool
 
 class BankStatementResponse(BaseModel):
-    transactions: List[Transaction]
\ No newline at end of file
+    transactions: List[Transaction]
+
+class PageExtraction(BaseModel):
+    page: int
+    method: Literal["text_layer", "ocr"]
+    chars: int
+    # already ingested with an earlier statement; scanned pages reuse the
+    # stored OCR text
+    duplicate: bool = False
+
+class CleanupStats(BaseModel):
+    chars_before: int
+    chars_after: int
+    tokens_before: int
+    tokens_after: int
+
+class StatementUploadResponse(BankStatementResponse):
+    pages: List[PageExtraction]
+    parser: Literal["rules", "llm"] = "llm"
+    cleanup: Optional[CleanupStats] = None
+    statement_id: Optional[int] = None
+    # indexes of the transactions an earlier statement already stored; they
+    # are returned but not stored again
+    duplicates: List[int] = []
+
+
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+
+class StageProgress(BaseModel):
+    completed: int
+    total: int
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    status: str
+    filename: Optional[str]
+    stages: Dict[str, StageProgress]
+    result: Optional[StatementUploadResponse] = None
+    error: Optional[str] = None
+
+class BatchFileResult(BaseModel):
+    filename: Optional[str]
+    status: Literal["succeeded", "failed"]
+    result: Optional[StatementUploadResponse] = None
+    error: Optional[str] = None
+    error_status: Optional[int] = None
+
+class BatchUploadResponse(BaseModel):
+    files: List[BatchFileResult]
+    succeeded: int
+    failed: int
+
+class CashflowBucket(BaseModel):
+    key: str
+    transactions: int
+    credits: float
+    debits: float
+    net: float
+
+class CashflowSummaryResponse(BaseModel):
+    group_by: str
+    buckets: List[CashflowBucket]
+
+class StoredTransaction(Transaction):
+    id: int
+    statement_id: int
+    counterparty: Optional[str]
+
+class TransactionSearchResponse(BaseModel):
+    results: List[StoredTransaction]
+    # pass as cursor to get the next page; null on the last page
+    next_cursor: Optional[str] = None
@@ -1,21 +1,29 @@
 import os
 import json
+import asyncio
 import logging
-from typing import Type, Dict, List
+from typing import Callable, Dict, List, Optional, Tuple, Type, Union
 from dotenv import load_dotenv
-from groq import Groq
-from app.models.schemas import BankStatementResponse
-from pydantic import BaseModel, ValidationError
-from app.config import MAX_CHARS_PER_CHUNK, SYSTEM_PROMPT
+from app.models.schemas import BankStatementResponse, Transaction
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from app.config import (
+    LLM_HTTP_MAX_CONNECTIONS,
+    LLM_MODEL,
+    OUTPUT_TOKENS_PER_INPUT_TOKEN,
+)
+from app.services.chunker import chunk_token_budget, estimate_tokens, split_into_chunks
+from app.services.metrics import DROPPED_TRANSACTIONS, LLM_TOKENS, STAGE_SECONDS
+from app.services.prompt import prompt_overhead_tokens, system_prompt, user_message
+from app.services.rate_limit import RateLimitExhausted, llm_scheduler
 
 load_dotenv()
 
 API_KEY = os.getenv("GROQ_API_KEY")
 
-client = Groq(
-    api_key=API_KEY,
-    max_retries=3,
-)
+# one client per process so every request shares the same connection pool;
+# created on first use so importing the app doesn't load the SDK
+_client = None
+_http_client = None
 
 
 class AIExtractionError(Exception):
@@ -28,107 +36,224 @@ class SchemaValidationError(Exception):
 
 logger = logging.getLogger(__name__)
 
+# built once and reused for every row that needs validating on its own
+TRANSACTION_ADAPTER = TypeAdapter(Transaction)
 
-def split_into_chunks(text: str, max_chars: int) -> List[str]:
+def get_client():
     """
-    Split text into chunks by line boundaries
+    The shared AsyncGroq client. Retries are left to the rate-limit
+    scheduler.
     """
-    lines = text.splitlines()
+    global _client, _http_client
+    if _client is None:
+        import httpx
+        from groq import AsyncGroq, DefaultAsyncHttpxClient
+
+        _http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_MAX_CONNECTIONS,
+            ),
+        )
+        _client = AsyncGroq(api_key=API_KEY, max_retries=0, http_client=_http_client)
+    return _client
+
+
+async def warm_up_client() -> None:
+    """
+    Open a connection to the API host so the first chunk doesn't wait for
+    DNS, TCP and TLS setup. The request is unauthenticated and doesn't count
+    against the rate limits; any response leaves the connection pooled.
+    """
+    import httpx
+
+    # loading the SDK takes a while; keep it off the event loop
+    client = await asyncio.to_thread(get_client)
+    try:
+        await _http_client.head(str(client.base_url))
+    except httpx.HTTPError as e:
+        logger.warning("LLM connection warm-up failed: %s", e)
+        return
+    logger.info("LLM connection pool ready (%s)", client.base_url)
+
 
-    header_lines = []
-    for line in lines[:10]:
-        if line.strip():
-            header_lines.append(line)
-        if len(header_lines) >= 3:
-            break
-    header = "\n".join(header_lines) + "\n"
+async def close_client() -> None:
+    global _client, _http_client
+    if _client is not None:
+        await _client.close()
+        _client = _http_client = None
 
-    chunks = []
-    current_chunk_lines = []
-    current_length = len(header)
 
-    for line in lines:
-        line_len = len(line) + 1
-        if current_length + line_len > max_chars and current_chunk_lines:
-            chunks.append(header + "\n".join(current_chunk_lines))
-            current_chunk_lines = [line]
-            current_length = len(header) + line_len
-        else:
-            current_chunk_lines.append(line)
-            current_length += line_len
+def parse_transactions(content: Union[str, bytes]) -> List[Transaction]:
+    """
+    Validate an LLM response from raw JSON into Transaction models in one
+    pass. If any row is invalid, fall back to validating row by row and
+    drop only the rows that fail.
+    """
+    try:
+        return BankStatementResponse.model_validate_json(content).transactions
+    except ValidationError:
+        pass
 
-    if current_chunk_lines:
-        chunks.append(header + "\n".join(current_chunk_lines))
+    try:
+        parsed = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise AIExtractionError(f"failed to parse LLM response as JSON: {e}\n")
 
-    return chunks
+    rows = parsed.get("transactions", []) if isinstance(parsed, dict) else None
+    if not isinstance(rows, list):
+        raise AIExtractionError("LLM response has no transactions list")
 
+    transactions = []
+    for row in rows:
+        try:
+            transactions.append(TRANSACTION_ADAPTER.validate_python(row))
+        except ValidationError as e:
+            DROPPED_TRANSACTIONS.inc()
+            logger.info("Dropping invalid transaction (%d errors): %s", e.error_count(), row)
+    return transactions
 
-def extract_transactions_from_chunk(chunk: str, response_schema: dict) -> List[Dict]:
+
+def reserved_tokens(chunk: str) -> int:
     """
-    Send a single chunk to the LLM and return the list of transactions.
+    Tokens the scheduler reserves for one chunk's call: the fixed prompt,
+    the chunk and its expected JSON output.
     """
-    chat_completion = client.chat.completions.create(
-        messages=[
-            {
-                "role": "system",
-                "content": f"{SYSTEM_PROMPT}\nSchema to follow: {json.dumps(response_schema, indent=2)}",
-            },
-            {
-                "role": "user",
-                "content": f"Now extract from this statement chunk:\n\n{chunk}",
-            },
-        ],
-        model="llama-3.3-70b-versatile",
-        response_format={"type": "json_object"},
-        temperature=0.1,
+    chunk_tokens = estimate_tokens(chunk)
+    return prompt_overhead_tokens() + chunk_tokens + int(
+        chunk_tokens * OUTPUT_TOKENS_PER_INPUT_TOKEN
     )
 
+
+async def extract_transactions_from_chunk(chunk: str, priority: int = 0) -> List[Transaction]:
+    """
+    Send a single chunk to the LLM through the rate-limit scheduler and
+    return its validated transactions. Lower priority values are sent first.
+    """
+    overhead_tokens = prompt_overhead_tokens()
+    estimated_tokens = reserved_tokens(chunk)
+
+    async def call():
+        with STAGE_SECONDS.labels("llm_call").time():
+            response = await get_client().chat.completions.with_raw_response.create(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": system_prompt(),
+                    },
+                    {
+                        "role": "user",
+                        "content": user_message(chunk),
+                    },
+                ],
+                model=LLM_MODEL,
+                response_format={"type": "json_object"},
+                temperature=0.1,
+            )
+        completion = await response.parse()
+        used_tokens = completion.usage.total_tokens if completion.usage else None
+        return completion, response.headers, used_tokens
+
+    try:
+        chat_completion = await llm_scheduler.run(call, estimated_tokens, priority)
+    except RateLimitExhausted as e:
+        raise AIExtractionError(str(e))
+
     message = chat_completion.choices[0].message
     response_text = message.content
 
     usage = chat_completion.usage
 
     if usage:
-        logger.warning(
-            "Groq usage — prompt_tokens: %d, completion_tokens: %d, total_tokens: %d",
+        LLM_TOKENS.labels("prompt").inc(usage.prompt_tokens)
+        LLM_TOKENS.labels("prompt_overhead").inc(overhead_tokens)
+        LLM_TOKENS.labels("completion").inc(usage.completion_tokens)
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None) or 0
+        LLM_TOKENS.labels("prompt_cached").inc(cached_tokens)
+        logger.info(
+            "Groq usage — prompt_tokens: %d (fixed prefix ~%d, %.0f%%; cached %d), "
+            "completion_tokens: %d, total_tokens: %d (estimated %d)",
             usage.prompt_tokens,
+            overhead_tokens,
+            100 * overhead_tokens / max(1, usage.prompt_tokens),
+            cached_tokens,
             usage.completion_tokens,
             usage.total_tokens,
+            estimated_tokens,
         )
 
-    try:
-        parsed = json.loads(str(response_text))
-        return parsed.get("transactions", [])
-    except json.JSONDecodeError as e:
-        raise AIExtractionError(f"failed to parse LLM response as JSON: {e}\n")
+    with STAGE_SECONDS.labels("validate").time():
+        return parse_transactions(response_text or "")
 
 
-def generate_formatted_data(parsed_text: str) -> Dict:
+class ChunkMerger:
     """
-    Extract structured transaction data from raw text.
-    Automatically chunks large statements to stay within token limits.
+    Merges per-chunk transactions in document order as chunks complete,
+    possibly out of order. Chunks never share transaction rows, so every
+    row is kept, including identical rows on either side of a boundary.
     """
-    response_schema = BankStatementResponse.model_json_schema()
 
+    def __init__(self):
+        self.transactions: List[Transaction] = []
+        self._buffered: Dict[int, List[Transaction]] = {}
+        self._next_index = 0
+
+    def add(
+        self, index: int, transactions: List[Transaction]
+    ) -> List[Tuple[int, List[Transaction]]]:
+        """
+        Buffer a chunk's result and return the (index, transactions) of every
+        chunk that can now be released in order.
+        """
+        self._buffered[index] = transactions
+        released = []
+
+        while self._next_index in self._buffered:
+            chunk = self._buffered.pop(self._next_index)
+            self.transactions.extend(chunk)
+            released.append((self._next_index, chunk))
+            self._next_index += 1
+
+        return released
+
+
+async def generate_formatted_data(
+    parsed_text: str,
+    on_chunk: Optional[Callable[[int, List[Transaction], int], None]] = None,
+) -> BankStatementResponse:
+    """
+    Extract structured transaction data from raw text. Each chunk's rows are
+    validated as they arrive, so the merged statement is built without
+    validating again.
+    Large statements are chunked and each chunk is extracted concurrently
+    through the shared rate-limit scheduler, earlier chunks first so results
+    can be released in order. on_chunk is called in document order with
+    (chunk index, the chunk's transactions, total chunks) as chunks
+    complete; rows repeated across chunks are all kept.
+    """
     try:
-        if len(parsed_text) <= MAX_CHARS_PER_CHUNK:
-            logger.warning("Text fits in single chunk (%d chars)", len(parsed_text))
-            transactions = extract_transactions_from_chunk(parsed_text, response_schema)
-        else:
-            chunks = split_into_chunks(parsed_text, MAX_CHARS_PER_CHUNK)
-            logger.warning(
-                "Text split into %d chunks (total %d chars, ~%d chars each)",
-                len(chunks),
-                len(parsed_text),
-                MAX_CHARS_PER_CHUNK,
-            )
+        budget = chunk_token_budget(prompt_overhead_tokens())
+        with STAGE_SECONDS.labels("chunk").time():
+            chunks = split_into_chunks(parsed_text, budget)
+        logger.info(
+            "Text split into %d chunks (~%d tokens total, budget %d tokens per chunk)",
+            len(chunks),
+            estimate_tokens(parsed_text),
+            budget,
+        )
 
-            all_chunks_text = "\n\n---NEXT CHUNK---\n\n".join(chunks)
-            transactions = extract_transactions_from_chunk(
-                all_chunks_text, response_schema
-            )
+        merger = ChunkMerger()
+
+        async def extract(index: int, chunk: str) -> None:
+            transactions = await extract_transactions_from_chunk(chunk, priority=index)
+            for released_index, released in merger.add(index, transactions):
+                if on_chunk:
+                    on_chunk(released_index, released, len(chunks))
+
+        await asyncio.gather(*(extract(i, chunk) for i, chunk in enumerate(chunks)))
 
-        return {"transactions": transactions}
+        return BankStatementResponse.model_construct(transactions=merger.transactions)
 
     except Exception as e:
         if isinstance(e, AIExtractionError):
@@ -136,9 +261,16 @@ def generate_formatted_data(parsed_text: str) -> Dict:
         raise AIExtractionError(f"failed to extract receipt data: {e}")
 
 
-def validate_json_with_schema(parsed_json: dict, schema: Type[BaseModel]) -> BaseModel:
+def validate_json_with_schema(
+    parsed_json: Union[dict, str, bytes], schema: Type[BaseModel]
+) -> BaseModel:
+    """
+    Validate a dict, or raw JSON in a single pass without building dicts
+    first.
+    """
     try:
-        receipt = schema(**parsed_json)
-        return receipt
+        if isinstance(parsed_json, (str, bytes)):
+            return schema.model_validate_json(parsed_json)
+        return schema.model_validate(parsed_json)
     except ValidationError as e:
         raise SchemaValidationError(f"failed to validate json to schema: {e}")
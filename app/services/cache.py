@@ -0,0 +1,183 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+from typing import List, Optional
+from app.config import CACHE_DB_PATH, CACHE_MAX_BYTES, TEXT_LAYER_MIN_CHARS
+from app.models.schemas import BankStatementResponse
+from app.services.prompt import prompt_version
+from app.services.metrics import CACHE_REQUESTS
+from app.services.pdf_parser import ExtractedPage, PDFSource, ocr_engine
+
+logger = logging.getLogger(__name__)
+
+
+def content_digest(source: PDFSource) -> str:
+    if isinstance(source, bytes):
+        return hashlib.sha256(source).hexdigest()
+
+    sha256 = hashlib.sha256()
+    with open(source, "rb") as f:
+        while block := f.read(1024 * 1024):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+class LRUCache:
+    """
+    In-memory tier. Evicts least recently used entries once the total size of
+    stored values exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+
+            self._entries[key] = value
+            self._size += len(value)
+
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+class SQLiteCache:
+    """
+    On-disk tier backed by a single SQLite file so cached extractions survive
+    restarts.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value BLOB NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._conn.commit()
+
+
+class ExtractionCache:
+    """
+    Content-addressed cache for the two expensive pipeline stages. Extracted
+    pages are keyed on the upload and the extraction settings, validated
+    statements on the cleaned text they were structured from, so a change
+    to OCR, text layer or cleanup settings that alters the text misses the
+    statement cache too, and a prompt or model change only invalidates the
+    LLM stage. OCR text is also kept per scanned page, so a page reappearing
+    in another upload isn't OCRed again.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, db_path: Optional[str] = CACHE_DB_PATH):
+        self.memory = LRUCache(max_bytes)
+        self.disk = SQLiteCache(db_path) if db_path else None
+
+    def _get(self, key: str) -> Optional[bytes]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.memory.set(key, value)
+        return value
+
+    def _set(self, key: str, value: bytes) -> None:
+        self.memory.set(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value)
+
+    @staticmethod
+    def _ocr_settings_hash() -> str:
+        return hashlib.sha256(ocr_engine.settings.fingerprint().encode()).hexdigest()[:12]
+
+    def _pages_key(self, digest: str) -> str:
+        return f"pages:{TEXT_LAYER_MIN_CHARS}:{self._ocr_settings_hash()}:{digest}"
+
+    def _page_text_key(self, fingerprint: str) -> str:
+        return f"page:{self._ocr_settings_hash()}:{fingerprint}"
+
+    @staticmethod
+    def _statement_key(text: str) -> str:
+        return f"statement:{prompt_version()}:{content_digest(text.encode())}"
+
+    def get_pages(self, digest: str) -> Optional[List[ExtractedPage]]:
+        value = self._get(self._pages_key(digest))
+        if value is None:
+            CACHE_REQUESTS.labels("pages", "miss").inc()
+            return None
+        CACHE_REQUESTS.labels("pages", "hit").inc()
+        logger.info("Page cache hit for %s", digest)
+        return [ExtractedPage(**page) for page in json.loads(value)]
+
+    def set_pages(self, digest: str, pages: List[ExtractedPage]) -> None:
+        value = json.dumps([asdict(page) for page in pages]).encode()
+        self._set(self._pages_key(digest), value)
+
+    def get_page_text(self, fingerprint: str) -> Optional[str]:
+        """
+        OCR text of a scanned page seen before, in this or another upload.
+        """
+        value = self._get(self._page_text_key(fingerprint))
+        CACHE_REQUESTS.labels("page", "miss" if value is None else "hit").inc()
+        return None if value is None else value.decode()
+
+    def set_page_text(self, fingerprint: str, text: str) -> None:
+        self._set(self._page_text_key(fingerprint), text.encode())
+
+    def get_statement(self, text: str) -> Optional[BankStatementResponse]:
+        """
+        The statement structured earlier from exactly this cleaned text.
+        """
+        key = self._statement_key(text)
+        value = self._get(key)
+        if value is None:
+            CACHE_REQUESTS.labels("statement", "miss").inc()
+            return None
+        CACHE_REQUESTS.labels("statement", "hit").inc()
+        logger.info("Statement cache hit for %s", key)
+        return BankStatementResponse.model_validate_json(value)
+
+    def set_statement(self, text: str, statement: BankStatementResponse) -> None:
+        value = statement.model_dump_json().encode()
+        self._set(self._statement_key(text), value)
+
+
+extraction_cache = ExtractionCache()
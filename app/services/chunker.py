@@ -0,0 +1,120 @@
+import re
+import math
+from typing import List
+from app.config import (
+    CHARS_PER_TOKEN,
+    CHUNK_TARGET_TOKENS,
+    LLM_CONTEXT_TOKENS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_OUTPUT_TOKENS,
+    LLM_TPM_LIMIT,
+    OUTPUT_TOKENS_PER_INPUT_TOKEN,
+)
+
+# a transaction row starts with a day/month date, e.g. "15/03", "15-03-2024"
+# or "15 MAR", followed by the row's content; a bare "1/3" is a page number
+DATE_ROW_PATTERN = re.compile(
+    r"^\s*\|?\s*(\d{1,2}[/\-.]\d{1,2}([/\-.]\d{2,4})?|\d{1,2}\s+[A-Za-z]{3})\b"
+    r"(?![/\-.]\d)(?=\s*\|?\s*[^\s|])"
+)
+
+HEADER_LINES = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for budgeting; statement text tokenizes at roughly
+    CHARS_PER_TOKEN characters per token.
+    """
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def is_transaction_row(line: str) -> bool:
+    return DATE_ROW_PATTERN.match(line) is not None
+
+
+def chunk_token_budget(prompt_tokens: int) -> int:
+    """
+    Input tokens one chunk may use so that the prompt, the chunk and the
+    expected JSON output all fit the model's context and output limits, and
+    LLM_MAX_CONCURRENCY such calls fit the per-minute token quota together.
+    A chunk reserving more than the whole quota would leave every call
+    waiting for a full bucket, one at a time.
+    """
+    by_context = (LLM_CONTEXT_TOKENS - prompt_tokens) / (1 + OUTPUT_TOKENS_PER_INPUT_TOKEN)
+    by_output = LLM_MAX_OUTPUT_TOKENS / OUTPUT_TOKENS_PER_INPUT_TOKEN
+    by_rate = (LLM_TPM_LIMIT / max(1, LLM_MAX_CONCURRENCY) - prompt_tokens) / (
+        1 + OUTPUT_TOKENS_PER_INPUT_TOKEN
+    )
+    return max(1, int(min(CHUNK_TARGET_TOKENS, by_context, by_output, by_rate)))
+
+
+def _group_rows(lines: List[str]) -> List[List[str]]:
+    """
+    Group lines into rows: each transaction row plus its continuation lines.
+    Lines before the first transaction row form a row of their own.
+    """
+    rows = []
+    current: List[str] = []
+    for line in lines:
+        if is_transaction_row(line) and current:
+            rows.append(current)
+            current = []
+        current.append(line)
+    if current:
+        rows.append(current)
+    return rows
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Split text into chunks of at most max_tokens estimated tokens in a single
+    pass, breaking only between transaction rows where possible. Chunks after
+    the first repeat up to HEADER_LINES of the statement's lines before its
+    first transaction row, so the model still sees the statement date but no
+    row is extracted twice.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+
+    # budget in characters so rows are measured without building strings
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    header_lines = []
+    for line in lines[:HEADER_LINES]:
+        if is_transaction_row(line):
+            break
+        header_lines.append(line)
+    header_chars = sum(len(line) + 1 for line in header_lines)
+
+    chunks = []
+    current: List[str] = []
+    current_chars = 0
+
+    def flush() -> None:
+        nonlocal current, current_chars
+        if current:
+            prefix = header_lines if chunks else []
+            chunks.append("\n".join(prefix + current))
+        current = []
+        current_chars = header_chars
+
+    for row in _group_rows(lines):
+        row_chars = sum(len(line) + 1 for line in row)
+
+        if row_chars <= max_chars - header_chars:
+            if current and current_chars + row_chars > max_chars:
+                flush()
+            current.extend(row)
+            current_chars += row_chars
+            continue
+
+        # a single row larger than the budget is split on line boundaries
+        for line in row:
+            if current and current_chars + len(line) + 1 > max_chars:
+                flush()
+            current.append(line)
+            current_chars += len(line) + 1
+
+    flush()
+    return chunks
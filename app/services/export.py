@@ -0,0 +1,212 @@
+import io
+import csv
+import logging
+from datetime import date
+from typing import Iterable, Iterator, List, Optional, Sequence
+from app.config import EXPORT_BATCH_ROWS
+from app.db.database import database
+from app.models.schemas import Transaction
+from app.services.metrics import EXPORTED_TRANSACTIONS
+
+logger = logging.getLogger(__name__)
+
+CSV = "csv"
+PARQUET = "parquet"
+ARROW = "arrow"
+
+MEDIA_TYPES = {
+    CSV: "text/csv",
+    PARQUET: "application/vnd.apache.parquet",
+    ARROW: "application/vnd.apache.arrow.stream",
+}
+
+# app.db.repository.STORED_TRANSACTION_COLUMNS, named here so importing the
+# export formats doesn't load the ORM
+STORED_COLUMNS = (
+    "id",
+    "statement_id",
+    "date",
+    "transaction",
+    "counterparty",
+    "amount",
+    "description",
+    "category",
+    "is_direct",
+)
+# statement exports add whether the row was already stored by an earlier upload
+STATEMENT_COLUMNS = tuple(Transaction.model_fields) + ("duplicate",)
+
+# Arrow type of every exported column; amounts are floats as in the JSON API
+COLUMN_TYPES = {
+    "id": "int64",
+    "statement_id": "int64",
+    "date": "date32",
+    "transaction": "string",
+    "counterparty": "string",
+    "amount": "float64",
+    "description": "string",
+    "category": "string",
+    "is_direct": "bool_",
+    "duplicate": "bool_",
+}
+
+
+class ExportFormatUnavailable(Exception):
+    pass
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise ExportFormatUnavailable("parquet and arrow exports need pyarrow installed")
+    return pyarrow
+
+
+def check_export_format(export_format: str) -> None:
+    """
+    Raise ExportFormatUnavailable before any work is done when the format's
+    optional dependency is missing.
+    """
+    if export_format != CSV:
+        _import_pyarrow()
+
+
+class _Drain(io.RawIOBase):
+    """
+    Write target for the Arrow writers that hands back what was written
+    since the last drain. tell() keeps counting across drains, since Parquet
+    records absolute offsets in its footer.
+    """
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._written = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._written += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._written
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _csv_chunks(columns: Sequence[str], batches: Iterable[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue().encode()
+
+
+def _record_batch(pa, schema, batch: List[tuple]):
+    arrays = []
+    for field, values in zip(schema, zip(*batch)):
+        if field.type == pa.float64():
+            # Numeric columns come back from the database as Decimal
+            values = [None if value is None else float(value) for value in values]
+        arrays.append(pa.array(values, type=field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _arrow_chunks(
+    export_format: str, columns: Sequence[str], batches: Iterable[List[tuple]]
+) -> Iterator[bytes]:
+    pa = _import_pyarrow()
+    schema = pa.schema([(column, getattr(pa, COLUMN_TYPES[column])()) for column in columns])
+    sink = _Drain()
+    if export_format == PARQUET:
+        writer = pa.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    # each batch becomes one Parquet row group or Arrow record batch
+    with writer:
+        for batch in batches:
+            if batch:
+                writer.write_batch(_record_batch(pa, schema, batch))
+                yield sink.drain()
+    yield sink.drain()
+
+
+def export_stream(
+    export_format: str, columns: Sequence[str], batches: Iterable[List[tuple]]
+) -> Iterator[bytes]:
+    """
+    Encode batches of row tuples as CSV, Parquet or an Arrow IPC stream,
+    yielding the bytes of each batch as soon as it is written, so an export
+    holds one batch in memory at a time.
+    """
+    exported = EXPORTED_TRANSACTIONS.labels(export_format)
+
+    def counted() -> Iterator[List[tuple]]:
+        for batch in batches:
+            exported.inc(len(batch))
+            yield batch
+
+    if export_format == CSV:
+        return _csv_chunks(columns, counted())
+    return _arrow_chunks(export_format, columns, counted())
+
+
+def stored_transaction_batches(
+    user_id: Optional[int],
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    categories: Sequence[str] = (),
+) -> Iterator[List[tuple]]:
+    """
+    The user's stored transactions in STORED_COLUMNS order, read in
+    EXPORT_BATCH_ROWS batches. The session stays open until the last batch
+    is read or the consumer stops early.
+    """
+    from app.db.repository import iter_transactions
+
+    with database.SessionLocal() as session:
+        yield from iter_transactions(
+            session, user_id, start, end, categories, batch_size=EXPORT_BATCH_ROWS
+        )
+
+
+def statement_transaction_batches(
+    transactions: List[Transaction],
+    duplicates: Sequence[int] = (),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    categories: Sequence[str] = (),
+) -> Iterator[List[tuple]]:
+    """
+    A processed statement's transactions in STATEMENT_COLUMNS order, with
+    the same filters as stored exports. duplicates holds the indexes of
+    transactions already stored, as in the upload response.
+    """
+    duplicates = set(duplicates)
+    rows = (
+        tuple(getattr(t, column) for column in Transaction.model_fields) + (i in duplicates,)
+        for i, t in enumerate(transactions)
+        if (start is None or t.date >= start)
+        and (end is None or t.date <= end)
+        and (not categories or t.category in categories)
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == EXPORT_BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,158 @@
+import time
+import uuid
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from app.config import JOB_QUEUE_MAX_DEPTH, JOB_RESULT_TTL_SECONDS, JOB_WORKERS
+from app.models.schemas import StatementUploadResponse
+from app.request_context import request_id_var
+from app.services.pipeline import STAGES, PipelineEvent, process_statement
+from app.services.uploads import SpooledUpload
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    filename: Optional[str]
+    upload: Optional[SpooledUpload]
+    user_id: Optional[int] = None
+    status: str = QUEUED
+    stages: Dict[str, Dict[str, int]] = field(
+        default_factory=lambda: {stage: {"completed": 0, "total": 0} for stage in STAGES}
+    )
+    result: Optional[StatementUploadResponse] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    # ID of the request that submitted the job, so its logs can be tied back
+    request_id: str = field(default_factory=request_id_var.get)
+    finished_at: Optional[float] = None
+
+    def update_stage(self, event: PipelineEvent) -> None:
+        self.stages[event.stage] = {"completed": event.completed, "total": event.total}
+
+
+class JobQueue:
+    """
+    Bounded in-process queue of statement processing jobs drained by a fixed
+    pool of asyncio workers. Submissions beyond max_depth are rejected so a
+    load spike cannot buffer unbounded uploads in memory.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        max_depth: int = JOB_QUEUE_MAX_DEPTH,
+        result_ttl: float = JOB_RESULT_TTL_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.result_ttl = result_ttl
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"job-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Started %d job workers (max queue depth %d)", self.workers, self.max_depth)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # jobs still queued never ran; drop their spooled uploads
+        for job in self._jobs.values():
+            if job.upload is not None:
+                job.upload.discard()
+                job.upload = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(
+        self,
+        upload: SpooledUpload,
+        filename: Optional[str] = None,
+        user_id: Optional[int] = None,
+    ) -> Job:
+        """
+        Queue an upload. The job takes ownership of it and discards it once
+        processed; on JobQueueFull it stays with the caller.
+        """
+        if self._queue is None:
+            raise RuntimeError("job queue is not running")
+
+        self._expire_finished()
+        job = Job(id=uuid.uuid4().hex, filename=filename, upload=upload, user_id=user_id)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise JobQueueFull(f"job queue is full ({self.max_depth} pending)")
+
+        self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str, user_id: Optional[int] = None) -> Optional[Job]:
+        """
+        The job, unless it was submitted by a signed-in user other than
+        user_id. Anonymous jobs are visible to anyone holding their ID.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None and job.user_id is not None and job.user_id != user_id:
+            return None
+        return job
+
+    def _expire_finished(self) -> None:
+        cutoff = time.time() - self.result_ttl
+        expired = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.finished_at is not None and job.finished_at < cutoff
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            request_id_var.set(job.request_id)
+            job.status = RUNNING
+            try:
+                job.result = await process_statement(
+                    job.upload.source,
+                    job.update_stage,
+                    job.filename,
+                    job.user_id,
+                    job.upload.digest,
+                )
+                job.status = SUCCEEDED
+            except Exception as e:
+                logger.exception("Job %s failed", job.id)
+                job.status = FAILED
+                job.error = str(e)
+            finally:
+                job.upload.discard()
+                job.upload = None
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+
+job_queue = JobQueue()
@@ -0,0 +1,47 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+# latency buckets from a fast regex pass up to a slow OCR page or LLM call
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+# observed per page for text_layer, render and ocr, per LLM call for
+# llm_call and validate (each chunk's response is validated as it arrives),
+# and once per statement for the others
+STAGE_SECONDS = Histogram(
+    "flowcessor_stage_seconds",
+    "Time spent in each pipeline stage",
+    ["stage"],
+    buckets=BUCKETS,
+)
+
+PAGES = Counter("flowcessor_pages_total", "Pages extracted", ["method"])
+STATEMENTS = Counter("flowcessor_statements_total", "Statements processed", ["parser"])
+
+CACHE_REQUESTS = Counter(
+    "flowcessor_cache_requests_total", "Extraction cache lookups", ["tier", "result"]
+)
+
+LLM_REQUESTS = Counter("flowcessor_llm_requests_total", "LLM calls", ["outcome"])
+DROPPED_TRANSACTIONS = Counter(
+    "flowcessor_dropped_transactions_total", "LLM output rows that failed validation"
+)
+LLM_TOKENS = Counter("flowcessor_llm_tokens_total", "LLM tokens consumed", ["kind"])
+EXPORTED_TRANSACTIONS = Counter(
+    "flowcessor_exported_transactions_total", "Transactions written to exports", ["format"]
+)
+
+JOB_QUEUE_DEPTH = Gauge("flowcessor_job_queue_depth", "Jobs waiting for a worker")
+LLM_IN_FLIGHT = Gauge("flowcessor_llm_in_flight", "LLM calls in flight")
+LLM_WAITING = Gauge("flowcessor_llm_waiting", "LLM calls waiting on the rate limiter")
+DB_POOL_CHECKED_OUT = Gauge(
+    "flowcessor_db_pool_checked_out", "Database connections checked out"
+)
+
+
+def bind_gauges(job_queue, llm_scheduler, database) -> None:
+    """
+    Read the gauges from the live objects at scrape time.
+    """
+    JOB_QUEUE_DEPTH.set_function(lambda: job_queue.depth)
+    LLM_IN_FLIGHT.set_function(lambda: llm_scheduler.in_flight)
+    LLM_WAITING.set_function(lambda: llm_scheduler.waiting)
+    DB_POOL_CHECKED_OUT.set_function(lambda: database.engine.pool.checkedout())
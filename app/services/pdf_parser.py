@@ -1,48 +1,671 @@
 import re
-import pytesseract
-from pdf2image import convert_from_bytes
-import cv2
-import numpy as np
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Iterator, List, Optional, Sequence, Tuple, Union
+from app.config import (
+    CLEANUP_MIN_ALNUM_RATIO,
+    OCR_CROP_TABLE,
+    OCR_DESKEW,
+    OCR_DPI,
+    OCR_GLOBAL_THRESHOLD,
+    OCR_MAX_PAGES_IN_FLIGHT,
+    OCR_MAX_WORKERS,
+    OCR_TESSDATA_DIR,
+    OCR_TESSERACT_LANG,
+    OCR_TESSERACT_PSM,
+    OCR_TESSERACT_WHITELIST,
+    OCR_THRESHOLD,
+    TEXT_CLEANUP_RULES,
+    TEXT_LAYER_MIN_CHARS,
+)
+from app.services.chunker import is_transaction_row
+from app.services.metrics import PAGES, STAGE_SECONDS
+
+# the PDF, imaging and OCR libraries are imported where they are used, so
+# importing the app stays fast; OCR workers load them on their first page or
+# during warm-up
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL.Image import Image
 
 
 class PDFParserError(Exception):
     pass
 
 
-def extract_text_from_pdf(contents: bytes) -> str:
-    pages = convert_from_bytes(contents)
+logger = logging.getLogger(__name__)
+
+TEXT_LAYER = "text_layer"
+OCR = "ocr"
+
+# a PDF held in memory, or the path of one spooled to disk
+PDFSource = Union[bytes, Path]
+
+
+@dataclass
+class ExtractedPage:
+    number: int
+    method: str
+    text: str
+    fingerprint: Optional[str] = None
+
+
+def has_text_layer(text: str, min_chars: int = TEXT_LAYER_MIN_CHARS) -> bool:
+    """
+    Decide whether embedded page text is usable as-is. Scanned pages usually
+    have no text layer, or only a few stray characters.
+    """
+    return sum(1 for char in text if char.isalnum()) >= min_chars
+
+
+THRESHOLD_MODES = ("global", "otsu", "adaptive", "none")
+
+# skew estimates beyond this are more likely a misreading than a tilted scan
+MAX_DESKEW_DEGREES = 10.0
+
+
+@dataclass(frozen=True)
+class OCRSettings:
+    """
+    How pages are rendered, preprocessed and passed to tesseract. Picklable
+    so it travels to the OCR worker processes with each page.
+    """
+
+    dpi: int = OCR_DPI
+    threshold: str = OCR_THRESHOLD
+    global_threshold: int = OCR_GLOBAL_THRESHOLD
+    deskew: bool = OCR_DESKEW
+    crop_table: bool = OCR_CROP_TABLE
+    lang: str = OCR_TESSERACT_LANG
+    psm: int = OCR_TESSERACT_PSM
+    whitelist: str = OCR_TESSERACT_WHITELIST
+    tessdata_dir: str = OCR_TESSDATA_DIR
+
+    def __post_init__(self):
+        if self.threshold not in THRESHOLD_MODES:
+            raise ValueError(f"unknown OCR threshold mode: {self.threshold}")
+
+    def tesseract_config(self) -> str:
+        options = [f"--psm {self.psm}"]
+        if self.tessdata_dir:
+            options.append(f'--tessdata-dir "{self.tessdata_dir}"')
+        if self.whitelist:
+            options.append(f"-c tessedit_char_whitelist={self.whitelist}")
+        return " ".join(options)
+
+    def for_page(self, number: int) -> "OCRSettings":
+        """
+        Settings for one page: the first page is never cropped to its table,
+        since its header holds the statement date the parsers read the year
+        from.
+        """
+        if number == 1 and self.crop_table:
+            return replace(self, crop_table=False)
+        return self
+
+    def fingerprint(self) -> str:
+        return ",".join(f"{key}={value}" for key, value in sorted(asdict(self).items()))
+
+
+def render_page(path: str, page_number: int, dpi: int = OCR_DPI) -> "Image":
+    """
+    Render a single PDF page straight to grayscale so only that page's
+    bitmap is held by the caller.
+    """
+    from pdf2image import convert_from_path
+    from pdf2image.exceptions import PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError
+
+    try:
+        return convert_from_path(
+            path, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=True
+        )[0]
+    except (PDFInfoNotInstalledError, PDFPageCountError, PDFSyntaxError) as e:
+        raise PDFParserError(f"failed to render page {page_number}: {e}")
+
+
+def deskew(gray: "np.ndarray") -> "np.ndarray":
+    """
+    Rotate the page so its text lines are horizontal, estimating the skew
+    from the minimum-area rectangle around all dark pixels.
+    """
+    import cv2
+
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(ink)
+    if coords is None:
+        return gray
+
+    # the rectangle's angle comes back in a 90 degree range whose bounds
+    # differ between OpenCV versions; fold it into [-45, 45)
+    angle = (cv2.minAreaRect(coords)[-1] + 45) % 90 - 45
+    if abs(angle) < 0.1 or abs(angle) > MAX_DESKEW_DEGREES:
+        return gray
+
+    height, width = gray.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        gray, matrix, (width, height), flags=cv2.INTER_CUBIC, borderValue=255
+    )
+
+
+def crop_to_table(gray: "np.ndarray", margin: int = 10) -> "np.ndarray":
+    """
+    Crop to the region spanned by the page's ruled horizontal lines, i.e. the
+    transaction table. Anything outside the table, such as the statement
+    header, is dropped, so it is not applied to the first page (see
+    OCRSettings.for_page). Pages without ruled lines are returned unchanged.
+    """
+    import cv2
+
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    height, width = gray.shape
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(1, width // 4), 1))
+    lines = cv2.morphologyEx(ink, cv2.MORPH_OPEN, kernel)
+
+    coords = cv2.findNonZero(lines)
+    if coords is None:
+        return gray
+
+    x, y, w, h = cv2.boundingRect(coords)
+    # a single rule, e.g. under a letterhead, is not a table
+    if h < height // 10:
+        return gray
+
+    top, bottom = max(0, y - margin), min(height, y + h + margin)
+    left, right = max(0, x - margin), min(width, x + w + margin)
+    return gray[top:bottom, left:right]
+
+
+def binarize(gray: "np.ndarray", settings: OCRSettings) -> "np.ndarray":
+    import cv2
+
+    if settings.threshold == "global":
+        return cv2.threshold(gray, settings.global_threshold, 255, cv2.THRESH_BINARY)[1]
+    if settings.threshold == "otsu":
+        return cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)[1]
+    if settings.threshold == "adaptive":
+        return cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 15
+        )
+    return gray
+
+
+def preprocess_page(page: "Image", settings: OCRSettings) -> "np.ndarray":
+    """
+    Deskew, crop and threshold a grayscale page as configured.
+    """
+    import numpy as np
+
+    gray = np.asarray(page.convert("L") if page.mode != "L" else page)
+    if settings.deskew:
+        gray = deskew(gray)
+    if settings.crop_table:
+        gray = crop_to_table(gray)
+    return binarize(gray, settings)
+
+
+def ocr_page(page: "Image", settings: OCRSettings = OCRSettings()) -> str:
+    """
+    Preprocess a rendered page and run tesseract over it. Runs inside an OCR
+    worker process.
+    """
+    import pytesseract
+
+    image = preprocess_page(page, settings)
+    return pytesseract.image_to_string(
+        image, lang=settings.lang, config=settings.tesseract_config()
+    )
+
+
+@contextmanager
+def pdf_path(source: PDFSource) -> Iterator[str]:
+    """
+    Path of the PDF on disk. Spooled uploads are used in place; in-memory
+    ones are written to a temp file for the duration of the block.
+    """
+    if isinstance(source, Path):
+        yield str(source)
+        return
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+        pdf_file.write(source)
+        pdf_file.flush()
+        yield pdf_file.name
+
+
+def text_fingerprint(text: str) -> str:
+    """
+    Fingerprint of a page's text, ignoring whitespace and page number lines,
+    so the same page inside a monthly and a re-issued statement matches.
+    """
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    content = "\n".join(
+        line for line in lines if line and not PAGE_NUMBER_PATTERN.match(line)
+    )
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def scan_fingerprint(document, page) -> str:
+    """
+    Fingerprint of a page without a usable text layer, from the raw bytes of
+    the images drawn on it (or its content stream if it has none). Exact,
+    so a page is only ever matched by the same scan; computed without
+    rendering it.
+    """
+    sha256 = hashlib.sha256()
+    xrefs = [image[0] for image in page.get_images(full=True)]
+    for xref in xrefs:
+        sha256.update(document.xref_stream_raw(xref) or b"")
+    if not xrefs:
+        sha256.update(page.read_contents())
+    return sha256.hexdigest()
 
-    extracted_text = ""
-    for page in pages:
-        img_cv = cv2.cvtColor(np.array(page), cv2.COLOR_RGB2BGR)
 
-        gray = cv2.cvtColor(img_cv, cv2.COLOR_BGR2GRAY)
-        _, thresh = cv2.threshold(gray, 150, 255, cv2.THRESH_BINARY)
+def _timed_ocr_page(page: "Image", settings: OCRSettings) -> Tuple[str, float]:
+    # timed inside the worker so the duration excludes time queued for it
+    started = time.perf_counter()
+    try:
+        text = ocr_page(page, settings)
+    except Exception as e:
+        # library errors such as TesseractNotFoundError can't be unpickled in
+        # the parent, which would break the pool for every later upload
+        raise PDFParserError(f"OCR failed: {e}") from None
+    return text, time.perf_counter() - started
 
-        text = pytesseract.image_to_string(thresh)
-        extracted_text += text + "\n"
 
-    return extracted_text
+def _completed(text: str) -> Future:
+    future = Future()
+    future.set_result((text, None))
+    return future
 
 
-def clean_text(text: str) -> str:
+def _warm_up_worker() -> Optional[str]:
     """
-    Remove noise from extracted PDF text before sending to LLM:
-    - blank lines
-    - repeated lines (headers/footers that appear on every page)
-    - page number lines
+    Load the OCR libraries in a worker process and run tesseract once so its
+    binary is loaded before the first real page. Returns the tesseract
+    version, or None when it isn't installed.
     """
-    lines = text.splitlines()
-    cleaned = []
+    import cv2  # noqa: F401
+    import numpy  # noqa: F401
+    import pytesseract
+
+    try:
+        return str(pytesseract.get_tesseract_version())
+    except pytesseract.TesseractNotFoundError:
+        # can't be pickled back to the parent, and raising it would break
+        # the pool
+        return None
+
+
+class OCREngine:
+    """
+    Reads the embedded text layer where a page has one, and otherwise renders
+    the page lazily and OCRs it on a bounded process pool. Pages are yielded
+    in document order.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = OCR_MAX_WORKERS,
+        max_pages_in_flight: int = OCR_MAX_PAGES_IN_FLIGHT,
+        settings: Optional[OCRSettings] = None,
+    ):
+        self.settings = settings or OCRSettings()
+        self.max_workers = max(1, max_workers)
+        self.max_pages_in_flight = max(1, max_pages_in_flight)
+        # one slot per rendered page waiting on or being OCRed, shared by
+        # every upload being extracted, so the cap holds process-wide
+        self._page_slots = threading.BoundedSemaphore(self.max_pages_in_flight)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # uploads are extracted from several threads at once, all sharing
+        # one pool. Workers start from a forkserver rather than forking
+        # this process, whose threads (event loop, extraction threads) may
+        # hold locks at fork time.
+        with self._pool_lock:
+            if self._pool is None:
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context(
+                    "forkserver" if "forkserver" in methods else None
+                )
+                self._pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        """
+        Drop a pool broken by a dead worker, e.g. one killed for running out
+        of memory, so the next call starts a new one.
+        """
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        logger.warning("OCR worker pool broken, restarting it")
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, fn, *args) -> Tuple[Future, ProcessPoolExecutor]:
+        pool = self._get_pool()
+        try:
+            return pool.submit(fn, *args), pool
+        except BrokenProcessPool:
+            # broken since the last call; retry once on a fresh pool
+            self._discard_pool(pool)
+            pool = self._get_pool()
+            return pool.submit(fn, *args), pool
+
+    def iter_pages(
+        self,
+        source: PDFSource,
+        on_page: Optional[Callable[[ExtractedPage, int], None]] = None,
+        known_text: Optional[Callable[[str], Optional[str]]] = None,
+    ) -> Iterator[ExtractedPage]:
+        """
+        Yield pages in order. on_page is called with each page and the total
+        page count as the page is yielded. known_text looks up the OCR text
+        of a previously seen scanned page by fingerprint; pages it knows are
+        neither rendered nor OCRed.
+        """
+        import pymupdf
+
+        pending = deque()
+
+        with pdf_path(source) as path:
+            try:
+                document = pymupdf.open(path)
+            except (pymupdf.FileDataError, RuntimeError) as e:
+                raise PDFParserError(f"failed to open PDF: {e}")
+
+            with document:
+                if document.needs_pass:
+                    raise PDFParserError("PDF is password protected")
+                total = len(document)
+
+                for index, page in enumerate(document):
+                    number = index + 1
+                    # hand on pages as soon as they and every page before
+                    # them are done, keeping results in page order
+                    while pending and pending[0][3].done():
+                        yield self._resolve(pending.popleft(), total, on_page)
+
+                    with STAGE_SECONDS.labels("text_layer").time():
+                        text = page.get_text("text", sort=True)
+                    if has_text_layer(text):
+                        pending.append(
+                            (number, TEXT_LAYER, text_fingerprint(text), _completed(text), None)
+                        )
+                        continue
+
+                    fingerprint = scan_fingerprint(document, page)
+                    known = known_text(fingerprint) if known_text else None
+                    if known is not None:
+                        pending.append((number, OCR, fingerprint, _completed(known), None))
+                        continue
+
+                    future, pool = self._render_and_submit(path, number)
+                    pending.append((number, OCR, fingerprint, future, pool))
+
+            while pending:
+                yield self._resolve(pending.popleft(), total, on_page)
+
+    def _render_and_submit(self, path: str, number: int) -> Tuple[Future, ProcessPoolExecutor]:
+        """
+        Render a page and queue it for OCR once a page slot is free. The
+        slot is released when the OCR finishes, fails or is cancelled,
+        whether or not the caller is still reading results.
+        """
+        self._page_slots.acquire()
+        try:
+            with STAGE_SECONDS.labels("render").time():
+                image = render_page(path, number, self.settings.dpi)
+            future, pool = self._submit(_timed_ocr_page, image, self.settings.for_page(number))
+        except BaseException:
+            self._page_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._page_slots.release())
+        return future, pool
+
+    def _resolve(self, item: tuple, total: int, on_page) -> ExtractedPage:
+        number, method, fingerprint, future, pool = item
+        try:
+            text, ocr_seconds = future.result()
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise PDFParserError(f"OCR worker exited while reading page {number}")
+        if ocr_seconds is not None:
+            STAGE_SECONDS.labels("ocr").observe(ocr_seconds)
+        PAGES.labels(method).inc()
+        page = ExtractedPage(number=number, method=method, text=text, fingerprint=fingerprint)
+        if on_page:
+            on_page(page, total)
+        return page
+
+    def extract_pages(
+        self,
+        source: PDFSource,
+        on_page: Optional[Callable[[ExtractedPage, int], None]] = None,
+        known_text: Optional[Callable[[str], Optional[str]]] = None,
+    ) -> List[ExtractedPage]:
+        pages = list(self.iter_pages(source, on_page, known_text))
+        ocr_count = sum(1 for page in pages if page.method == OCR)
+        logger.info(
+            "Extracted %d pages (%d from text layer, %d via OCR)",
+            len(pages),
+            len(pages) - ocr_count,
+            ocr_count,
+        )
+        return pages
+
+    def warm_up(self) -> None:
+        """
+        Import the PDF libraries here and start the OCR workers with
+        tesseract primed, so the first scanned upload doesn't pay for it.
+        """
+        import pymupdf  # noqa: F401
+        import pdf2image  # noqa: F401
+
+        versions = set()
+        for future, pool in [self._submit(_warm_up_worker) for _ in range(self.max_workers)]:
+            try:
+                versions.add(future.result())
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                return
+        if None in versions:
+            logger.warning("OCR warm-up: tesseract not found, scanned pages will fail")
+            return
+        logger.info(
+            "OCR workers ready (%d, tesseract %s)", self.max_workers, ", ".join(sorted(versions))
+        )
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(cancel_futures=True)
+                self._pool = None
+
+
+ocr_engine = OCREngine()
+
+
+# line between pages in joined text, so cleanup can tell where pages start
+# and end; dropped with the other blank lines
+PAGE_BREAK = "\f"
+
+
+def join_pages(pages: List[ExtractedPage]) -> str:
+    # tesseract ends its output with a form feed of its own
+    return (PAGE_BREAK + "\n").join(
+        page.text.replace(PAGE_BREAK, "\n") + "\n" for page in pages
+    )
+
+
+def extract_pages_from_pdf(
+    source: PDFSource,
+    on_page: Optional[Callable[[ExtractedPage, int], None]] = None,
+    known_text: Optional[Callable[[str], Optional[str]]] = None,
+) -> List[ExtractedPage]:
+    return ocr_engine.extract_pages(source, on_page, known_text)
+
+
+def extract_text_from_pdf(source: PDFSource) -> str:
+    return join_pages(extract_pages_from_pdf(source))
+
+
+PAGE_NUMBER_PATTERN = re.compile(
+    r"^(page|muka\s+surat)\s+\d+(\s*(of|/|dari)\s*\d+)?$|^\d+\s*(of|/)\s*\d+$",
+    re.IGNORECASE,
+)
+SUMMARY_LINE_PATTERN = re.compile(
+    r"^(opening|closing|beginning|ending|ledger|available)\s+balance"
+    r"|^balance\s+(b/f|c/f|brought|carried)"
+    r"|^(b/f|c/f)\b"
+    r"|^(brought|carried)\s+forward"
+    r"|^total\s+(debit|credit|deposit|withdrawal)s?"
+    r"|^baki\s+(awal|akhir|bawa|dibawa)"
+    r"|^jumlah\s+(debit|kredit)",
+    re.IGNORECASE,
+)
+COLUMN_HEADER_WORDS = {
+    "date", "transaction", "description", "details", "amount", "balance",
+    "debit", "credit", "tarikh", "keterangan", "jumlah", "baki",
+}
+
+
+def _is_column_header(line: str) -> bool:
+    if any(char.isdigit() for char in line):
+        return False
+    words = set(re.findall(r"[a-z]+", line.lower()))
+    return len(words & COLUMN_HEADER_WORDS) >= 2
+
+
+def _is_garbage(line: str) -> bool:
+    alnum = sum(1 for char in line if char.isalnum())
+    return alnum < 2 or alnum / len(line) < CLEANUP_MIN_ALNUM_RATIO
+
+
+def _continuation_lines(pages: List[List[str]]) -> Optional[int]:
+    """
+    Most lines seen between two transaction rows on the same page, i.e. the
+    longest row group's continuation lines, or None when no page has two
+    rows to tell.
+    """
+    gaps = []
+    for lines in pages:
+        rows = [i for i, line in enumerate(lines) if is_transaction_row(line)]
+        gaps.extend(b - a - 1 for a, b in zip(rows, rows[1:]))
+    return max(gaps, default=None)
+
+
+def _page_zones(lines: List[str], continuation_lines: Optional[int]) -> Tuple[int, int]:
+    """
+    Index of the first transaction row and of the line after the last
+    row's group, taken to be as long as the longest group elsewhere (the
+    rest of the page when unknown). Lines before the first row are the page
+    header, lines after the last group the footer; a page without rows is
+    all header.
+    """
+    rows = [i for i, line in enumerate(lines) if is_transaction_row(line)]
+    if not rows:
+        return len(lines), len(lines)
+    if continuation_lines is None:
+        return rows[0], len(lines)
+    return rows[0], min(len(lines), rows[-1] + 1 + continuation_lines)
+
+
+def _footer_run(lines: List[str], start: int) -> tuple:
+    # page numbers differ from page to page, so they don't count
+    return tuple(line for line in lines[start:] if not PAGE_NUMBER_PATTERN.match(line))
+
+
+def _repeated_page_lines(
+    pages: List[List[str]], continuation_lines: Optional[int]
+) -> Tuple[set, set]:
+    """
+    Header lines found before the first transaction row of two or more
+    pages, and footers: runs of lines below the last row group that end two
+    or more pages identically, page numbers aside.
+    """
+    headers, footers = Counter(), Counter()
+    for lines in pages:
+        first_row, footer_start = _page_zones(lines, continuation_lines)
+        headers.update(set(lines[:first_row]))
+        footers.update({_footer_run(lines, i) for i in range(footer_start, len(lines))})
+    return (
+        {line for line, count in headers.items() if count > 1},
+        {run for run, count in footers.items() if count > 1 and run},
+    )
+
+
+def clean_pages(text: str, rules: Sequence[str] = TEXT_CLEANUP_RULES) -> List[List[str]]:
+    """
+    Remove noise from extracted PDF text before sending to LLM, returning
+    the lines kept on each page. Blank lines
+    are always dropped; the other rules are enabled by name:
+    - page_numbers: page number lines
+    - repeated_lines: page headers and footers repeated on several pages,
+      after their first occurrence
+    - column_headers: table column header lines after the first
+    - summary_lines: opening/closing balance and total lines
+    - garbage_lines: OCR noise with too few letters or digits
+    Pages are split at PAGE_BREAK lines. repeated_lines only looks at a
+    page's lines before its first transaction row or below its last row
+    group, and column_headers only at those before the first row, so
+    transaction rows and their continuation lines (the counterparty or
+    purpose of a payment) are kept however often they repeat.
+    """
+    rules = set(rules)
+    pages = [
+        [line.strip() for line in page.splitlines() if line.strip()]
+        for page in text.split(PAGE_BREAK)
+    ]
+    continuation_lines = _continuation_lines(pages)
+    repeated_headers, repeated_footers = _repeated_page_lines(pages, continuation_lines)
+
+    cleaned_pages = []
     seen = set()
-    for line in lines:
-        stripped = line.strip()
-        if not stripped:
-            continue
-        if stripped in seen:
-            continue
-        if re.match(r"^page\s+\d+", stripped, re.IGNORECASE):
-            continue
-        seen.add(stripped)
-        cleaned.append(stripped)
-    return "\n".join(cleaned)
+    seen_column_header = False
+    for lines in pages:
+        first_row, footer_start = _page_zones(lines, continuation_lines)
+        cleaned = []
+        cleaned_pages.append(cleaned)
+        for i, line in enumerate(lines):
+            if "page_numbers" in rules and PAGE_NUMBER_PATTERN.match(line):
+                continue
+            if is_transaction_row(line):
+                cleaned.append(line)
+                continue
+            in_header, in_footer = i < first_row, i >= footer_start
+            if "repeated_lines" in rules and (in_header or in_footer):
+                key = line if in_header else _footer_run(lines, i)
+                if key in (repeated_headers if in_header else repeated_footers):
+                    if key in seen:
+                        continue
+                    seen.add(key)
+            if "summary_lines" in rules and SUMMARY_LINE_PATTERN.match(line):
+                continue
+            if "column_headers" in rules and in_header and _is_column_header(line):
+                if seen_column_header:
+                    continue
+                seen_column_header = True
+            if "garbage_lines" in rules and _is_garbage(line):
+                continue
+            cleaned.append(line)
+    return cleaned_pages
+
+
+def clean_text(text: str, rules: Sequence[str] = TEXT_CLEANUP_RULES) -> str:
+    """
+    clean_pages, joined into one text.
+    """
+    return "\n".join(line for lines in clean_pages(text, rules) for line in lines)
@@ -0,0 +1,430 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from itertools import groupby
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+from app.models.schemas import (
+    BankStatementResponse,
+    CleanupStats,
+    PageExtraction,
+    StatementUploadResponse,
+    Transaction,
+)
+from app.config import RULE_PARSER_MIN_CONFIDENCE, settings
+from app.db.database import database
+from app.services.ai import generate_formatted_data
+from app.services.cache import content_digest, extraction_cache
+from app.services.chunker import estimate_tokens, is_transaction_row
+from app.services.metrics import STAGE_SECONDS, STATEMENTS
+from app.services.pdf_parser import (
+    OCR,
+    ExtractedPage,
+    PDFSource,
+    clean_pages,
+    extract_pages_from_pdf,
+    join_pages,
+)
+from app.services.rule_parser import parse_statement
+
+# the repository, and with it the ORM, is imported on first use
+if TYPE_CHECKING:
+    from app.db.repository import SavedStatement
+
+logger = logging.getLogger(__name__)
+
+EXTRACT_STAGE = "extract"
+STRUCTURE_STAGE = "structure"
+VALIDATE_STAGE = "validate"
+PERSIST_STAGE = "persist"
+STAGES = (EXTRACT_STAGE, STRUCTURE_STAGE, VALIDATE_STAGE, PERSIST_STAGE)
+
+
+@dataclass
+class PipelineEvent:
+    stage: str
+    completed: int
+    total: int
+    data: Dict[str, Any] = field(default_factory=dict)
+
+
+EventCallback = Callable[[PipelineEvent], None]
+
+
+def _ignore_event(event: PipelineEvent) -> None:
+    pass
+
+
+def _page_extraction(page: ExtractedPage, duplicate: bool = False) -> PageExtraction:
+    return PageExtraction(
+        page=page.number, method=page.method, chars=len(page.text), duplicate=duplicate
+    )
+
+
+def _joined(page_lines: List[List[str]]) -> str:
+    return "\n".join(line for lines in page_lines for line in lines)
+
+
+def clean_extracted_pages(text: str) -> Tuple[List[List[str]], CleanupStats]:
+    """
+    Run the configured cleanup rules, returning the lines kept on each page,
+    and measure how much of the prompt they saved.
+    """
+    with STAGE_SECONDS.labels("clean").time():
+        page_lines = clean_pages(text)
+    cleaned = _joined(page_lines)
+    stats = CleanupStats(
+        chars_before=len(text),
+        chars_after=len(cleaned),
+        tokens_before=estimate_tokens(text),
+        tokens_after=estimate_tokens(cleaned),
+    )
+    logger.info(
+        "Text cleanup: %d -> %d chars, ~%d -> ~%d tokens",
+        stats.chars_before,
+        stats.chars_after,
+        stats.tokens_before,
+        stats.tokens_after,
+    )
+    return page_lines, stats
+
+
+def clean_extracted_text(text: str) -> Tuple[str, CleanupStats]:
+    page_lines, stats = clean_extracted_pages(text)
+    return _joined(page_lines), stats
+
+
+def _rows_by_page(
+    page_lines: List[List[str]], transactions: List[Transaction]
+) -> Optional[List[List[Transaction]]]:
+    """
+    Split the transactions structured from a run of pages between those
+    pages, taking every dated line as one row. None when the counts don't
+    add up, e.g. when the LLM merged or skipped rows.
+    """
+    counts = [sum(1 for line in lines if is_transaction_row(line)) for lines in page_lines]
+    if sum(counts) != len(transactions):
+        return None
+    rows, start = [], 0
+    for count in counts:
+        rows.append(transactions[start : start + count])
+        start += count
+    return rows
+
+
+def _header_lines(lines: List[str]) -> List[str]:
+    for i, line in enumerate(lines):
+        if is_transaction_row(line):
+            return lines[:i]
+    return lines
+
+
+async def _structure_with_llm(
+    text: str, on_chunk: Optional[Callable[[int, List[Transaction], int], None]] = None
+) -> Tuple[List[Transaction], bool]:
+    """
+    Structure text with the LLM unless the same text was structured before.
+    Returns the transactions and whether they came from the cache.
+    """
+    statement = extraction_cache.get_statement(text)
+    if statement is not None:
+        return statement.transactions, True
+    # rows are validated per chunk as the LLM responses arrive
+    with STAGE_SECONDS.labels("llm").time():
+        statement = await generate_formatted_data(text, on_chunk)
+    extraction_cache.set_statement(text, statement)
+    return statement.transactions, False
+
+
+async def _structure_new_pages(
+    page_lines: List[List[str]],
+    stored_rows: Dict[int, List[Transaction]],
+    on_event: EventCallback,
+) -> Tuple[List[Transaction], List[Optional[List[Transaction]]]]:
+    """
+    Structure a statement some of whose pages were already structured with
+    an earlier one: those pages reuse their stored rows and only each run of
+    new pages goes to the LLM, after the first page's header so the
+    statement date is known. Returns the transactions in page order and the
+    rows of every page they could be attributed to.
+    """
+    header = _header_lines(page_lines[0])
+    segments = [
+        (reused, [i for i, _ in group])
+        for reused, group in groupby(enumerate(page_lines), key=lambda item: item[0] in stored_rows)
+    ]
+
+    async def structure(numbers: List[int]) -> List[Transaction]:
+        lines = [line for i in numbers for line in page_lines[i]]
+        transactions, _ = await _structure_with_llm("\n".join(lines if numbers[0] == 0 else header + lines))
+        return transactions
+
+    structured = iter(
+        await asyncio.gather(*(structure(numbers) for reused, numbers in segments if not reused))
+    )
+
+    transactions: List[Transaction] = []
+    page_rows: List[Optional[List[Transaction]]] = [None] * len(page_lines)
+    for index, (reused, numbers) in enumerate(segments):
+        if reused:
+            rows = [stored_rows[i] for i in numbers]
+            segment = [t for page in rows for t in page]
+        else:
+            segment = next(structured)
+            rows = _rows_by_page([page_lines[i] for i in numbers], segment) or [None] * len(numbers)
+        for i, page in zip(numbers, rows):
+            page_rows[i] = page
+        transactions.extend(segment)
+        on_event(
+            PipelineEvent(
+                STRUCTURE_STAGE,
+                index + 1,
+                len(segments),
+                {
+                    "chunk": index,
+                    "stored": reused,
+                    "transactions": [t.model_dump(mode="json") for t in segment],
+                },
+            )
+        )
+    return transactions, page_rows
+
+
+def _known_page_text(user_id: Optional[int]) -> Callable[[str], Optional[str]]:
+    """
+    Look up the OCR text of a scanned page seen before, in the extraction
+    cache or saved with one of the user's statements, so a page already
+    ingested isn't rendered or OCRed again, even after a restart.
+    """
+
+    def lookup(fingerprint: str) -> Optional[str]:
+        from app.db.repository import ingested_page_text
+
+        text = extraction_cache.get_page_text(fingerprint)
+        if text is None and user_id is not None:
+            with database.SessionLocal() as session:
+                text = ingested_page_text(session, user_id, fingerprint)
+        return text
+
+    return lookup
+
+
+def _ingested_pages(
+    user_id: Optional[int], pages: List[ExtractedPage]
+) -> Tuple[Set[str], Dict[str, List[Transaction]]]:
+    """
+    Fingerprints of the pages already ingested with the user's earlier
+    statements, and the structured rows stored for those pages.
+    """
+    from app.db.repository import ingested_page_fingerprints, ingested_page_rows
+
+    fingerprints = [page.fingerprint for page in pages if page.fingerprint]
+    with database.SessionLocal() as session:
+        ingested = ingested_page_fingerprints(session, user_id, fingerprints)
+        rows = ingested_page_rows(session, user_id, fingerprints)
+    return ingested, {
+        fingerprint: BankStatementResponse.model_validate_json(value).transactions
+        for fingerprint, value in rows.items()
+    }
+
+
+def _save_result(
+    result: StatementUploadResponse,
+    pages: List[ExtractedPage],
+    digest: str,
+    filename: Optional[str],
+    user_id: Optional[int],
+    page_rows: List[Optional[List[Transaction]]],
+) -> "SavedStatement":
+    from app.db.repository import save_statement
+
+    with database.SessionLocal() as session:
+        return save_statement(
+            session,
+            result.transactions,
+            file_sha256=digest,
+            filename=filename,
+            page_count=len(pages),
+            parser=result.parser,
+            user_id=user_id,
+            page_fingerprints={page.number: page.fingerprint for page in pages if page.fingerprint},
+            page_texts={page.number: page.text for page in pages if page.method == OCR},
+            page_rows={
+                page.number: BankStatementResponse.model_construct(transactions=rows).model_dump_json()
+                for page, rows in zip(pages, page_rows)
+                if rows is not None
+            },
+        )
+
+
+async def process_statement(
+    source: PDFSource,
+    on_event: Optional[EventCallback] = None,
+    filename: Optional[str] = None,
+    user_id: Optional[int] = None,
+    digest: Optional[str] = None,
+) -> StatementUploadResponse:
+    """
+    Run a statement through page extraction and structuring, reusing cached
+    results for previously seen uploads. Statements in a known layout are
+    parsed by rules; only low-confidence or unknown layouts go to the LLM. Page extraction runs in a
+    worker thread so the event loop stays free while OCR is in progress.
+    on_event is called as each page and chunk completes; page events are
+    raised from the extraction thread. When PERSIST_STATEMENTS is on, the
+    result is saved for user_id before returning. Pages the user's earlier
+    statements already ingested reuse their stored OCR text and, when the
+    LLM would be needed, their stored rows, so only new pages are sent to
+    it. Transactions already stored are not stored again; the result still
+    holds every transaction, with those flagged in duplicates. source is the
+    PDF bytes or the path of a spooled upload; pass digest when it is
+    already known. Anonymous uploads (no user_id) are never saved, so they
+    don't end up in one shared pool.
+    """
+    on_event = on_event or _ignore_event
+    digest = digest or content_digest(source)
+    persist = settings.PERSIST_STATEMENTS and user_id is not None
+
+    def on_page(page: ExtractedPage, total: int) -> None:
+        on_event(
+            PipelineEvent(
+                EXTRACT_STAGE, page.number, total, _page_extraction(page).model_dump()
+            )
+        )
+
+    def on_chunk(index: int, transactions: List[Transaction], total: int) -> None:
+        on_event(
+            PipelineEvent(
+                STRUCTURE_STAGE,
+                index + 1,
+                total,
+                {
+                    "chunk": index,
+                    "transactions": [t.model_dump(mode="json") for t in transactions],
+                },
+            )
+        )
+
+    pages = extraction_cache.get_pages(digest)
+    if pages is None:
+        # scanned pages seen in other uploads reuse their OCR text
+        known_text = _known_page_text(user_id if persist else None)
+        with STAGE_SECONDS.labels("extract").time():
+            pages = await asyncio.to_thread(extract_pages_from_pdf, source, on_page, known_text)
+        extraction_cache.set_pages(digest, pages)
+        for page in pages:
+            if page.method == OCR and page.fingerprint:
+                extraction_cache.set_page_text(page.fingerprint, page.text)
+    else:
+        for page in pages:
+            on_page(page, len(pages))
+
+    # pages already ingested with an earlier statement, e.g. the months a
+    # quarterly statement shares with monthly ones, and their stored rows
+    ingested: Set[str] = set()
+    ingested_rows: Dict[str, List[Transaction]] = {}
+    if persist:
+        ingested, ingested_rows = await asyncio.to_thread(_ingested_pages, user_id, pages)
+    if ingested:
+        logger.info("%d of %d pages already ingested", len(ingested), len(pages))
+
+    page_lines, cleanup_stats = clean_extracted_pages(join_pages(pages))
+    extracted_text = _joined(page_lines)
+    parser = "llm"
+
+    with STAGE_SECONDS.labels("rules").time():
+        rule_result = parse_statement(extracted_text)
+    stored_rows = {
+        i: ingested_rows[page.fingerprint]
+        for i, page in enumerate(pages)
+        if page.fingerprint in ingested_rows
+    }
+    if (
+        rule_result is not None
+        and rule_result.transactions
+        and rule_result.confidence >= RULE_PARSER_MIN_CONFIDENCE
+    ):
+        parser = "rules"
+        transactions = rule_result.transactions
+        page_rows = _rows_by_page(page_lines, transactions)
+        on_event(
+            PipelineEvent(
+                STRUCTURE_STAGE,
+                1,
+                1,
+                {
+                    "chunk": 0,
+                    "transactions": [t.model_dump(mode="json") for t in transactions],
+                },
+            )
+        )
+    elif stored_rows:
+        logger.info("Reusing stored rows for %d of %d pages", len(stored_rows), len(pages))
+        transactions, page_rows = await _structure_new_pages(page_lines, stored_rows, on_event)
+    else:
+        transactions, cached = await _structure_with_llm(extracted_text, on_chunk)
+        page_rows = _rows_by_page(page_lines, transactions)
+        if cached:
+            on_event(PipelineEvent(STRUCTURE_STAGE, 1, 1, {"chunk": 0, "cached": True}))
+    on_event(PipelineEvent(VALIDATE_STAGE, 1, 1))
+
+    logger.info("no. of transactions: %d (parser: %s)", len(transactions), parser)
+    # every part is already a validated model, so skip validating again
+    result = StatementUploadResponse.model_construct(
+        transactions=transactions,
+        pages=[_page_extraction(page, page.fingerprint in ingested) for page in pages],
+        parser=parser,
+        cleanup=cleanup_stats,
+    )
+
+    if persist:
+        with STAGE_SECONDS.labels("persist").time():
+            saved = await asyncio.to_thread(
+                _save_result,
+                result,
+                pages,
+                digest,
+                filename,
+                user_id,
+                page_rows or [None] * len(pages),
+            )
+        result.statement_id = saved.statement_id
+        result.duplicates = sorted(saved.duplicates)
+        on_event(PipelineEvent(PERSIST_STAGE, 1, 1, {"statement_id": result.statement_id}))
+
+    STATEMENTS.labels(parser).inc()
+    return result
+
+
+async def stream_statement(
+    source: PDFSource,
+    filename: Optional[str] = None,
+    user_id: Optional[int] = None,
+    digest: Optional[str] = None,
+) -> AsyncIterator[PipelineEvent]:
+    """
+    Run process_statement and yield its events as they happen, followed by
+    a "summary" event carrying the final result. Pipeline errors propagate
+    to the caller.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event: PipelineEvent) -> None:
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    task = asyncio.create_task(process_statement(source, on_event, filename, user_id, digest))
+    # lands after any events the pipeline has already queued
+    task.add_done_callback(lambda _: events.put_nowait(None))
+
+    try:
+        while (event := await events.get()) is not None:
+            yield event
+
+        result = task.result()
+        yield PipelineEvent(
+            "summary",
+            len(result.transactions),
+            len(result.transactions),
+            result.model_dump(mode="json"),
+        )
+    finally:
+        task.cancel()
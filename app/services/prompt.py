@@ -0,0 +1,86 @@
+import re
+import json
+import hashlib
+import textwrap
+from functools import lru_cache
+from app.config import EXAMPLE, LLM_MODEL, LLM_PROMPT_INCLUDE_EXAMPLE, SYSTEM_PROMPT
+from app.models.schemas import BankStatementResponse
+from app.services.chunker import estimate_tokens
+
+USER_PREFIX = "Statement chunk:\n"
+
+
+def _strip_titles(schema):
+    """
+    Drop the "title" annotations pydantic adds to every schema node; the
+    property names already say the same thing.
+    """
+    if isinstance(schema, list):
+        return [_strip_titles(item) for item in schema]
+    if not isinstance(schema, dict):
+        return schema
+    return {
+        key: (
+            {name: _strip_titles(value) for name, value in value.items()}
+            if key in ("properties", "$defs")
+            else _strip_titles(value)
+        )
+        for key, value in schema.items()
+        if key != "title"
+    }
+
+
+def _compact_text(text: str) -> str:
+    lines = (line.rstrip() for line in textwrap.dedent(text).strip().splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def _compact_example(example: str) -> str:
+    """
+    Keep the example input as is and minify the JSON output after it.
+    """
+    text = _compact_text(example)
+    head, _, output = text.partition("Example output:")
+    minified = json.dumps(json.loads(output), separators=(",", ":"))
+    return f"{head}Example output:\n{minified}"
+
+
+def response_schema() -> dict:
+    return _strip_titles(BankStatementResponse.model_json_schema())
+
+
+@lru_cache(maxsize=None)
+def system_prompt(model: str = LLM_MODEL) -> str:
+    """
+    The fixed system message, built once per model and reused byte for byte
+    on every call so the provider can cache the shared prefix.
+    """
+    parts = [
+        _compact_text(SYSTEM_PROMPT),
+        "Schema: " + json.dumps(response_schema(), separators=(",", ":")),
+    ]
+    if LLM_PROMPT_INCLUDE_EXAMPLE:
+        parts.append(_compact_example(EXAMPLE))
+    return re.sub(r"[ \t]+", " ", "\n".join(parts))
+
+
+@lru_cache(maxsize=None)
+def prompt_overhead_tokens(model: str = LLM_MODEL) -> int:
+    """
+    Estimated tokens every call spends on the fixed part of the prompt.
+    """
+    return estimate_tokens(system_prompt(model) + USER_PREFIX)
+
+
+@lru_cache(maxsize=None)
+def prompt_version(model: str = LLM_MODEL) -> str:
+    """
+    Fingerprint of everything that shapes the LLM output, used to invalidate
+    cached extractions when the prompt, schema or model changes.
+    """
+    fingerprint = json.dumps([model, system_prompt(model)])
+    return hashlib.sha256(fingerprint.encode()).hexdigest()[:16]
+
+
+def user_message(chunk: str) -> str:
+    return USER_PREFIX + chunk
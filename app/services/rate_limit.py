@@ -0,0 +1,265 @@
+import re
+import time
+import heapq
+import random
+import asyncio
+import logging
+import itertools
+from typing import Awaitable, Callable, Mapping, Optional, Tuple, TypeVar
+from app.config import (
+    LLM_BACKOFF_BASE_SECONDS,
+    LLM_BACKOFF_MAX_SECONDS,
+    LLM_MAX_ATTEMPTS,
+    LLM_MAX_CONCURRENCY,
+    LLM_RPM_LIMIT,
+    LLM_TPM_LIMIT,
+)
+from app.services.metrics import LLM_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Groq reports resets as e.g. "7.66s", "2m59.56s" or "120ms"
+DURATION_PATTERN = re.compile(r"(?:(\d+)h)?(?:(\d+)m(?!s))?(?:([\d.]+)s)?(?:([\d.]+)ms)?$")
+
+# the rate only ever drops to this share of the configured limits
+MIN_RATE_FACTOR = 0.1
+RATE_RECOVERY_STEP = 0.05
+
+
+class RateLimitExhausted(Exception):
+    pass
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    match = DURATION_PATTERN.match(value.strip())
+    if not match or not any(match.groups()):
+        return None
+    hours, minutes, seconds, millis = (float(part) if part else 0.0 for part in match.groups())
+    return hours * 3600 + minutes * 60 + seconds + millis / 1000
+
+
+class TokenBucket:
+    """
+    Continuously refilling budget of `limit` units per minute. The level may
+    go negative when actual usage turns out higher than reserved.
+    """
+
+    def __init__(self, limit: float):
+        self.limit = limit
+        self.level = float(limit)
+        self._updated = time.monotonic()
+
+    def _refill(self, rate_factor: float) -> None:
+        now = time.monotonic()
+        rate = self.limit * rate_factor / 60
+        self.level = min(self.limit, self.level + (now - self._updated) * rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, rate_factor: float) -> float:
+        self._refill(rate_factor)
+        # requests larger than the whole bucket go through once it is full
+        needed = min(amount, self.limit) - self.level
+        if needed <= 0:
+            return 0.0
+        return needed / (self.limit * rate_factor / 60)
+
+    def consume(self, amount: float) -> None:
+        self.level -= amount
+
+    def cap(self, remaining: float) -> None:
+        """
+        Lower the level to what the server says is left.
+        """
+        self.level = min(self.level, remaining)
+
+
+class RateLimitScheduler:
+    """
+    Central gate for LLM calls. Callers wait in priority order until a
+    concurrency slot, a request and their estimated tokens are available in
+    the per-minute buckets. Buckets are corrected with measured usage and
+    the provider's rate-limit headers. A 429 pauses every caller for the
+    server's retry-after and halves the rate, which then recovers step by
+    step on success.
+    """
+
+    def __init__(
+        self,
+        rpm: int = LLM_RPM_LIMIT,
+        tpm: int = LLM_TPM_LIMIT,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_attempts: int = LLM_MAX_ATTEMPTS,
+        backoff_base: float = LLM_BACKOFF_BASE_SECONDS,
+        backoff_max: float = LLM_BACKOFF_MAX_SECONDS,
+    ):
+        self.requests = TokenBucket(max(1, rpm))
+        self.tokens = TokenBucket(max(1, tpm))
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_factor = 1.0
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self._waiting: list = []
+        self._sequence = itertools.count()
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+        return self._condition
+
+    def _delay(self, tokens: int) -> float:
+        return max(
+            self.paused_until - time.monotonic(),
+            self.requests.wait_time(1, self.rate_factor),
+            self.tokens.wait_time(tokens, self.rate_factor),
+        )
+
+    async def _acquire(self, tokens: int, priority: int) -> None:
+        condition = self._get_condition()
+        ticket = (priority, next(self._sequence))
+        heapq.heappush(self._waiting, ticket)
+
+        async with condition:
+            try:
+                while True:
+                    if self._waiting[0] == ticket and self.in_flight < self.max_concurrency:
+                        delay = self._delay(tokens)
+                        if delay <= 0:
+                            heapq.heappop(self._waiting)
+                            self.requests.consume(1)
+                            self.tokens.consume(tokens)
+                            self.in_flight += 1
+                            condition.notify_all()
+                            return
+                        try:
+                            await asyncio.wait_for(condition.wait(), delay)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await condition.wait()
+            except BaseException:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                condition.notify_all()
+                raise
+
+    async def _release(self) -> None:
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def observe(self, headers: Mapping[str, str], reserved_tokens: int, used_tokens: Optional[int]) -> None:
+        """
+        Correct the buckets after a call: charge the difference between
+        measured and reserved tokens, and never assume more headroom than
+        the server reports.
+        """
+        if used_tokens is not None:
+            self.tokens.consume(used_tokens - reserved_tokens)
+
+        remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+        if remaining_tokens is not None and remaining_tokens.isdigit():
+            self.tokens.cap(int(remaining_tokens))
+
+        remaining_requests = headers.get("x-ratelimit-remaining-requests")
+        if remaining_requests == "0":
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+        self.rate_factor = min(1.0, self.rate_factor + RATE_RECOVERY_STEP)
+
+    def _throttled(self, headers: Mapping[str, str], attempt: int) -> float:
+        retry_after = parse_duration(headers.get("retry-after")) or self._backoff(attempt)
+        self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+        self.rate_factor = max(MIN_RATE_FACTOR, self.rate_factor / 2)
+        logger.warning(
+            "LLM rate limited, pausing %.1fs (rate now %.0f%% of configured limits)",
+            retry_after,
+            self.rate_factor * 100,
+        )
+        return retry_after
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run(
+        self,
+        call: Callable[[], Awaitable[Tuple[T, Mapping[str, str], Optional[int]]]],
+        estimated_tokens: int,
+        priority: int = 0,
+    ) -> T:
+        """
+        Run call once the budgets allow it, retrying 429s, timeouts,
+        connection errors and 5xx responses with backoff. call returns the
+        result, the response headers and the tokens it actually used. Lower
+        priority values go first.
+        """
+        from groq import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+
+        for attempt in range(self.max_attempts):
+            await self._acquire(estimated_tokens, priority)
+            delay = 0.0
+            try:
+                result, headers, used_tokens = await call()
+            except RateLimitError as e:
+                LLM_REQUESTS.labels("rate_limited").inc()
+                # the pause applies to every caller through _acquire
+                self._throttled(e.response.headers, attempt)
+                error = e
+            except APIStatusError as e:
+                LLM_REQUESTS.labels("error").inc()
+                if e.status_code < 500:
+                    raise
+                error = e
+                delay = self._backoff(attempt)
+            except (APIConnectionError, APITimeoutError) as e:
+                LLM_REQUESTS.labels("error").inc()
+                error = e
+                delay = self._backoff(attempt)
+            else:
+                LLM_REQUESTS.labels("ok").inc()
+                self.observe(headers, estimated_tokens, used_tokens)
+                return result
+            finally:
+                await self._release()
+
+            logger.info("LLM call failed (attempt %d/%d): %s", attempt + 1, self.max_attempts, error)
+            await asyncio.sleep(delay)
+
+        raise RateLimitExhausted(f"LLM call failed after {self.max_attempts} attempts: {error}")
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def status(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rate_factor": round(self.rate_factor, 2),
+            "request_budget": round(self.requests.level, 1),
+            "token_budget": round(self.tokens.level),
+            "paused_for": round(max(0.0, self.paused_until - time.monotonic()), 1),
+        }
+
+
+llm_scheduler = RateLimitScheduler()
@@ -0,0 +1,174 @@
+import re
+import logging
+from dataclasses import dataclass, field
+from datetime import date
+from typing import List, Optional, Pattern
+from app.config import PAYMENT_GATEWAYS
+from app.models.schemas import Transaction
+from app.services.chunker import is_transaction_row
+
+logger = logging.getLogger(__name__)
+
+# amounts use Malaysian formatting: 2,200.00 is RM2200, the sign trails
+AMOUNT = r"(?P<amount>\d{1,3}(?:,\d{3})*\.\d{2}|\d+\.\d{2})\s*(?P<sign>[+-]|CR|DR)"
+
+STATEMENT_DATE_PATTERN = re.compile(
+    r"(?:statement\s+date|tarikh\s+penyata)\s*:?\s*(\d{1,2})/(\d{1,2})/(\d{2,4})",
+    re.IGNORECASE,
+)
+FULL_DATE_PATTERN = re.compile(r"\b(\d{1,2})/(\d{1,2})/(\d{4})\b")
+
+CREDIT_SIGNS = ("+", "CR")
+
+
+@dataclass(frozen=True)
+class StatementLayout:
+    name: str
+    detect: Pattern
+    row: Pattern
+
+
+LAYOUTS = (
+    # "15/03 | TRANSFER FR A/C JOHN DOE* Friendly game payment | 450.00- |"
+    StatementLayout(
+        name="pipe_table",
+        detect=re.compile(r"^\s*\d{1,2}/\d{1,2}\s*\|", re.MULTILINE),
+        row=re.compile(
+            r"^\s*\|?\s*(?P<day>\d{1,2})/(?P<month>\d{1,2})\s*\|\s*(?P<body>.+?)\s*\|\s*"
+            + AMOUNT
+            + r"\s*\|?(?:\s*[\d,]+\.\d{2}\s*\|?)?\s*$",
+            re.IGNORECASE,
+        ),
+    ),
+    # the same columns as laid out by a PDF text layer, without separators,
+    # optionally followed by a running balance
+    StatementLayout(
+        name="plain_columns",
+        detect=re.compile(r"^\s*\d{1,2}/\d{1,2}\s+\S.*\d\.\d{2}\s*[+-]", re.MULTILINE),
+        row=re.compile(
+            r"^\s*(?P<day>\d{1,2})/(?P<month>\d{1,2})\s+(?P<body>.+?)\s+"
+            + AMOUNT
+            + r"(?:\s+[\d,]+\.\d{2})?\s*$",
+            re.IGNORECASE,
+        ),
+    ),
+)
+
+
+@dataclass
+class RuleParseResult:
+    layout: str
+    confidence: float
+    transactions: List[Transaction] = field(default_factory=list)
+
+
+def _to_date(day: str, month: str, year: str) -> Optional[date]:
+    year = int(year)
+    if year < 100:
+        year += 2000
+    try:
+        return date(year, int(month), int(day))
+    except ValueError:
+        return None
+
+
+def find_statement_date(text: str) -> Optional[date]:
+    """
+    The statement date, or else the latest full date in the text, e.g. the
+    end of "Statement Period: 15/12/2023 - 14/01/2024". Row years are
+    inferred back from it, so it must not be the start of a period that
+    spans a year boundary.
+    """
+    match = STATEMENT_DATE_PATTERN.search(text)
+    if match:
+        return _to_date(*match.groups())
+
+    dates = [_to_date(*match.groups()) for match in FULL_DATE_PATTERN.finditer(text)]
+    return max((d for d in dates if d is not None), default=None)
+
+
+def parse_amount(amount: str, sign: str) -> float:
+    value = float(amount.replace(",", ""))
+    return value if sign.upper() in CREDIT_SIGNS else -value
+
+
+def split_counterparty(body: str) -> tuple:
+    """
+    Split "TRANSFER TO A/C NAME* purpose" into the counterparty part and the
+    payment purpose or reference.
+    """
+    name, _, description = body.partition("*")
+    return name.strip(), description.strip().rstrip("-").strip()
+
+
+def build_transaction(match: re.Match, statement_date: date) -> Transaction:
+    day, month = int(match["day"]), int(match["month"])
+    # rows dated after the statement month belong to the previous year,
+    # e.g. December rows on a January statement
+    year = statement_date.year - 1 if month > statement_date.month else statement_date.year
+    name, description = split_counterparty(match["body"])
+    amount = parse_amount(match["amount"], match["sign"])
+    upper_body = match["body"].upper()
+
+    return Transaction(
+        date=date(year, month, day),
+        transaction=name,
+        amount=amount,
+        description=description,
+        category="transfer_in" if amount > 0 else "transfer_out",
+        is_direct=not any(gateway in upper_body for gateway in PAYMENT_GATEWAYS),
+    )
+
+
+def parse_with_layout(
+    layout: StatementLayout, lines: List[str], statement_date: date
+) -> RuleParseResult:
+    """
+    Parse every dated row with the layout's row pattern. Confidence is the
+    share of dated rows the layout could turn into a valid transaction.
+    """
+    candidates = 0
+    transactions = []
+    for line in lines:
+        if not is_transaction_row(line):
+            continue
+        candidates += 1
+
+        match = layout.row.match(line)
+        if not match:
+            continue
+        try:
+            transactions.append(build_transaction(match, statement_date))
+        except ValueError:
+            continue
+
+    confidence = len(transactions) / candidates if candidates else 0.0
+    return RuleParseResult(layout=layout.name, confidence=confidence, transactions=transactions)
+
+
+def parse_statement(text: str) -> Optional[RuleParseResult]:
+    """
+    Try every known layout and return the most confident parse, or None when
+    no layout applies or the statement year cannot be determined.
+    """
+    statement_date = find_statement_date(text)
+    if statement_date is None:
+        return None
+
+    lines = text.splitlines()
+    best = None
+    for layout in LAYOUTS:
+        if not layout.detect.search(text):
+            continue
+        result = parse_with_layout(layout, lines, statement_date)
+        if best is None or result.confidence > best.confidence:
+            best = result
+
+    if best is not None:
+        logger.info(
+            "Rule parser: layout %s matched %d transactions (confidence %.2f)",
+            best.layout,
+            len(best.transactions),
+            best.confidence,
+        )
+    return best
@@ -0,0 +1,146 @@
+import os
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+from fastapi import UploadFile
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.config import (
+    UPLOAD_CHUNK_BYTES,
+    UPLOAD_FORM_OVERHEAD_BYTES,
+    UPLOAD_MAX_BYTES,
+    UPLOAD_SPOOL_THRESHOLD_BYTES,
+)
+from app.services.pdf_parser import PDFSource
+
+logger = logging.getLogger(__name__)
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class SpooledUpload:
+    """
+    An uploaded PDF, in memory or spooled to a temp file, with its size and
+    SHA-256 digest computed while it was read. Whoever ends up owning the
+    upload calls discard() once it has been processed.
+    """
+
+    source: PDFSource
+    size: int
+    digest: str
+
+    def discard(self) -> None:
+        if isinstance(self.source, Path):
+            self.source.unlink(missing_ok=True)
+
+
+async def spool_upload(
+    file: UploadFile,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_BYTES,
+    spool_threshold: int = UPLOAD_SPOOL_THRESHOLD_BYTES,
+) -> SpooledUpload:
+    """
+    Copy an upload in chunk_size pieces, failing as soon as it passes
+    max_size. Small files stay in memory; once spool_threshold is exceeded
+    the data goes to a temp file so the PDF is never held as one bytes
+    object. By now the framework has already received the whole request
+    body, so oversized requests are meant to be stopped earlier by
+    UploadSizeLimitMiddleware; this check catches a single file over the
+    limit inside an allowed batch.
+    """
+    sha256 = hashlib.sha256()
+    buffer = bytearray()
+    spool = None
+    size = 0
+
+    try:
+        while chunk := await file.read(chunk_size):
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(f"file size exceeds limit of {max_size} bytes")
+            sha256.update(chunk)
+
+            if spool is None and len(buffer) + len(chunk) > spool_threshold:
+                spool = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+                spool.write(buffer)
+                buffer = bytearray()
+            if spool is None:
+                buffer += chunk
+            else:
+                spool.write(chunk)
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.unlink(spool.name)
+        raise
+
+    if spool is None:
+        return SpooledUpload(source=bytes(buffer), size=size, digest=sha256.hexdigest())
+
+    spool.close()
+    logger.info("Spooled %d byte upload to %s", size, spool.name)
+    return SpooledUpload(source=Path(spool.name), size=size, digest=sha256.hexdigest())
+
+
+def upload_request_limit(files: int = 1) -> int:
+    return files * (UPLOAD_MAX_BYTES + UPLOAD_FORM_OVERHEAD_BYTES)
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Turn away request bodies over the limit with a 413 before they are
+    received: by Content-Length up front, or for chunked requests as soon
+    as the bytes received pass it. FastAPI parses multipart forms into its
+    own spooled temp files before the route runs, so without this a huge
+    upload would be written to disk in full before spool_upload rejects it.
+    path_limits overrides max_bytes for individual paths.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_bytes)
+        response = JSONResponse(
+            {"detail": f"request body exceeds limit of {limit} bytes"}, status_code=413
+        )
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            await response(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > limit:
+                    rejected = True
+                    logger.info("Rejected request body over %d bytes", limit)
+                    await response(scope, receive, send)
+                    # the app sees the client go away and stops reading
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message: Message) -> None:
+            # the 413 is already sent; drop whatever the app answers
+            if not rejected:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
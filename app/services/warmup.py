@@ -0,0 +1,34 @@
+import time
+import asyncio
+import logging
+from app.db.database import database
+from app.services.ai import warm_up_client
+from app.services.pdf_parser import ocr_engine
+
+logger = logging.getLogger(__name__)
+
+
+def _warm_up_database() -> None:
+    from sqlalchemy import text
+    from sqlalchemy.exc import SQLAlchemyError
+
+    try:
+        with database.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except SQLAlchemyError as e:
+        logger.warning("Database warm-up failed: %s", e)
+
+
+async def warm_up() -> None:
+    """
+    Prime the OCR workers, the LLM connection pool and a database connection
+    so the first upload doesn't pay for them. Runs in the background after
+    startup; health checks are answered meanwhile.
+    """
+    started = time.perf_counter()
+    await asyncio.gather(
+        asyncio.to_thread(ocr_engine.warm_up),
+        asyncio.to_thread(_warm_up_database),
+        warm_up_client(),
+    )
+    logger.info("Warm-up finished in %.2fs", time.perf_counter() - started)
@@ -0,0 +1,181 @@
+"""
+Synthetic Malaysian bank statements for benchmarking, in a digital variant
+(real text layer, via fpdf2) and a scanned variant (page images only, via
+img2pdf) with a slight tilt and speckle like a photocopied statement.
+
+    python -m benchmarks.corpus out/ --pages 1 10 100
+"""
+import io
+import random
+import argparse
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import List, Optional
+import img2pdf
+import numpy as np
+import pymupdf
+from fpdf import FPDF
+from PIL import Image
+
+ROWS_PER_PAGE = 28
+SCAN_DPI = 200
+
+BANKS = ("MAYBANK", "CIMB BANK", "PUBLIC BANK", "RHB BANK", "HONG LEONG BANK")
+NAMES = (
+    "AHMAD BIN ISMAIL",
+    "NURUL AINA BT HASSAN",
+    "TAN WEI MING",
+    "SITI AISYAH BT OMAR",
+    "RAJESH A/L KUMAR",
+    "LIM CHEE KEONG",
+    "MUHAMMAD HAFIZ BIN ZAINAL",
+    "WONG MEI LING",
+)
+PURPOSES = (
+    "Futsal court booking",
+    "Monthly fee",
+    "Jersey payment",
+    "Tournament entry",
+    "Refund",
+    "Sewa gelanggang",
+    "Yuran bulanan",
+)
+GATEWAYS = ("TOYYIBPAY", "BILLPLZ", "FPX", "SHOPEE")
+
+
+@dataclass
+class StatementRow:
+    day: date
+    counterparty: str
+    purpose: str
+    amount: float
+    balance: float
+
+    def line(self) -> str:
+        sign = "+" if self.amount > 0 else "-"
+        return (
+            f"{self.day:%d/%m}  {self.counterparty}* {self.purpose}  "
+            f"{abs(self.amount):,.2f}{sign}  {self.balance:,.2f}"
+        )
+
+
+@dataclass
+class SyntheticStatement:
+    bank: str
+    account_holder: str
+    statement_date: date
+    rows: List[StatementRow]
+    pages: int
+
+
+def generate_statement(pages: int, seed: int = 0, rows_per_page: int = ROWS_PER_PAGE) -> SyntheticStatement:
+    rng = random.Random(seed)
+    statement_date = date(2024, rng.randint(1, 12), 1) + timedelta(days=27)
+    start = statement_date - timedelta(days=27)
+    balance = round(rng.uniform(1_000, 20_000), 2)
+
+    rows = []
+    row_count = pages * rows_per_page
+    for index in range(row_count):
+        day = start + timedelta(days=index * 28 // row_count)
+        amount = round(rng.uniform(5, 5_000), 2)
+        # savings accounts do not go overdrawn
+        credit = rng.random() < 0.45 or amount > balance
+        amount = amount if credit else -amount
+        balance = round(balance + amount, 2)
+        name = rng.choice(NAMES)
+        if rng.random() < 0.3:
+            counterparty = f"{rng.choice(GATEWAYS)} {name}"
+        else:
+            counterparty = f"TRANSFER {'FR' if credit else 'TO'} A/C {name}"
+        rows.append(StatementRow(day, counterparty, rng.choice(PURPOSES), amount, balance))
+
+    return SyntheticStatement(
+        bank=rng.choice(BANKS),
+        account_holder=rng.choice(NAMES),
+        statement_date=statement_date,
+        rows=rows,
+        pages=pages,
+    )
+
+
+def render_digital(statement: SyntheticStatement) -> bytes:
+    pdf = FPDF(format="A4")
+    pdf.set_auto_page_break(False)
+    per_page = len(statement.rows) // statement.pages
+
+    for page in range(statement.pages):
+        pdf.add_page()
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 7, statement.bank, new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", size=9)
+        pdf.cell(0, 5, f"ACCOUNT HOLDER : {statement.account_holder}", new_x="LMARGIN", new_y="NEXT")
+        pdf.cell(
+            0, 5, f"STATEMENT DATE : {statement.statement_date:%d/%m/%y}", new_x="LMARGIN", new_y="NEXT"
+        )
+        pdf.ln(3)
+        pdf.cell(0, 6, "DATE  DESCRIPTION  AMOUNT  BALANCE", border="TB", new_x="LMARGIN", new_y="NEXT")
+        for row in statement.rows[page * per_page:(page + 1) * per_page]:
+            pdf.cell(0, 8, row.line(), new_x="LMARGIN", new_y="NEXT")
+        pdf.cell(0, 1, "", border="T", new_x="LMARGIN", new_y="NEXT")
+        pdf.set_y(-15)
+        pdf.cell(0, 5, f"Page {page + 1} of {statement.pages}", align="C")
+
+    return bytes(pdf.output())
+
+
+def render_scanned(digital: bytes, seed: int = 0, dpi: int = SCAN_DPI) -> bytes:
+    """
+    Rasterize a digital statement into a PDF of grayscale page images with
+    a small rotation and speckle noise.
+    """
+    rng = np.random.default_rng(seed)
+    images = []
+    with pymupdf.open(stream=digital, filetype="pdf") as document:
+        for page in document:
+            pixmap = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+            image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+            image = image.rotate(rng.uniform(-1.5, 1.5), fillcolor=255)
+
+            pixels = np.asarray(image, dtype=np.int16)
+            pixels = pixels + rng.normal(0, 12, pixels.shape)
+            image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+            buffer = io.BytesIO()
+            image.save(buffer, format="PNG")
+            images.append(buffer.getvalue())
+
+    layout = img2pdf.get_fixed_dpi_layout_fun((dpi, dpi))
+    return img2pdf.convert(images, layout_fun=layout)
+
+
+def write_corpus(directory: Path, page_counts: List[int], seed: int = 0) -> List[Path]:
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for pages in page_counts:
+        statement = generate_statement(pages, seed + pages)
+        digital = render_digital(statement)
+        for variant, contents in (
+            ("digital", digital),
+            ("scanned", render_scanned(digital, seed + pages)),
+        ):
+            path = directory / f"statement_{pages:03d}p_{variant}.pdf"
+            path.write_bytes(contents)
+            paths.append(path)
+    return paths
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic bank statements")
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    for path in write_corpus(args.directory, args.pages, args.seed):
+        print(path)
+
+
+if __name__ == "__main__":
+    main()
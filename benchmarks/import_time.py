@@ -0,0 +1,167 @@
+"""
+Report where app startup time goes.
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --repeat 5 --budget-ms 1500 --output startup.json
+
+Imports app.main under `python -X importtime` in fresh interpreters and
+breaks the time down by top-level package, then times a cold start up to the
+first answered health check (import, lifespan startup, GET /api/v1/). Exits
+non-zero when a module that should load lazily was imported eagerly, or when
+the median time to the first health check exceeds --budget-ms.
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# loaded on first use or during warm-up, never by importing the app
+LAZY_MODULES = (
+    "groq", "cv2", "numpy", "pytesseract", "pdf2image", "pymupdf", "pyarrow", "sqlalchemy"
+)
+
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+# the test client itself is not part of the startup being measured
+from fastapi.testclient import TestClient
+harness = time.perf_counter() - imported
+with TestClient(app.main.app) as client:
+    ready = time.perf_counter()
+    client.get("/api/v1/").raise_for_status()
+    answered = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "lifespan": ready - imported - harness,
+    "first_health_check": answered - started - harness,
+}))
+"""
+
+
+def child_environment(workdir: Path) -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "import-time")
+    env["DATABASE_URL"] = f"sqlite:///{workdir / 'startup.db'}"
+    env["CACHE_DB_PATH"] = ""
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")]))
+    return env
+
+
+def import_profile(env: Dict[str, str]) -> List[dict]:
+    """
+    One row per imported module: self and cumulative microseconds, in the
+    order -X importtime prints them.
+    """
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=ROOT,
+    ).stderr
+
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append(
+            {"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us)}
+        )
+    return rows
+
+
+def startup_timings(env: Dict[str, str]) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT],
+        capture_output=True,
+        text=True,
+        check=True,
+        env=env,
+        cwd=ROOT,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def by_package(rows: List[dict]) -> Counter:
+    packages = Counter()
+    for row in rows:
+        packages[row["module"].split(".")[0]] += row["self_us"]
+    return packages
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="packages to list")
+    parser.add_argument("--budget-ms", type=float, help="max median time to first health check")
+    parser.add_argument("--output", type=Path, help="write the report as JSON")
+    args = parser.parse_args(argv)
+
+    env = child_environment(Path(tempfile.mkdtemp(prefix="flowcessor-startup-")))
+
+    profiles = [import_profile(env) for _ in range(args.repeat)]
+    startups = [startup_timings(env) for _ in range(args.repeat)]
+
+    # the slowest module list is noisy run to run; report the median run
+    totals = [next(row for row in rows if row["module"] == "app.main")["cumulative_us"] for rows in profiles]
+    median_rows = profiles[totals.index(sorted(totals)[len(totals) // 2])]
+    packages = by_package(median_rows)
+    eager = sorted(
+        module
+        for module in LAZY_MODULES
+        if any(row["module"] == module for rows in profiles for row in rows)
+    )
+    startup = {
+        stage: round(statistics.median(run[stage] for run in startups) * 1000, 1)
+        for stage in startups[0]
+    }
+
+    print(f"import app.main: {statistics.median(totals) / 1000:.0f} ms (median of {args.repeat})")
+    for package, self_us in packages.most_common(args.top):
+        print(f"  {self_us / 1000:8.1f} ms  {package}")
+    print(
+        f"startup: import {startup['import']:.0f} ms, lifespan {startup['lifespan']:.0f} ms, "
+        f"first health check at {startup['first_health_check']:.0f} ms"
+    )
+
+    if args.output:
+        report = {
+            "import_ms": round(statistics.median(totals) / 1000, 1),
+            "packages_ms": {
+                package: round(self_us / 1000, 1) for package, self_us in packages.most_common()
+            },
+            "startup_ms": startup,
+            "eager_lazy_modules": eager,
+        }
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"Wrote {args.output}", file=sys.stderr)
+
+    failed = False
+    if eager:
+        print(f"FAIL imported at startup, should be lazy: {', '.join(eager)}", file=sys.stderr)
+        failed = True
+    if args.budget_ms is not None and startup["first_health_check"] > args.budget_ms:
+        print(
+            f"FAIL first health check at {startup['first_health_check']:.0f} ms, "
+            f"budget {args.budget_ms:.0f} ms",
+            file=sys.stderr,
+        )
+        failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare OCR preprocessing settings on real statements: per-page OCR time
+and, where a reference text exists, character accuracy.
+
+    python -m benchmarks.ocr_settings statements/*.pdf --dpi 200 300 \
+        --threshold global otsu adaptive --deskew off on --psm 3 6
+
+The reference for a PDF is a .txt file next to it with the same name; for
+digital PDFs without one, the embedded text layer is used instead.
+"""
+import sys
+import json
+import time
+import argparse
+import itertools
+import statistics
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import List, Optional
+import pymupdf
+from app.services.pdf_parser import OCRSettings, ocr_page, render_page
+
+
+def reference_text(path: Path) -> Optional[str]:
+    sidecar = path.with_suffix(".txt")
+    if sidecar.exists():
+        return sidecar.read_text()
+
+    with pymupdf.open(path) as document:
+        text = "\n".join(page.get_text("text", sort=True) for page in document)
+    return text if text.strip() else None
+
+
+def accuracy(text: str, reference: str) -> float:
+    """
+    Similarity of the OCR output to the reference, ignoring whitespace.
+    """
+    return SequenceMatcher(None, "".join(text.split()), "".join(reference.split())).ratio()
+
+
+def run(paths: List[Path], settings: OCRSettings) -> dict:
+    page_seconds = []
+    scores = []
+    for path in paths:
+        with pymupdf.open(path) as document:
+            page_count = len(document)
+
+        texts = []
+        for number in range(1, page_count + 1):
+            started = time.perf_counter()
+            image = render_page(str(path), number, settings.dpi)
+            texts.append(ocr_page(image, settings.for_page(number)))
+            page_seconds.append(time.perf_counter() - started)
+
+        reference = reference_text(path)
+        if reference is not None:
+            scores.append(accuracy("\n".join(texts), reference))
+
+    return {
+        "settings": settings.fingerprint(),
+        "pages": len(page_seconds),
+        "seconds_per_page_p50": round(statistics.median(page_seconds), 3),
+        "seconds_per_page_max": round(max(page_seconds), 3),
+        "accuracy": round(statistics.mean(scores), 4) if scores else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("pdfs", nargs="+", type=Path)
+    parser.add_argument("--dpi", nargs="+", type=int, default=[200])
+    parser.add_argument("--threshold", nargs="+", default=["global"])
+    parser.add_argument("--deskew", nargs="+", choices=["off", "on"], default=["off"])
+    parser.add_argument("--crop-table", nargs="+", choices=["off", "on"], default=["off"])
+    parser.add_argument("--psm", nargs="+", type=int, default=[3])
+    parser.add_argument("--whitelist", default="")
+    parser.add_argument("--tessdata-dir", default="")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for dpi, threshold, deskew, crop_table, psm in itertools.product(
+        args.dpi, args.threshold, args.deskew, args.crop_table, args.psm
+    ):
+        settings = OCRSettings(
+            dpi=dpi,
+            threshold=threshold,
+            deskew=deskew == "on",
+            crop_table=crop_table == "on",
+            psm=psm,
+            whitelist=args.whitelist,
+            tessdata_dir=args.tessdata_dir,
+        )
+        result = run(args.pdfs, settings)
+        results.append(result)
+        print(
+            f"dpi={dpi} threshold={threshold} deskew={deskew} crop={crop_table} psm={psm}: "
+            f"{result['seconds_per_page_p50']}s/page p50, accuracy {result['accuracy']}",
+            file=sys.stderr,
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Benchmark the statement pipeline stage by stage on a synthetic corpus.
+
+    python -m benchmarks.run --pages 1 10 100 --repeat 3 --output results.json
+    python -m benchmarks.run --compare baseline.json --output results.json
+
+Each statement is timed through the individual stages (text layer, render,
+preprocess, OCR, clean, chunk, LLM, validate, persist) and end to end
+through process_statement. The LLM is a local stub server, the database a
+throwaway SQLite file and the extraction cache is disabled. Results hold
+p50/p95 per stage, pages per second and peak memory; --compare exits
+non-zero when a stage's p50 regressed past --tolerance.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import platform
+import argparse
+import resource
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+STAGES = (
+    "text_layer",
+    "render",
+    "preprocess",
+    "ocr",
+    "clean",
+    "chunk",
+    "llm",
+    "validate",
+    "persist",
+    "end_to_end",
+)
+
+BENCHMARK_USER_EMAIL = "benchmark@example.com"
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "runs": len(values),
+        "p50": round(percentile(values, 0.5), 6),
+        "p95": round(percentile(values, 0.95), 6),
+        "mean": round(statistics.mean(values), 6),
+    }
+
+
+def peak_rss_mb() -> dict:
+    # ru_maxrss is in KiB on Linux; children covers the OCR worker processes
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def configure_environment(args: argparse.Namespace, workdir: Path) -> None:
+    """
+    Must run before any app module is imported: app.config reads these at
+    import time.
+    """
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'benchmark.db'}"
+    os.environ["CACHE_MAX_BYTES"] = "0"
+    os.environ["CACHE_DB_PATH"] = ""
+    os.environ["LLM_RPM_LIMIT"] = str(args.llm_rpm)
+    os.environ["LLM_TPM_LIMIT"] = str(args.llm_tpm)
+
+
+def timed(timings: Dict[str, List[float]], stage: str, fn: Callable, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    timings.setdefault(stage, []).append(time.perf_counter() - started)
+    return result
+
+
+def reset_database() -> None:
+    """
+    Forget stored statements so repeated runs OCR and store their pages
+    and transactions again instead of reusing them.
+    """
+    from sqlalchemy import delete
+    from app.db.database import database
+    from app.db.models import Statement, StatementPage, TransactionRecord
+
+    with database.SessionLocal() as session:
+        for model in (TransactionRecord, StatementPage, Statement):
+            session.execute(delete(model))
+        session.commit()
+
+
+def benchmark_user_id() -> int:
+    """
+    A user to upload as; anonymous uploads aren't saved, so the end-to-end
+    run wouldn't include the persist stage.
+    """
+    from sqlalchemy import select
+    from app.db.database import database
+    from app.db.models import User
+
+    with database.SessionLocal() as session:
+        user = session.scalar(select(User).where(User.email == BENCHMARK_USER_EMAIL))
+        if user is None:
+            user = User(email=BENCHMARK_USER_EMAIL, hashed_password="-", is_active=True)
+            session.add(user)
+            session.commit()
+        return user.id
+
+
+def run_stages(path: Path, timings: Dict[str, List[float]]) -> None:
+    """
+    One pass through the individual stages, in process and in order, so
+    each stage is timed on its own.
+    """
+    import pymupdf
+    import pytesseract
+    from app.db.database import database
+    from app.db.repository import save_statement
+    from app.models.schemas import BankStatementResponse
+    from app.services.ai import generate_formatted_data, validate_json_with_schema
+    from app.services.chunker import chunk_token_budget, split_into_chunks
+    from app.services.pdf_parser import (
+        OCR,
+        TEXT_LAYER,
+        ExtractedPage,
+        has_text_layer,
+        join_pages,
+        ocr_engine,
+        preprocess_page,
+        render_page,
+        text_fingerprint,
+    )
+    from app.services.pipeline import clean_extracted_text
+    from app.services.prompt import prompt_overhead_tokens
+
+    settings = ocr_engine.settings
+    pages = []
+    with pymupdf.open(path) as document:
+        for number, page in enumerate(document, start=1):
+            text = timed(timings, "text_layer", page.get_text, "text", sort=True)
+            method = TEXT_LAYER
+            if not has_text_layer(text):
+                method = OCR
+                image = timed(timings, "render", render_page, str(path), number, settings.dpi)
+                processed = timed(timings, "preprocess", preprocess_page, image, settings)
+                text = timed(
+                    timings,
+                    "ocr",
+                    pytesseract.image_to_string,
+                    processed,
+                    settings.lang,
+                    settings.tesseract_config(),
+                )
+            pages.append(ExtractedPage(number, method, text, text_fingerprint(text)))
+
+    # joined as in the pipeline, page breaks included, so cleanup sees pages
+    cleaned, _ = timed(timings, "clean", clean_extracted_text, join_pages(pages))
+    budget = chunk_token_budget(prompt_overhead_tokens())
+    timed(timings, "chunk", split_into_chunks, cleaned, budget)
+
+    statement = timed(timings, "llm", asyncio.run, generate_formatted_data(cleaned))
+    # the LLM stage validates each chunk's rows as they arrive; this times a
+    # full statement validated from raw JSON
+    timed(
+        timings,
+        "validate",
+        validate_json_with_schema,
+        statement.model_dump_json(),
+        BankStatementResponse,
+    )
+
+    def persist():
+        with database.SessionLocal() as session:
+            save_statement(
+                session,
+                statement.transactions,
+                file_sha256="benchmark",
+                filename=path.name,
+                page_count=len(pages),
+                parser="llm",
+            )
+
+    reset_database()
+    timed(timings, "persist", persist)
+
+
+def run_end_to_end(path: Path, timings: Dict[str, List[float]]) -> str:
+    from app.services.pipeline import process_statement
+
+    reset_database()
+    result = timed(
+        timings,
+        "end_to_end",
+        asyncio.run,
+        process_statement(path, filename=path.name, user_id=benchmark_user_id()),
+    )
+    return result.parser
+
+
+def benchmark_file(path: Path, repeat: int) -> dict:
+    import pymupdf
+
+    with pymupdf.open(path) as document:
+        pages = len(document)
+
+    timings: Dict[str, List[float]] = {}
+    result = {"file": path.name, "pages": pages}
+    try:
+        for _ in range(repeat):
+            run_stages(path, timings)
+            result["parser"] = run_end_to_end(path, timings)
+    except Exception as e:
+        # e.g. tesseract or poppler missing for scanned statements
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    result["stages"] = {stage: summarize(timings[stage]) for stage in STAGES if stage in timings}
+    if "end_to_end" in timings:
+        result["pages_per_second"] = round(pages / result["stages"]["end_to_end"]["p50"], 3)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def compare(results: List[dict], baseline_path: Path, tolerance: float) -> List[str]:
+    baseline = {
+        entry["file"]: entry.get("stages", {})
+        for entry in json.loads(baseline_path.read_text())["results"]
+    }
+    regressions = []
+    for entry in results:
+        for stage, stats in entry.get("stages", {}).items():
+            before = baseline.get(entry["file"], {}).get(stage)
+            if before and stats["p50"] > before["p50"] * (1 + tolerance):
+                regressions.append(
+                    f"{entry['file']} {stage}: p50 {before['p50']:.4f}s -> {stats['p50']:.4f}s"
+                )
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=Path, help="directory of PDFs; generated when omitted")
+    parser.add_argument("--pages", nargs="+", type=int, default=[1, 10, 100])
+    parser.add_argument("--variants", nargs="+", choices=["digital", "scanned"], default=["digital", "scanned"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--stub-latency", type=float, default=0.3, help="seconds per LLM call")
+    parser.add_argument("--stub-tokens-per-second", type=float, default=800.0)
+    parser.add_argument("--llm-rpm", type=int, default=10_000)
+    parser.add_argument("--llm-tpm", type=int, default=10_000_000)
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--compare", type=Path, help="earlier results file to check against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown")
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="flowcessor-bench-"))
+    configure_environment(args, workdir)
+
+    from benchmarks.stub_llm import StubLLMServer
+
+    stub = StubLLMServer(args.stub_latency, args.stub_tokens_per_second).start()
+    os.environ["GROQ_BASE_URL"] = stub.base_url
+
+    from benchmarks.corpus import write_corpus
+    from app.db.database import init_db
+    from app.services.pdf_parser import ocr_engine
+
+    init_db()
+    if args.corpus is None:
+        paths = write_corpus(workdir / "corpus", args.pages)
+    else:
+        paths = sorted(args.corpus.glob("*.pdf"))
+    paths = [path for path in paths if any(variant in path.name for variant in args.variants)]
+
+    results = []
+    try:
+        for path in paths:
+            result = benchmark_file(path, args.repeat)
+            results.append(result)
+            summary = result.get("error") or (
+                f"{result['pages_per_second']} pages/s, "
+                f"end to end p50 {result['stages']['end_to_end']['p50']:.3f}s"
+            )
+            print(f"{path.name}: {summary}", file=sys.stderr)
+    finally:
+        ocr_engine.shutdown()
+        stub.stop()
+
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "stub_latency": args.stub_latency,
+            "llm_requests": stub.requests,
+        },
+        "results": results,
+    }
+    args.output.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
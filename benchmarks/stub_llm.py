@@ -0,0 +1,81 @@
+"""
+Local stand-in for the Groq chat completions API. Answers each chunk by
+running the rule parser over it and sleeps to imitate model latency, so
+the LLM stage can be benchmarked without network calls or quota.
+"""
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from app.services.chunker import estimate_tokens
+from app.services.rule_parser import parse_statement
+
+
+class StubLLMServer:
+    def __init__(self, base_latency: float = 0.3, output_tokens_per_second: float = 800.0):
+        self.base_latency = base_latency
+        self.output_tokens_per_second = output_tokens_per_second
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def completion(self, body: dict) -> dict:
+        prompt = "\n".join(message["content"] for message in body["messages"])
+        chunk = body["messages"][-1]["content"]
+        result = parse_statement(chunk)
+        transactions = [t.model_dump(mode="json") for t in result.transactions] if result else []
+        content = json.dumps({"transactions": transactions})
+
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        time.sleep(self.base_latency + completion_tokens / self.output_tokens_per_second)
+
+        return {
+            "id": f"stub-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    def start(self) -> "StubLLMServer":
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                stub.requests += 1
+                payload = json.dumps(stub.completion(json.loads(self.rfile.read(length)))).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
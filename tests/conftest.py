@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# app.config reads these at import time; the tests never call the LLM and
+# only use a throwaway SQLite database
+os.environ.setdefault("GROQ_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='flowcessor-tests-')}/test.db"
+os.environ["ASYNC_DATABASE_URL"] = ""
+os.environ["CACHE_MAX_BYTES"] = "0"
+os.environ["CACHE_DB_PATH"] = ""
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def db():
+    """
+    The app's database with its tables created, emptied after the test.
+    """
+    from app.db.database import Base, database, init_db
+
+    init_db()
+    yield database
+    with database.engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
@@ -0,0 +1,86 @@
+from dataclasses import replace
+from datetime import date
+
+from app.models.schemas import BankStatementResponse, Transaction
+from app.services import cache
+from app.services.cache import ExtractionCache, LRUCache
+from app.services.pdf_parser import ExtractedPage, ocr_engine
+
+PAGES = [ExtractedPage(1, "text_layer", "Statement Date: 31/03/2024", "fp1"), ExtractedPage(2, "ocr", "15/03 | X", "fp2")]
+STATEMENT = BankStatementResponse(
+    transactions=[
+        Transaction(
+            date=date(2024, 3, 15),
+            transaction="TRANSFER FR A/C JOHN DOE",
+            amount=-450.0,
+            description="",
+            category="transfer_out",
+            is_direct=True,
+        )
+    ]
+)
+
+
+def test_lru_evicts_least_recently_used_entries():
+    lru = LRUCache(max_bytes=10)
+    lru.set("a", b"aaaa")
+    lru.set("b", b"bbbb")
+    lru.get("a")
+    lru.set("c", b"cccc")
+
+    assert lru.get("a") == b"aaaa"
+    assert lru.get("b") is None
+    assert lru.get("c") == b"cccc"
+
+
+def test_lru_skips_values_larger_than_the_budget():
+    lru = LRUCache(max_bytes=3)
+    lru.set("a", b"aaaa")
+
+    assert lru.get("a") is None
+
+
+def test_pages_round_trip():
+    extraction_cache = ExtractionCache(max_bytes=1 << 20, db_path=None)
+    extraction_cache.set_pages("digest", PAGES)
+
+    assert extraction_cache.get_pages("digest") == PAGES
+    assert extraction_cache.get_pages("other") is None
+
+
+def test_ocr_settings_change_misses_the_page_caches(monkeypatch):
+    extraction_cache = ExtractionCache(max_bytes=1 << 20, db_path=None)
+    extraction_cache.set_pages("digest", PAGES)
+    extraction_cache.set_page_text("fp2", "15/03 | X")
+
+    monkeypatch.setattr(ocr_engine, "settings", replace(ocr_engine.settings, dpi=ocr_engine.settings.dpi + 100))
+
+    assert extraction_cache.get_pages("digest") is None
+    assert extraction_cache.get_page_text("fp2") is None
+
+
+def test_statements_are_keyed_on_the_cleaned_text():
+    extraction_cache = ExtractionCache(max_bytes=1 << 20, db_path=None)
+    extraction_cache.set_statement("cleaned text", STATEMENT)
+
+    assert extraction_cache.get_statement("cleaned text") == STATEMENT
+    # e.g. the same upload re-OCRed at another DPI
+    assert extraction_cache.get_statement("cleaned text, OCRed differently") is None
+
+
+def test_prompt_change_misses_the_statement_cache(monkeypatch):
+    extraction_cache = ExtractionCache(max_bytes=1 << 20, db_path=None)
+    extraction_cache.set_statement("cleaned text", STATEMENT)
+
+    monkeypatch.setattr(cache, "prompt_version", lambda: "another prompt")
+
+    assert extraction_cache.get_statement("cleaned text") is None
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.db")
+    ExtractionCache(max_bytes=1 << 20, db_path=path).set_statement("cleaned text", STATEMENT)
+
+    restarted = ExtractionCache(max_bytes=1 << 20, db_path=path)
+
+    assert restarted.get_statement("cleaned text") == STATEMENT
@@ -0,0 +1,34 @@
+from datetime import date
+
+from app.models.schemas import Transaction
+from app.services.ai import ChunkMerger
+
+
+def transaction(day, amount=-450.0):
+    return Transaction(
+        date=date(2024, 3, day),
+        transaction="TRANSFER FR A/C JOHN DOE",
+        amount=amount,
+        description="",
+        category="transfer_out",
+        is_direct=True,
+    )
+
+
+def test_chunks_are_released_in_document_order():
+    merger = ChunkMerger()
+    first, second, third = [transaction(1)], [transaction(2)], [transaction(3)]
+
+    assert merger.add(2, third) == []
+    assert merger.add(0, first) == [(0, first)]
+    assert merger.add(1, second) == [(1, second), (2, third)]
+    assert merger.transactions == first + second + third
+
+
+def test_identical_rows_across_a_chunk_boundary_are_kept():
+    # two equal payments on the same day, one on each side of the boundary
+    merger = ChunkMerger()
+    merger.add(0, [transaction(1), transaction(5)])
+    merger.add(1, [transaction(5), transaction(6)])
+
+    assert [t.date.day for t in merger.transactions] == [1, 5, 5, 6]
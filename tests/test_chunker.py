@@ -0,0 +1,82 @@
+import pytest
+
+from app.services.chunker import CHARS_PER_TOKEN, is_transaction_row, split_into_chunks
+
+HEADER = ["Statement Date: 31/03/2024", "Date | Transaction Description | Transaction Amount |"]
+
+
+def rows(count):
+    lines = []
+    for day in range(1, count + 1):
+        lines += [f"{day:02d}/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |", "Friendly game payment"]
+    return lines
+
+
+def body(chunk):
+    return [line for line in chunk.splitlines() if line not in HEADER]
+
+
+def test_small_text_is_one_chunk():
+    text = "\n".join(HEADER + rows(3))
+
+    assert split_into_chunks(text, max_tokens=10_000) == [text]
+
+
+def test_every_line_lands_in_exactly_one_chunk():
+    lines = rows(40)
+    chunks = split_into_chunks("\n".join(HEADER + lines), max_tokens=100)
+
+    assert len(chunks) > 1
+    assert [line for chunk in chunks for line in body(chunk)] == lines
+
+
+def test_chunks_repeat_the_header_and_stay_within_budget():
+    chunks = split_into_chunks("\n".join(HEADER + rows(40)), max_tokens=100)
+
+    for chunk in chunks:
+        assert chunk.splitlines()[: len(HEADER)] == HEADER
+        assert len(chunk) <= 100 * CHARS_PER_TOKEN
+
+
+def test_rows_are_not_split_from_their_continuation_lines():
+    chunks = split_into_chunks("\n".join(HEADER + rows(40)), max_tokens=100)
+
+    for chunk in chunks:
+        assert body(chunk)[0].endswith("450.00- |")
+        assert body(chunk)[-1] == "Friendly game payment"
+
+
+def test_header_prefix_stops_at_the_first_row():
+    # a statement whose first row is within HEADER_LINES must not have that
+    # row repeated in every chunk
+    lines = ["Statement Date: 31/03/2024"] + rows(40)
+    chunks = split_into_chunks("\n".join(lines), max_tokens=100)
+
+    first_row = lines[1]
+    assert sum(chunk.splitlines().count(first_row) for chunk in chunks) == 1
+
+
+def test_blank_text_has_no_chunks():
+    assert split_into_chunks("\n  \n", max_tokens=100) == []
+
+
+@pytest.mark.parametrize(
+    "line",
+    ["15/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |", "| 15/03 | X | 1.00+ |", "15-03-2024 SALARY 1.00+", "15 MAR SALARY"],
+)
+def test_dated_lines_with_content_are_rows(line):
+    assert is_transaction_row(line)
+
+
+@pytest.mark.parametrize("line", ["1/3", "2/3 ", "12/12", "31/03/2024", "15 MAR", "Page 1 of 3"])
+def test_page_numbers_and_bare_dates_are_not_rows(line):
+    assert not is_transaction_row(line)
+
+
+def test_page_numbers_do_not_start_row_groups():
+    lines = HEADER + ["01/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |", "Friendly game payment", "1/3"] + rows(40)
+    chunks = split_into_chunks("\n".join(lines), max_tokens=100)
+
+    # the page number stays with the row above it instead of opening a
+    # group of its own that a chunk could start with
+    assert all(body(chunk)[0].endswith("450.00- |") for chunk in chunks)
@@ -0,0 +1,133 @@
+import csv
+import io
+import sys
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth.jwt_handler import create_access_token
+from app.db.repository import save_statement
+from app.models.schemas import Transaction
+from app.services import export
+from app.services.export import (
+    ARROW,
+    CSV,
+    PARQUET,
+    STATEMENT_COLUMNS,
+    STORED_COLUMNS,
+    export_stream,
+    statement_transaction_batches,
+    stored_transaction_batches,
+)
+
+
+def transaction(day, amount, category="transfer_out"):
+    return Transaction(
+        date=date(2024, 3, day),
+        transaction=f"TRANSFER FR A/C JOHN DOE* Payment {day}",
+        amount=amount,
+        description="",
+        category=category,
+        is_direct=True,
+    )
+
+
+TRANSACTIONS = [
+    transaction(1, -10.0),
+    transaction(2, 250.0, "salary"),
+    transaction(3, -30.5),
+]
+
+
+def read_csv(chunks):
+    return list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+
+
+def store(db, transactions, user_id):
+    with db.SessionLocal() as session:
+        save_statement(
+            session,
+            transactions,
+            file_sha256=f"sha-{user_id}",
+            filename="statement.pdf",
+            page_count=1,
+            parser="rules",
+            user_id=user_id,
+        )
+
+
+def test_statement_csv_marks_duplicates():
+    batches = statement_transaction_batches(TRANSACTIONS, duplicates=[1])
+    rows = read_csv(export_stream(CSV, STATEMENT_COLUMNS, batches))
+
+    assert [row["amount"] for row in rows] == ["-10.0", "250.0", "-30.5"]
+    assert [row["duplicate"] for row in rows] == ["False", "True", "False"]
+
+
+def test_statement_rows_are_filtered_and_batched(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_ROWS", 1)
+
+    batches = list(
+        statement_transaction_batches(
+            TRANSACTIONS, start=date(2024, 3, 2), categories=["transfer_out"]
+        )
+    )
+
+    assert [[row[0] for row in batch] for batch in batches] == [[date(2024, 3, 3)]]
+
+
+def test_parquet_has_a_row_group_per_batch(monkeypatch):
+    monkeypatch.setattr(export, "EXPORT_BATCH_ROWS", 2)
+
+    chunks = list(
+        export_stream(PARQUET, STATEMENT_COLUMNS, statement_transaction_batches(TRANSACTIONS))
+    )
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(chunks)))
+
+    assert parquet.metadata.num_row_groups == 2
+    table = parquet.read()
+    assert table.column("date").to_pylist() == [t.date for t in TRANSACTIONS]
+    assert table.schema.field("amount").type == pa.float64()
+
+
+def test_arrow_stream_round_trips():
+    chunks = export_stream(ARROW, STATEMENT_COLUMNS, statement_transaction_batches(TRANSACTIONS))
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+
+    assert table.column_names == list(STATEMENT_COLUMNS)
+    assert table.column("category").to_pylist() == ["transfer_out", "salary", "transfer_out"]
+    assert table.column("duplicate").to_pylist() == [False, False, False]
+
+
+def test_stored_export_is_the_users_own_rows(db):
+    store(db, TRANSACTIONS, user_id=1)
+    store(db, [transaction(4, -1.0)], user_id=2)
+
+    rows = read_csv(
+        export_stream(CSV, STORED_COLUMNS, stored_transaction_batches(1, end=date(2024, 3, 2)))
+    )
+
+    assert list(rows[0]) == list(STORED_COLUMNS)
+    assert [row["date"] for row in rows] == ["2024-03-01", "2024-03-02"]
+    assert [row["amount"] for row in rows] == ["-10.00", "250.00"]
+
+
+def test_arrow_formats_without_pyarrow_are_not_implemented(db, monkeypatch):
+    from app.main import app
+
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    client = TestClient(app)
+    headers = {"Authorization": f"Bearer {create_access_token('1', [])}"}
+
+    response = client.get("/api/v1/transactions/export?format=parquet", headers=headers)
+    assert response.status_code == 501
+    assert client.get("/api/v1/transactions/export", headers=headers).status_code == 200
+
+
+def test_stored_columns_match_the_repository():
+    from app.db.repository import STORED_TRANSACTION_COLUMNS
+
+    assert STORED_COLUMNS == tuple(column.key for column in STORED_TRANSACTION_COLUMNS)
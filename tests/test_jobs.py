@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth.jwt_handler import create_access_token
+from app.models.schemas import StatementUploadResponse
+from app.services import jobs
+from app.services.jobs import FAILED, SUCCEEDED, Job, JobQueue, JobQueueFull
+from app.services.pipeline import EXTRACT_STAGE, PipelineEvent
+from app.services.uploads import SpooledUpload
+
+
+def upload(tmp_path, name="statement.pdf"):
+    path = tmp_path / name
+    path.write_bytes(b"%PDF-1.4")
+    return SpooledUpload(source=path, size=8, digest=name)
+
+
+async def finished(queue, job):
+    while job.finished_at is None:
+        await asyncio.sleep(0)
+    return queue.get(job.id, job.user_id)
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    calls = []
+
+    async def process_statement(source, on_event, filename, user_id, digest):
+        calls.append((filename, user_id, digest))
+        on_event(PipelineEvent(EXTRACT_STAGE, 1, 2))
+        if filename == "broken.pdf":
+            raise ValueError("not a statement")
+        return StatementUploadResponse(transactions=[], pages=[])
+
+    monkeypatch.setattr(jobs, "process_statement", process_statement)
+    return calls
+
+
+def test_job_runs_and_discards_its_upload(tmp_path, pipeline):
+    async def main():
+        queue = JobQueue(workers=1)
+        await queue.start()
+        spooled = upload(tmp_path)
+        job = await finished(queue, queue.submit(spooled, "statement.pdf", user_id=7))
+        await queue.stop()
+        return spooled, job
+
+    spooled, job = asyncio.run(main())
+
+    assert job.status == SUCCEEDED
+    assert job.result.transactions == []
+    assert job.stages[EXTRACT_STAGE] == {"completed": 1, "total": 2}
+    assert pipeline == [("statement.pdf", 7, "statement.pdf")]
+    assert not spooled.source.exists()
+
+
+def test_failed_job_keeps_the_error(tmp_path, pipeline):
+    async def main():
+        queue = JobQueue(workers=1)
+        await queue.start()
+        job = await finished(queue, queue.submit(upload(tmp_path), "broken.pdf"))
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+
+    assert job.status == FAILED
+    assert job.error == "not a statement"
+
+
+def test_full_queue_rejects_submissions(tmp_path, pipeline):
+    async def main():
+        # no workers have had a chance to run, so nothing is drained
+        queue = JobQueue(workers=1, max_depth=1)
+        await queue.start()
+        first = queue.submit(upload(tmp_path, "a.pdf"))
+        with pytest.raises(JobQueueFull):
+            queue.submit(upload(tmp_path, "b.pdf"))
+        await queue.stop()
+        return first
+
+    first = asyncio.run(main())
+
+    # stopping drops uploads that never ran
+    assert first.upload is None
+    assert not (tmp_path / "a.pdf").exists()
+
+
+def test_finished_jobs_expire(tmp_path, pipeline):
+    async def main():
+        queue = JobQueue(workers=1, result_ttl=0)
+        await queue.start()
+        job = await finished(queue, queue.submit(upload(tmp_path, "a.pdf")))
+        job.finished_at -= 1
+        queue.submit(upload(tmp_path, "b.pdf"))
+        await queue.stop()
+        return queue, job
+
+    queue, job = asyncio.run(main())
+
+    assert queue.get(job.id) is None
+
+
+def test_jobs_are_only_visible_to_their_owner():
+    queue = JobQueue()
+    owned = Job(id="owned", filename=None, upload=None, user_id=1)
+    anonymous = Job(id="anonymous", filename=None, upload=None)
+    queue._jobs.update({job.id: job for job in (owned, anonymous)})
+
+    assert queue.get("owned", 1) is owned
+    assert queue.get("owned", 2) is None
+    assert queue.get("owned") is None
+    assert queue.get("anonymous", 2) is anonymous
+
+
+def test_job_endpoint_hides_other_users_jobs(monkeypatch):
+    from app.main import app
+
+    job = Job(id="owned", filename="statement.pdf", upload=None, user_id=1)
+    monkeypatch.setitem(jobs.job_queue._jobs, job.id, job)
+    client = TestClient(app)
+
+    def get(subject=None):
+        headers = {"Authorization": f"Bearer {create_access_token(subject, [])}"} if subject else {}
+        return client.get("/api/v1/jobs/owned", headers=headers)
+
+    assert get("1").status_code == 200
+    assert get("2").status_code == 404
+    assert get().status_code == 404
@@ -0,0 +1,67 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pymupdf
+import pytest
+
+from app.services import pdf_parser
+from app.services.pdf_parser import OCR, OCREngine
+
+
+def scanned_pdf(pages):
+    """
+    A PDF of blank pages, which have no text layer and so go to OCR.
+    """
+    document = pymupdf.open()
+    for _ in range(pages):
+        document.new_page()
+    return document.tobytes()
+
+
+def test_page_cap_is_shared_by_every_caller(monkeypatch):
+    engine = OCREngine(max_pages_in_flight=2)
+    workers = ThreadPoolExecutor(max_workers=8)
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, highest
+
+    def render_page(path, number, dpi):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight)
+        return number
+
+    def ocr(number, settings):
+        time.sleep(0.01)
+        with lock:
+            in_flight[0] -= 1
+        return f"page {number}", None
+
+    monkeypatch.setattr(pdf_parser, "render_page", render_page)
+    monkeypatch.setattr(engine, "_submit", lambda fn, *args: (workers.submit(ocr, *args), None))
+
+    source = scanned_pdf(4)
+    with ThreadPoolExecutor(max_workers=3) as callers:
+        results = list(callers.map(lambda _: list(engine.iter_pages(source)), range(3)))
+    workers.shutdown()
+
+    assert in_flight == [0, 2]
+    for pages in results:
+        assert [page.number for page in pages] == [1, 2, 3, 4]
+        assert [page.text for page in pages] == ["page 1", "page 2", "page 3", "page 4"]
+        assert all(page.method == OCR for page in pages)
+
+
+def test_page_slot_is_released_when_rendering_fails(monkeypatch):
+    engine = OCREngine(max_pages_in_flight=1)
+
+    def render_page(path, number, dpi):
+        raise pdf_parser.PDFParserError("unreadable page")
+
+    monkeypatch.setattr(pdf_parser, "render_page", render_page)
+
+    for _ in range(2):
+        with pytest.raises(pdf_parser.PDFParserError):
+            list(engine.iter_pages(scanned_pdf(1)))
+
+    assert engine._page_slots.acquire(blocking=False)
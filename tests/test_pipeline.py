@@ -0,0 +1,157 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from app.db.models import Statement, StatementPage, TransactionRecord
+from app.models.schemas import BankStatementResponse
+from app.services import pipeline
+from app.services.pdf_parser import TEXT_LAYER, ExtractedPage, text_fingerprint
+from app.services.pipeline import STRUCTURE_STAGE, process_statement
+from app.services.rule_parser import parse_statement
+
+HEADER = "MAYBANK ISLAMIC BERHAD\nStatement Date: 31/03/2024\n"
+
+
+def page_text(first_day, rows=3):
+    return HEADER + "\n".join(
+        f"{day:02d}/03 | TRANSFER FR A/C JOHN DOE* Payment {day} | {day}.00- |"
+        for day in range(first_day, first_day + rows)
+    )
+
+
+def pdf(*first_days):
+    """
+    A fake upload: its bytes name the pages extract_pages_from_pdf returns.
+    """
+    return ",".join(str(day) for day in first_days).encode()
+
+
+@pytest.fixture
+def extract(monkeypatch):
+    def extract_pages_from_pdf(source, on_page=None, known_text=None):
+        pages = []
+        for number, day in enumerate(source.decode().split(","), start=1):
+            text = page_text(int(day))
+            pages.append(ExtractedPage(number, TEXT_LAYER, text, text_fingerprint(text)))
+        return pages
+
+    monkeypatch.setattr(pipeline, "extract_pages_from_pdf", extract_pages_from_pdf)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """
+    Force the LLM path and record what is sent to it; the stand-in LLM
+    structures text with the rule parser.
+    """
+    calls = []
+
+    async def generate_formatted_data(text, on_chunk=None):
+        calls.append(text)
+        return BankStatementResponse(transactions=parse_statement(text).transactions)
+
+    monkeypatch.setattr(pipeline, "RULE_PARSER_MIN_CONFIDENCE", 2.0)
+    monkeypatch.setattr(pipeline, "generate_formatted_data", generate_formatted_data)
+    return calls
+
+
+def run(source, user_id=1, on_event=None):
+    return asyncio.run(process_statement(source, on_event=on_event, user_id=user_id))
+
+
+def count(db, model):
+    with db.SessionLocal() as session:
+        return session.scalar(select(func.count()).select_from(model))
+
+
+def test_rules_parse_and_store_a_statement(db, extract):
+    result = run(pdf(1, 4))
+
+    assert result.parser == "rules"
+    assert len(result.transactions) == 6
+    assert result.duplicates == []
+    assert result.statement_id is not None
+    assert count(db, TransactionRecord) == 6
+
+
+def test_reupload_returns_every_row_with_duplicates_flagged(db, extract):
+    run(pdf(1, 4))
+    result = run(pdf(1, 4))
+
+    assert len(result.transactions) == 6
+    assert result.duplicates == list(range(6))
+    assert all(page.duplicate for page in result.pages)
+    assert count(db, TransactionRecord) == 6
+
+
+def test_anonymous_uploads_are_not_stored(db, extract):
+    result = run(pdf(1, 4), user_id=None)
+
+    assert len(result.transactions) == 6
+    assert result.statement_id is None
+    assert count(db, Statement) == 0
+
+
+def test_users_are_deduplicated_separately(db, extract):
+    run(pdf(1, 4), user_id=1)
+    result = run(pdf(1, 4), user_id=2)
+
+    assert result.duplicates == []
+    assert count(db, TransactionRecord) == 12
+
+
+def test_only_new_pages_are_sent_to_the_llm(db, extract, llm):
+    run(pdf(1, 4))
+    llm.clear()
+
+    events = []
+    result = run(pdf(1, 4, 7), on_event=events.append)
+
+    # one call, for the new page only, with the statement header
+    assert len(llm) == 1
+    assert "07/03" in llm[0] and "01/03" not in llm[0] and "04/03" not in llm[0]
+    assert "Statement Date: 31/03/2024" in llm[0]
+    assert [t.date.day for t in result.transactions] == list(range(1, 10))
+    assert result.duplicates == list(range(6))
+    assert count(db, TransactionRecord) == 9
+
+    structure = [event.data for event in events if event.stage == STRUCTURE_STAGE]
+    assert [data["stored"] for data in structure] == [True, False]
+
+
+def test_new_pages_between_stored_ones_keep_document_order(db, extract, llm):
+    run(pdf(1))
+    run(pdf(7))
+    llm.clear()
+
+    result = run(pdf(1, 4, 7))
+
+    assert len(llm) == 1
+    assert [t.date.day for t in result.transactions] == list(range(1, 10))
+
+
+def test_fully_stored_statement_skips_the_llm(db, extract, llm):
+    run(pdf(1, 4))
+    llm.clear()
+
+    result = run(pdf(4, 1))
+
+    assert llm == []
+    assert [t.date.day for t in result.transactions] == [4, 5, 6, 1, 2, 3]
+
+
+def test_rows_that_cant_be_attributed_to_pages_are_not_reused(db, extract, llm, monkeypatch):
+    async def drops_a_row(text, on_chunk=None):
+        llm.append(text)
+        return BankStatementResponse(transactions=parse_statement(text).transactions[1:])
+
+    monkeypatch.setattr(pipeline, "generate_formatted_data", drops_a_row)
+    run(pdf(1, 4))
+
+    with db.SessionLocal() as session:
+        assert session.scalars(select(StatementPage.rows)).all() == [None, None]
+
+    llm.clear()
+    run(pdf(1, 4, 7))
+    assert len(llm) == 1 and "01/03" in llm[0]
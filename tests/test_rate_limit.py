@@ -0,0 +1,166 @@
+import asyncio
+
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import (
+    MIN_RATE_FACTOR,
+    RateLimitScheduler,
+    TokenBucket,
+    parse_duration,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+def test_bucket_starts_full(clock):
+    bucket = TokenBucket(60)
+
+    assert bucket.wait_time(60, 1.0) == 0.0
+
+
+def test_bucket_waits_for_the_missing_amount(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+
+    # refills at one unit per second
+    assert bucket.wait_time(10, 1.0) == pytest.approx(10.0)
+    clock.now += 4
+    assert bucket.wait_time(10, 1.0) == pytest.approx(6.0)
+
+
+def test_bucket_never_refills_past_its_limit(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(30)
+    clock.now += 3600
+
+    bucket.wait_time(0, 1.0)
+    assert bucket.level == 60
+
+
+def test_oversized_requests_wait_for_a_full_bucket(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+
+    assert bucket.wait_time(600, 1.0) == pytest.approx(60.0)
+
+
+def test_lower_rate_factor_slows_the_refill(clock):
+    bucket = TokenBucket(60)
+    bucket.consume(60)
+
+    assert bucket.wait_time(10, 0.5) == pytest.approx(20.0)
+
+
+def test_usage_can_overdraw_and_headers_cap_the_bucket(clock):
+    scheduler = RateLimitScheduler(rpm=60, tpm=1000)
+    scheduler.tokens.consume(100)
+
+    # the call used 300 tokens where 100 were reserved
+    scheduler.observe({}, reserved_tokens=100, used_tokens=300)
+    assert scheduler.tokens.level == 700
+
+    scheduler.observe({"x-ratelimit-remaining-tokens": "50"}, 0, None)
+    assert scheduler.tokens.level == 50
+
+
+def test_exhausted_request_quota_pauses_until_reset(clock):
+    scheduler = RateLimitScheduler(rpm=60, tpm=1000)
+
+    scheduler.observe(
+        {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "2m0.5s"}, 0, None
+    )
+
+    assert scheduler.paused_until == clock.now + 120.5
+    assert scheduler._delay(1) == pytest.approx(120.5)
+
+
+def test_throttling_halves_the_rate_and_success_recovers_it(clock):
+    scheduler = RateLimitScheduler(rpm=60, tpm=1000)
+
+    assert scheduler._throttled({"retry-after": "7"}, attempt=0) == 7.0
+    assert scheduler.rate_factor == 0.5
+    assert scheduler.paused_until == clock.now + 7
+
+    for _ in range(10):
+        scheduler._throttled({"retry-after": "1"}, attempt=0)
+    assert scheduler.rate_factor == MIN_RATE_FACTOR
+
+    scheduler.observe({}, 0, None)
+    assert scheduler.rate_factor == pytest.approx(MIN_RATE_FACTOR + rate_limit.RATE_RECOVERY_STEP)
+
+
+def test_callers_go_in_priority_order():
+    scheduler = RateLimitScheduler(rpm=1000, tpm=100_000, max_concurrency=1)
+    order = []
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+            return "first", {}, 10
+
+        async def record(name):
+            order.append(name)
+            return name, {}, 10
+
+        first = asyncio.create_task(scheduler.run(hold, 10))
+        await asyncio.sleep(0)
+        late = asyncio.create_task(scheduler.run(lambda: record("late"), 10, priority=5))
+        early = asyncio.create_task(scheduler.run(lambda: record("early"), 10, priority=1))
+        while scheduler.waiting < 2:
+            await asyncio.sleep(0)
+
+        release.set()
+        await asyncio.gather(first, late, early)
+
+    asyncio.run(main())
+    assert order == ["early", "late"]
+    assert scheduler.in_flight == 0
+
+
+@pytest.mark.parametrize(
+    "value, seconds",
+    [("7.66s", 7.66), ("2m59.56s", 179.56), ("120ms", 0.12), ("1h", 3600.0), ("3", 3.0)],
+)
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == pytest.approx(seconds)
+
+
+def test_parse_duration_rejects_garbage():
+    assert parse_duration(None) is None
+    assert parse_duration("soon") is None
+
+
+def test_default_chunks_fit_the_token_quota_concurrently(clock):
+    from app.config import LLM_MAX_CONCURRENCY
+    from app.services.ai import reserved_tokens
+    from app.services.chunker import chunk_token_budget, split_into_chunks
+    from app.services.prompt import prompt_overhead_tokens
+
+    rows = "\n".join(
+        f"{day % 28 + 1:02d}/03 | TRANSFER FR A/C JOHN DOE* Friendly game payment | 450.00- |"
+        for day in range(500)
+    )
+    chunks = split_into_chunks("Statement Date: 31/03/2024\n" + rows, chunk_token_budget(prompt_overhead_tokens()))
+    scheduler = RateLimitScheduler()
+
+    # a full bucket lets LLM_MAX_CONCURRENCY of the largest chunks start at once
+    largest = max(reserved_tokens(chunk) for chunk in chunks)
+    for _ in range(LLM_MAX_CONCURRENCY):
+        assert scheduler.tokens.wait_time(largest, 1.0) == 0.0
+        scheduler.tokens.consume(largest)
@@ -0,0 +1,75 @@
+from datetime import date
+
+from app.services.rule_parser import parse_statement
+
+PIPE_TABLE = """
+Statement Date: 31/01/2024
+Date | Transaction Description | Transaction Amount |
+28/12 | TRANSFER FR A/C JOHN DOE* Friendly game payment | 450.00- |
+15/01 | TRANSFER TO A/C TOYYIBPAY SDN. BHD.* NPR4TADN040302414 MBB CT- | 2,380.00+ |
+25/01 | TRANSFER TO A/C CAROLYN BESSETE* Jersey payment | 100.00+ |
+"""
+
+
+def test_pipe_table_rows_are_parsed():
+    result = parse_statement(PIPE_TABLE)
+
+    assert result.layout == "pipe_table"
+    assert result.confidence == 1.0
+    first, second, third = result.transactions
+    # December rows on a January statement belong to the previous year
+    assert first.date == date(2023, 12, 28)
+    assert first.transaction == "TRANSFER FR A/C JOHN DOE"
+    assert first.description == "Friendly game payment"
+    assert first.amount == -450.0
+    assert first.category == "transfer_out"
+    assert first.is_direct
+    assert second.amount == 2380.0
+    assert second.description == "NPR4TADN040302414 MBB CT"
+    assert second.category == "transfer_in"
+    assert not second.is_direct
+    assert third.date == date(2024, 1, 25)
+
+
+def test_plain_columns_with_running_balance():
+    text = """
+Statement Date: 31/03/2024
+15/03 TRANSFER FR A/C JOHN DOE* Friendly game payment 450.00- 1,550.00
+21/03 TRANSFER TO A/C SHOPEE* Order 12 380.00+ 1,930.00
+"""
+    result = parse_statement(text)
+
+    assert result.layout == "plain_columns"
+    assert [t.amount for t in result.transactions] == [-450.0, 380.0]
+    assert not result.transactions[1].is_direct
+
+
+def test_unparseable_rows_lower_confidence():
+    text = PIPE_TABLE + "26/01 | something the layout doesn't cover\n"
+
+    result = parse_statement(text)
+
+    assert len(result.transactions) == 3
+    assert result.confidence == 0.75
+
+
+def test_no_statement_date_or_layout():
+    assert parse_statement("15/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |") is None
+    assert parse_statement("Statement Date: 31/03/2024\nnothing to see") is None
+
+
+def test_statement_period_across_a_year_boundary():
+    text = """
+Statement Period: 15/12/2023 - 14/01/2024
+20/12 | TRANSFER FR A/C JOHN DOE* Friendly game payment | 450.00- |
+05/01 | TRANSFER TO A/C CAROLYN BESSETE* Jersey payment | 100.00+ |
+"""
+    result = parse_statement(text)
+
+    assert [t.date for t in result.transactions] == [date(2023, 12, 20), date(2024, 1, 5)]
+
+
+def test_statement_date_label_wins_over_other_dates():
+    text = "Statement Date: 31/01/2024\nPrinted 02/02/2024\n" + PIPE_TABLE.split("\n", 2)[2]
+
+    assert [t.date.year for t in parse_statement(text).transactions] == [2023, 2024, 2024]
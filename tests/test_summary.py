@@ -0,0 +1,61 @@
+from datetime import date
+
+from app.db.repository import save_statement, search_transactions, summarize_transactions
+from app.models.schemas import Transaction
+
+
+def transaction(day, name, amount):
+    return Transaction(
+        date=date(2024, 3, day),
+        transaction=name,
+        amount=amount,
+        description="",
+        category="transfer_out",
+        is_direct=False,
+    )
+
+
+def test_counterparty_summary_groups_normalized_names(db):
+    with db.SessionLocal() as session:
+        save_statement(
+            session,
+            [
+                transaction(1, "Toyyibpay Sdn. Bhd.*", -10.0),
+                transaction(2, "TOYYIBPAY SDN BHD", -5.0),
+                transaction(3, "Shopee", -1.0),
+            ],
+            file_sha256="sha",
+            filename="statement.pdf",
+            page_count=1,
+            parser="rules",
+            user_id=1,
+        )
+
+        buckets = summarize_transactions(session, "counterparty", user_id=1)
+
+    assert [(b["key"], b["transactions"], b["debits"]) for b in buckets] == [
+        ("TOYYIBPAY SDN BHD", 2, -15.0),
+        ("SHOPEE", 1, -1.0),
+    ]
+
+
+def test_transfers_are_summarized_and_searched_by_payee(db):
+    with db.SessionLocal() as session:
+        save_statement(
+            session,
+            [
+                transaction(1, "TRANSFER FR A/C JOHN DOE* Payment", 50.0),
+                transaction(2, "TRANSFER TO A/C JOHN DOE* Payment", -20.0),
+            ],
+            file_sha256="sha",
+            filename="statement.pdf",
+            page_count=1,
+            parser="rules",
+            user_id=1,
+        )
+
+        buckets = summarize_transactions(session, "counterparty", user_id=1)
+        rows, _ = search_transactions(session, user_id=1, counterparty="john doe")
+
+    assert [(b["key"], b["transactions"]) for b in buckets] == [("JOHN DOE PAYMENT", 2)]
+    assert [row["counterparty"] for row in rows] == ["JOHN DOE PAYMENT"] * 2
@@ -0,0 +1,91 @@
+from app.services.pdf_parser import PAGE_BREAK, clean_text
+
+HEADER = [
+    "MAYBANK ISLAMIC BERHAD",
+    "Statement Date: 31/03/2024",
+    "Date | Transaction Description | Transaction Amount |",
+]
+FOOTER = ["Member of PIDM", "Protected by PIDM up to RM250,000"]
+
+
+def statement(*pages):
+    return (PAGE_BREAK + "\n").join("\n".join(lines) + "\n" for lines in pages)
+
+
+def page(number, rows, footer=FOOTER):
+    return HEADER + rows + footer + [f"Page {number} of 2"]
+
+
+def test_repeated_headers_footers_and_page_numbers_are_dropped():
+    first = ["03/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |", "Friendly game payment",
+             "04/03 | TRANSFER TO A/C ALI* | 10.00+ |", "Jersey payment"]
+    second = ["05/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |", "Friendly game payment",
+              "06/03 | TRANSFER TO A/C ALI* | 10.00+ |", "Jersey payment"]
+
+    cleaned = clean_text(statement(page(1, first), page(2, second))).splitlines()
+
+    assert cleaned == HEADER + first + FOOTER + second
+
+
+def test_continuation_lines_repeated_across_pages_are_kept():
+    # each page ends with the same continuation line and footer, which
+    # can't be told apart from a two-line footer
+    first = ["15/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |", "Friendly game payment"]
+    second = ["16/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |", "Friendly game payment"]
+
+    cleaned = clean_text(statement(page(1, first, ["Member of PIDM"]), page(2, second, ["Member of PIDM"])))
+
+    assert cleaned.count("Friendly game payment") == 2
+
+
+def test_column_header_words_between_rows_are_kept():
+    rows = [
+        "01/03 | TRANSFER TO A/C DESCRIPTION AMOUNT TRADING* | 20.00+ |",
+        "Transaction description amount",
+        "02/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |",
+    ]
+
+    cleaned = clean_text(statement(HEADER + rows, HEADER + rows)).splitlines()
+
+    assert cleaned.count("Transaction description amount") == 2
+    assert cleaned.count(HEADER[2]) == 1
+
+
+def test_summary_and_garbage_lines_are_dropped():
+    text = "\n".join(
+        HEADER
+        + [
+            "Opening Balance 1,000.00",
+            "01/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |",
+            "~-_|.",
+            "Closing Balance 550.00",
+        ]
+    )
+
+    assert clean_text(text).splitlines() == HEADER + ["01/03 | TRANSFER FR A/C JOHN DOE* | 450.00- |"]
+
+
+def test_rules_can_be_turned_off():
+    text = statement(page(1, ["01/03 | A* | 1.00- |"]), page(2, ["02/03 | B* | 2.00- |"]))
+
+    cleaned = clean_text(text, rules=()).splitlines()
+
+    assert cleaned.count(HEADER[0]) == 2
+    assert "Page 1 of 2" in cleaned
+
+
+def test_short_page_numbers_are_dropped_and_rules_stay_confident():
+    from app.services.rule_parser import parse_statement
+
+    pages = [
+        HEADER + [f"{day:02d}/03 | TRANSFER FR A/C JOHN DOE* Friendly game payment | 450.00- |"
+                  for day in range(number * 2 + 1, number * 2 + 3)] + [f"{number + 1}/3"]
+        for number in range(3)
+    ]
+
+    cleaned = clean_text(statement(*pages))
+
+    assert not {"1/3", "2/3", "3/3"} & set(cleaned.splitlines())
+    result = parse_statement(cleaned)
+    assert len(result.transactions) == 6
+    assert result.confidence == 1.0
@@ -0,0 +1,65 @@
+from datetime import date
+
+from app.db.repository import normalize_counterparty, transaction_fingerprints
+from app.models.schemas import Transaction
+
+
+def transaction(name="TRANSFER FR A/C JOHN DOE", amount=-450.0, day=15, description=""):
+    return Transaction(
+        date=date(2024, 3, day),
+        transaction=name,
+        amount=amount,
+        description=description,
+        category="transfer_out" if amount < 0 else "transfer_in",
+        is_direct=True,
+    )
+
+
+def test_same_transaction_matches_across_statements():
+    monthly = transaction_fingerprints([transaction(), transaction(day=16)], user_id=1)
+    quarterly = transaction_fingerprints([transaction(day=2), transaction(), transaction(day=16)], user_id=1)
+
+    assert quarterly[1:] == monthly
+
+
+def test_counterparty_is_normalized_and_description_ignored():
+    a = transaction_fingerprints([transaction("Transfer fr A/C  John Doe*", description="a")], user_id=1)
+    b = transaction_fingerprints([transaction("TRANSFER FR A/C JOHN DOE", description="b")], user_id=1)
+
+    assert a == b
+
+
+def test_identical_rows_in_one_statement_get_distinct_fingerprints():
+    fingerprints = transaction_fingerprints([transaction(), transaction()], user_id=1)
+
+    assert len(set(fingerprints)) == 2
+    # a later statement with only one copy matches the first of them
+    assert transaction_fingerprints([transaction()], user_id=1) == fingerprints[:1]
+
+
+def test_fingerprints_are_per_user():
+    assert transaction_fingerprints([transaction()], user_id=1) != transaction_fingerprints(
+        [transaction()], user_id=2
+    )
+
+
+def test_date_and_amount_tell_transactions_apart():
+    fingerprints = transaction_fingerprints(
+        [transaction(), transaction(day=16), transaction(amount=-451.0)], user_id=1
+    )
+
+    assert len(set(fingerprints)) == 3
+
+
+def test_counterparty_drops_transfer_prefixes():
+    assert normalize_counterparty("TRANSFER FR A/C JOHN DOE* Payment") == "JOHN DOE PAYMENT"
+    assert normalize_counterparty("Transfer to A/C Toyyibpay Sdn. Bhd.") == "TOYYIBPAY SDN BHD"
+    assert normalize_counterparty("TRANSFER TO A/C") == "TRANSFER TO A C"
+    assert normalize_counterparty("TRANSFER FEE") == "TRANSFER FEE"
+
+
+def test_transfers_to_and_from_a_payee_keep_distinct_fingerprints():
+    incoming = transaction_fingerprints([transaction("TRANSFER FR A/C JOHN DOE")], user_id=1)
+    outgoing = transaction_fingerprints([transaction("TRANSFER TO A/C JOHN DOE")], user_id=1)
+
+    assert incoming != outgoing
@@ -0,0 +1,95 @@
+import asyncio
+import hashlib
+import io
+import tempfile
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.testclient import TestClient
+
+from app.services.uploads import UploadSizeLimitMiddleware, UploadTooLarge, spool_upload
+
+DATA = b"%PDF-1.4 " + bytes(range(256)) * 4
+
+
+def spool(data=DATA, **options):
+    options = {"max_size": 1 << 20, "chunk_size": 100, **options}
+    return asyncio.run(spool_upload(UploadFile(io.BytesIO(data)), **options))
+
+
+@pytest.fixture
+def spool_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    return tmp_path
+
+
+def test_small_upload_stays_in_memory(spool_dir):
+    upload = spool(spool_threshold=len(DATA))
+
+    assert upload.source == DATA
+    assert upload.size == len(DATA)
+    assert upload.digest == hashlib.sha256(DATA).hexdigest()
+    assert list(spool_dir.iterdir()) == []
+
+
+def test_large_upload_is_spooled_to_disk(spool_dir):
+    upload = spool(spool_threshold=len(DATA) - 1)
+
+    assert isinstance(upload.source, Path)
+    assert upload.source.read_bytes() == DATA
+    assert upload.digest == hashlib.sha256(DATA).hexdigest()
+
+    upload.discard()
+    assert list(spool_dir.iterdir()) == []
+
+
+def test_oversized_upload_is_rejected_and_its_spool_removed(spool_dir):
+    with pytest.raises(UploadTooLarge):
+        spool(max_size=len(DATA) - 1, spool_threshold=100)
+
+    assert list(spool_dir.iterdir()) == []
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"received": len(await request.body())}
+
+    @app.post("/batch")
+    async def batch(request: Request):
+        return {"received": len(await request.body())}
+
+    limited = UploadSizeLimitMiddleware(app, max_bytes=10, path_limits={"/batch": 20})
+    return TestClient(limited, raise_server_exceptions=False)
+
+
+def chunks(size, chunk=4):
+    for start in range(0, size, chunk):
+        yield b"x" * min(chunk, size - start)
+
+
+def test_body_within_the_limit_is_passed_through(client):
+    assert client.post("/upload", content=b"x" * 10).json() == {"received": 10}
+    assert client.post("/upload", content=chunks(10)).json() == {"received": 10}
+
+
+def test_oversized_content_length_is_rejected(client):
+    response = client.post("/upload", content=b"x" * 11)
+
+    assert response.status_code == 413
+    assert response.json() == {"detail": "request body exceeds limit of 10 bytes"}
+
+
+def test_oversized_chunked_body_is_rejected(client):
+    response = client.post("/upload", content=chunks(11))
+
+    assert response.status_code == 413
+
+
+def test_path_limits_override_the_default(client):
+    assert client.post("/batch", content=b"x" * 20).json() == {"received": 20}
+    assert client.post("/batch", content=b"x" * 21).status_code == 413